@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'todo.metrics.RequestMetricsMiddleware',
+    'todo.querycheck.RepeatedQueryMiddleware',
+    'todo.replicas.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -74,13 +78,74 @@ WSGI_APPLICATION = 'Todo.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connection profiles for the SQLite database, chosen with the
+# TODO_DATABASE_PROFILE environment variable. 'production' is tuned for
+# concurrent requests: in WAL mode readers never block the writer;
+# synchronous=NORMAL is durable against crashes in WAL mode (a power cut
+# can lose the last commits, never corrupt the file); busy_timeout makes
+# writers wait for the lock instead of failing with "database is locked";
+# atomic blocks BEGIN IMMEDIATE so they take the write lock up front
+# rather than failing when a read upgrades to a write; and connections
+# persist across requests, which helps thread-pool servers (gunicorn
+# gthread/sync) but not ASGI, where each request runs on a new thread.
+DATABASE_PROFILES = {
+    'default': {},
+    'production': {
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA busy_timeout=5000;'
+                'PRAGMA mmap_size=134217728;'
+                'PRAGMA cache_size=-20000;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        },
+    },
+}
+DATABASE_PROFILE = os.environ.get('TODO_DATABASE_PROFILE', 'default')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        **DATABASE_PROFILES[DATABASE_PROFILE],
     }
 }
 
+DATABASE_ROUTERS = ['todo.shards.ShardRouter', 'todo.replicas.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Task list responses, shared by every worker process on the host: a
+    # write in one must invalidate the lists the others cached. Use Redis
+    # or Memcached when workers run on several hosts; a LocMemCache only
+    # suits a single process (warning todo.W004).
+    'tasks': {
+        'BACKEND': 'todo.cache.LRUFileBasedCache',
+        'LOCATION': os.environ.get('TASK_CACHE_DIR', BASE_DIR / 'cache' / 'tasks'),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+# Cache alias for per-user task list responses; None disables the cache.
+TASK_LIST_CACHE = 'tasks'
+
+# Runs the tests with the file-based caches in a temporary directory.
+TEST_RUNNER = 'todo.testrunner.TaskTestRunner'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -104,7 +169,7 @@ AUTH_USER_MODEL = 'todo.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'todo.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -146,3 +211,98 @@ SIMPLE_JWT = {
         'ACCESS_TOKEN_LIFETIME': timedelta(minutes = 60),
         'REFRESH_TOKEN_LIFETIME': timedelta(days = 1),
         }
+
+# Largest page a client may request with ?page_size= on the task list
+TASK_MAX_PAGE_SIZE = 100
+
+# Bulk task endpoints (/api/tasks/bulk/)
+TASK_BULK_MAX_ITEMS = 10000
+TASK_BULK_BATCH_SIZE = 1000
+
+# Dotted path to the task search backend; None picks one for the database
+# vendor (SQLite FTS5, PostgreSQL tsvector, or icontains elsewhere).
+TASK_SEARCH_BACKEND = None
+
+# Serve task reads from .values() rows through a precompiled field plan
+# instead of instantiating models and running TaskSerializer per row.
+TASK_FAST_READ = True
+
+# Rows fetched per server-side cursor round trip by /api/tasks/export/
+TASK_EXPORT_CHUNK_SIZE = 2000
+
+# Task imports (/api/tasks/import/ and manage.py import_tasks): rows
+# validated and committed per batch, and per-line errors kept in the report.
+TASK_IMPORT_BATCH_SIZE = 5000
+TASK_IMPORT_MAX_ERRORS = 1000
+
+# Seconds /api/tasks/stats/ is cached per user. Writes invalidate it at
+# once; this only bounds how far the clock-based counts can lag.
+TASK_STATS_CACHE_TIMEOUT = 60
+
+# Read per-user task counts from UserTaskStats, kept by database triggers,
+# instead of COUNT queries: the task list's page count and the stats
+# endpoint. Only takes effect on databases with counter triggers.
+TASK_STATS_COUNTERS = True
+
+# Delta sync (/api/tasks/sync/): change-log rows read per response, and
+# days a cursor stays valid. manage.py compact_task_changes drops log rows
+# older than this, so clients away longer must download everything again.
+TASK_SYNC_PAGE_SIZE = 1000
+TASK_SYNC_RETENTION_DAYS = 30
+
+# Task change push (/api/tasks/events/, todo.events): the broker class,
+# events buffered per connection before a slow client is told to resync,
+# seconds between keep-alive comments, and seconds before a stream ends
+# and the client reconnects. The local broker only reaches clients of
+# the same process.
+TASK_EVENTS_BROKER = 'todo.events.LocalTaskEventBroker'
+TASK_EVENTS_QUEUE_SIZE = 100
+TASK_EVENTS_HEARTBEAT = 15
+TASK_EVENTS_MAX_DURATION = 300
+
+# Group commit (todo.coalescer): task creates, updates and status changes
+# arriving within WINDOW seconds of each other are committed together by
+# one writer thread, up to MAX_BATCH writes per transaction. Helps SQLite
+# with many concurrent writers; every write still returns only once its
+# batch has committed, or fails after TIMEOUT seconds.
+TASK_WRITE_COALESCING = False
+TASK_WRITE_COALESCE_WINDOW = 0.002
+TASK_WRITE_COALESCE_MAX_BATCH = 64
+TASK_WRITE_COALESCE_TIMEOUT = 30
+
+# Read replicas (todo.replicas): database aliases, copies of 'default'
+# declared in DATABASES, mapped to relative weights, e.g.
+# {'replica1': 2, 'replica2': 1}. GET, HEAD and OPTIONS requests read from
+# one of them; after a write the client reads from the primary for
+# PIN_SECONDS, which must cover the replication lag. Empty: no replicas.
+TASK_READ_REPLICAS = {}
+TASK_REPLICA_PIN_SECONDS = 5
+
+# Task shards (todo.shards): the database aliases holding users' tasks,
+# 'default' first. New users are placed on one by a hash of their email;
+# manage.py rebalance_task_shards moves existing users after a shard is
+# added. Append aliases, never reorder or remove them: a shard's position
+# fixes the range of its task ids. Replicas only cover 'default'.
+TASK_SHARDS = ['default']
+
+# In-process cache of authenticated users, so JWT requests skip the user
+# SELECT. ORM saves evict an entry in their own process only, so a user
+# deactivated elsewhere keeps authenticating for up to TTL seconds; 0 turns
+# the cache off.
+TASK_AUTH_USER_CACHE_TTL = 5
+TASK_AUTH_USER_CACHE_SIZE = 10000
+
+# Request metrics (todo.metrics): share of requests sampled into the
+# /metrics histograms, whether sampled responses carry a Server-Timing
+# header (it tells clients how long the database took, so only in
+# DEBUG), and the bearer token a scraper sends to /metrics. Without it
+# /metrics only answers signed-in staff.
+TASK_METRICS_SAMPLE_RATE = 0.1
+TASK_METRICS_SERVER_TIMING = DEBUG
+TASK_METRICS_TOKEN = os.environ.get('TASK_METRICS_TOKEN')
+
+# N+1 detection (todo.querycheck): flag a request that runs the same SQL
+# template more than THRESHOLD times, by logging a warning or, with
+# ACTION = 'raise', raising RepeatedQueryError. None turns it off.
+TASK_REPEATED_QUERY_THRESHOLD = 10 if DEBUG else None
+TASK_REPEATED_QUERY_ACTION = 'log'
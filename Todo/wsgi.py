@@ -3,6 +3,9 @@ WSGI config for Todo project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
 
+The task event stream (api/tasks/events/) cannot be served over WSGI and
+answers 501 here; deploy with Todo/asgi.py to offer it.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 """
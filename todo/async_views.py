@@ -0,0 +1,259 @@
+"""Async versions of the task list, detail and status endpoints, served under ``api/async/``.
+
+They answer exactly like their synchronous counterparts but run on the
+event loop under ASGI: authentication only reaches the database on a user
+cache miss and every query goes through the async ORM, so a worker can
+hold many concurrent polls without a thread per request.
+"""
+import functools
+import json
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseNotAllowed, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from .authentication import CachedJWTAuthentication
+from .cache import invalidate_user_tasks
+from .events import event_stream, get_task_event_broker, publish_task_event_now
+from .conditional import etag_in, matching_task_versions, not_modified, precondition_failed, task_etag
+from .models import Task
+from .serializers import TaskSerializer, TaskStatusSerializer, get_read_plan
+from .shards import TaskWritesAllowed
+from .views import TaskList
+
+
+def render(response):
+    """Render a DRF Response outside of an APIView."""
+    response.accepted_renderer = JSONRenderer()
+    response.accepted_media_type = 'application/json'
+    response.renderer_context = {}
+    return response.render()
+
+
+def exception_response(exc):
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = Response(data, status=exc.status_code)
+    if getattr(exc, 'wait', None):
+        response['Retry-After'] = '%d' % exc.wait
+    return response
+
+
+def task_not_found():
+    return Response(
+        {
+            "success": False,
+            "message": "Task not found",
+            "detail": "The requested task could not be found"
+        },
+        status=status.HTTP_404_NOT_FOUND
+    )
+
+
+def async_api_view(methods):
+    """Wrap an async view: check the method, authenticate the JWT and render the Response.
+
+    The view receives a DRF Request, so query_params and the task list's
+    filter backends work unchanged. Like APIView.as_view, the wrapper is
+    CSRF exempt: JWT authentication sends no cookie to forge. Writes get
+    503 while the user's tasks move between shards, as TaskWritesAllowed
+    answers for the sync views.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return HttpResponseNotAllowed(methods)
+            authenticator = CachedJWTAuthentication()
+            try:
+                result = await authenticator.aauthenticate(request)
+                if result is None:
+                    response = Response(
+                        {'detail': 'Authentication credentials were not provided.'},
+                        status=status.HTTP_401_UNAUTHORIZED
+                    )
+                else:
+                    drf_request = Request(request)
+                    drf_request.user, drf_request.auth = result
+                    TaskWritesAllowed().has_permission(drf_request, view)
+                    response = await view(drf_request, *args, **kwargs)
+            except APIException as exc:
+                response = exception_response(exc)
+            if response.status_code == status.HTTP_401_UNAUTHORIZED:
+                response['WWW-Authenticate'] = authenticator.authenticate_header(request)
+            return render(response)
+        return csrf_exempt(wrapper)
+    return decorator
+
+
+@async_api_view(['GET', 'HEAD'])
+async def task_list(request):
+    """List the user's tasks, with the same filters, pagination and caching as TaskList."""
+    view = TaskList(request=request, args=(), kwargs={}, format_kwarg=None)
+    try:
+        cache_key, response = view.get_cached_response(request)
+        if response is not None:
+            return response
+        queryset = view.get_list_queryset()
+        page = await view.paginator.apaginate_queryset(queryset, request, view=view)
+        rows = [row async for row in queryset] if page is None else None
+        response = view.get_list_response(page, rows)
+        view.cache_response(cache_key, response)
+        return response
+    except APIException:
+        raise
+    except Exception as e:
+        return Response({
+            "success": False,
+            "message": "Failed to retrieve tasks.",
+            "error": str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@async_api_view(['GET', 'HEAD'])
+async def task_detail(request, pk):
+    """Retrieve one of the user's tasks."""
+    try:
+        plan = get_read_plan(TaskSerializer)
+        row = await Task.objects.for_user(request.user).filter(pk=pk).values(*plan.columns).afirst()
+        if row is None:
+            return task_not_found()
+        etag = task_etag(row['id'], row['updated_at'])
+        if etag_in(request.headers.get('If-None-Match'), etag):
+            return not_modified(etag)
+        return Response(
+            {
+                "success": True,
+                "message": "Tasks retrieved successfully.",
+                "data": plan.serialize_row(row)
+            },
+            status=status.HTTP_200_OK,
+            headers={'ETag': etag}
+        )
+    except Exception as e:
+        return Response(
+            {
+                "success": False,
+                "message": "Failed to retrieve tasks.",
+                "error": str(e)
+            },
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@async_api_view(['PATCH'])
+async def update_task_status(request, pk):
+    """Update only the status field of a task."""
+    try:
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError as e:
+            return Response({'detail': f'JSON parse error - {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = TaskStatusSerializer(data=data)
+        if not serializer.is_valid():
+            return Response(
+                {
+                    "success": False,
+                    "message": "Validation error",
+                    "errors": serializer.errors
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        tasks = Task.objects.for_user(request.user)
+        expected_status = serializer.validated_data.get('expected_status')
+        expected_updated_at = None
+        if_match = request.headers.get('If-Match')
+        if if_match:
+            matching = matching_task_versions(if_match, pk)
+            if not matching:
+                if await tasks.filter(pk=pk).aexists():
+                    return precondition_failed()
+                return task_not_found()
+            expected_updated_at = matching[0]
+
+        task = await Task.objects.atransition_status(
+            pk, request.user, serializer.validated_data['status'],
+            expected_status=expected_status, expected_updated_at=expected_updated_at
+        )
+        if task is None:
+            preconditions = expected_status is not None or expected_updated_at is not None
+            if preconditions and await tasks.filter(pk=pk).aexists():
+                if expected_updated_at is not None:
+                    return precondition_failed()
+                return precondition_failed(f"The task status is no longer '{expected_status}'")
+            return task_not_found()
+        invalidate_user_tasks(request.user.pk)
+        data = TaskStatusSerializer(task).data
+        publish_task_event_now(request.user.pk, 'status', data)
+        return Response(
+            {
+                "success": True,
+                "message": "Task status updated successfully.",
+                "data": data
+            },
+            status=status.HTTP_200_OK,
+            headers={'ETag': task_etag(task['id'], task['updated_at'])}
+        )
+    except Exception as e:
+        return Response(
+            {
+                "success": False,
+                "message": "Failed to update task status.",
+                "error": str(e)
+            },
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+async def task_events(request):
+    """Stream the user's task events (see todo.events) as ``text/event-stream``.
+
+    EventSource clients cannot set headers, so the access token may also be
+    passed as ``?access_token=``; keep such URLs out of access logs. The
+    stream needs an ASGI server (Todo.asgi): under WSGI Django consumes an
+    async iterator to the end before sending anything, so the view answers
+    501 there instead.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    authenticator = CachedJWTAuthentication()
+    try:
+        result = await authenticator.aauthenticate(request)
+        if result is None and request.GET.get('access_token'):
+            result = await authenticator.aauthenticate_token(request.GET['access_token'])
+        if result is None:
+            response = Response(
+                {'detail': 'Authentication credentials were not provided.'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+    except APIException as exc:
+        result, response = None, exception_response(exc)
+    if result is None:
+        if response.status_code == status.HTTP_401_UNAUTHORIZED:
+            response['WWW-Authenticate'] = authenticator.authenticate_header(request)
+        return render(response)
+    if not isinstance(request, ASGIRequest):
+        return render(Response(
+            {
+                "success": False,
+                "message": "Task events are only served over ASGI.",
+                "error": "Run the project under Todo.asgi to stream events."
+            },
+            status=status.HTTP_501_NOT_IMPLEMENTED
+        ))
+    user, _ = result
+    # Subscribe before responding, so no event published after this request is missed.
+    subscription = get_task_event_broker().subscribe(user.pk, settings.TASK_EVENTS_QUEUE_SIZE)
+    response = StreamingHttpResponse(
+        event_stream(subscription, settings.TASK_EVENTS_HEARTBEAT, settings.TASK_EVENTS_MAX_DURATION),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,116 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class UserCache:
+    """Bounded, thread-safe LRU of users by id whose entries expire after a TTL.
+
+    Saves and deletes through the ORM evict a user in this process; the TTL
+    bounds how long other processes (and queryset.update() calls) can serve
+    a stale copy, so it is kept to a few seconds. A TTL of 0 turns the
+    cache off.
+    """
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires, user = entry
+            if expires < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+        # Each request gets its own copy, so changes to request.user never leak.
+        return copy.copy(user)
+
+    def set(self, user_id, user):
+        if settings.TASK_AUTH_USER_CACHE_TTL <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + settings.TASK_AUTH_USER_CACHE_TTL, copy.copy(user))
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > settings.TASK_AUTH_USER_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that resolves the token's user from ``user_cache``.
+
+    A cached user is only used when the token's version matches it, that is
+    when the token's revoke claim (the hashed password it was issued for)
+    agrees with the cached password. Otherwise the user is reloaded, so a
+    token issued after a password change is never checked against an old
+    copy. The active and password checks run on every request, but against
+    the cached copy: a user deactivated, or whose password changed, in
+    another process still authenticates here until the entry expires
+    (TASK_AUTH_USER_CACHE_TTL). With CHECK_REVOKE_TOKEN off, a password
+    change does not revoke tokens at all.
+    """
+    def get_user(self, validated_token):
+        user = self.get_cached_user(validated_token)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(validated_token[api_settings.USER_ID_CLAIM], user)
+        return user
+
+    async def aauthenticate(self, request):
+        """authenticate() for async views; only a cache miss touches the database."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        return await self.aauthenticate_token(raw_token)
+
+    async def aauthenticate_token(self, raw_token):
+        """Return (user, validated token) for a raw access token, as aauthenticate does."""
+        validated_token = self.get_validated_token(raw_token)
+        user = self.get_cached_user(validated_token)
+        if user is None:
+            user = await sync_to_async(self.get_user)(validated_token)
+        return user, validated_token
+
+    def get_cached_user(self, validated_token):
+        """The token's user from the cache, or None when it must be loaded."""
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = user_cache.get(user_id)
+        if user is None or not self.token_matches_user(validated_token, user):
+            return None
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+    def token_matches_user(self, validated_token, user):
+        if not api_settings.CHECK_REVOKE_TOKEN:
+            return True
+        return validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) == get_md5_hash_password(user.password)
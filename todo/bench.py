@@ -0,0 +1,386 @@
+"""Load-test harness behind ``manage.py bench``.
+
+Seeds a throwaway test database, replays API scenarios through a
+transport (the Django test client, a wsgiref server or a uvicorn ASGI
+server) and summarizes latency percentiles, throughput and queries per
+request.
+"""
+import contextlib
+import http.client
+import itertools
+import json
+import os
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+from django.test import Client, override_settings
+from django.test.utils import (
+    setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+)
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .dbwrappers import install_execute_wrapper
+from .models import Task, User
+
+WORDS = [
+    'report', 'invoice', 'meeting', 'deploy', 'review', 'budget', 'design', 'release',
+    'customer', 'backlog', 'migration', 'roadmap', 'hiring', 'audit', 'training', 'support',
+]
+PASSWORD = 'Bench-pass-1'
+
+
+@contextlib.contextmanager
+def test_database(on_disk=False):
+    """Run the block against a freshly created test database, destroyed afterwards.
+
+    SQLite test databases live in shared-cache memory by default, where
+    concurrent writers fail at once with "database table is locked".
+    ``on_disk`` puts it in a temporary file so locking behaves as in a deployment.
+    """
+    setup_test_environment()
+    with tempfile.TemporaryDirectory() as directory:
+        test_settings = connections['default'].settings_dict['TEST']
+        old_name = test_settings['NAME']
+        if on_disk and connections['default'].vendor == 'sqlite':
+            test_settings['NAME'] = os.path.join(directory, 'bench.sqlite3')
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        try:
+            yield
+        finally:
+            connections.close_all()
+            teardown_databases(old_config, verbosity=0)
+            test_settings['NAME'] = old_name
+            teardown_test_environment()
+
+
+@contextlib.contextmanager
+def database_profile(name):
+    """Use connection profile ``name`` from settings.DATABASE_PROFILES for the default database in the block."""
+    settings_dict = connections['default'].settings_dict
+    profile = settings.DATABASE_PROFILES[name]
+    saved = {key: settings_dict[key] for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS', 'OPTIONS')}
+    connections.close_all()
+    settings_dict.update({**{'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': {}}, **profile})
+    try:
+        yield
+    finally:
+        connections.close_all()
+        settings_dict.update(saved)
+
+
+class QueryCounter:
+    """Count queries on every connection, including those opened by server threads.
+
+    A wrapper is installed on each connection as it opens and stays there,
+    counting into whichever QueryCounter is active, so connections kept
+    open across scenarios (CONN_MAX_AGE) are counted too.
+    """
+    active = None
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def wrapper(execute, sql, params, many, context):
+        counter = QueryCounter.active
+        if counter is not None:
+            with counter._lock:
+                counter.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        install_execute_wrapper(QueryCounter.wrapper, 'todo.bench.QueryCounter')
+        QueryCounter.active = self
+        return self
+
+    def __exit__(self, *exc_info):
+        QueryCounter.active = None
+
+
+def seed(users, tasks_per_user, description_size, rng):
+    """Create users with tasks and return [(user, access token, task ids)]."""
+    seeded = []
+    now = timezone.now()
+    statuses = [choice for choice, _ in Task.STATUS_CHOICES]
+    for index in range(users):
+        user = User.objects.create_user(
+            fullname=f'Bench {index}', phone=f'09{index:08d}', email=f'bench{index}@example.com', password=PASSWORD
+        )
+        Task.objects.on_shard_of(user).bulk_create(
+            (
+                Task(
+                    user=user,
+                    title=' '.join(rng.choices(WORDS, k=3)),
+                    description=' '.join(rng.choices(WORDS, k=description_size // 8 + 1))[:description_size],
+                    due_date=now + timedelta(days=rng.randint(-30, 90)),
+                    status=rng.choice(statuses),
+                )
+                for _ in range(tasks_per_user)
+            ),
+            batch_size=1000
+        )
+        task_ids = list(Task.objects.for_user(user).values_list('id', flat=True))
+        seeded.append((user, str(RefreshToken.for_user(user).access_token), task_ids))
+    return seeded
+
+
+class Scenarios:
+    """Request builders: each returns (method, path, JSON body or None, access token or None)."""
+    names = ['register', 'login', 'list', 'filter', 'search', 'create', 'status', 'mixed']
+
+    def __init__(self, seeded, rng):
+        self.seeded = seeded
+        self.rng = rng
+        self.sequence = itertools.count()
+        self.statuses = [choice for choice, _ in Task.STATUS_CHOICES]
+
+    def pick(self):
+        return self.rng.choice(self.seeded)
+
+    def register(self):
+        n = next(self.sequence)
+        return 'POST', '/api/register/', {
+            'fullname': 'New user', 'phone': f'08{n:08d}', 'email': f'new{n}-{time.time_ns()}@example.com',
+            'password': PASSWORD, 'confirm_password': PASSWORD,
+        }, None
+
+    def login(self):
+        user, _, _ = self.pick()
+        return 'POST', '/api/login/', {'email': user.email, 'password': PASSWORD}, None
+
+    def list(self):
+        _, token, _ = self.pick()
+        return 'GET', '/api/tasks/', None, token
+
+    def filter(self):
+        _, token, _ = self.pick()
+        return 'GET', f'/api/tasks/?status={self.rng.choice(self.statuses)}&ordering=due_date', None, token
+
+    def search(self):
+        _, token, _ = self.pick()
+        return 'GET', f'/api/tasks/?search={self.rng.choice(WORDS)}', None, token
+
+    def create(self):
+        _, token, _ = self.pick()
+        return 'POST', '/api/tasks/', {
+            'title': ' '.join(self.rng.choices(WORDS, k=3)),
+            'description': 'Created by the benchmark',
+            'due_date': (timezone.now() + timedelta(days=7)).isoformat(),
+        }, token
+
+    def status(self):
+        _, token, task_ids = self.pick()
+        return 'PATCH', f'/api/tasks/{self.rng.choice(task_ids)}/status/', {
+            'status': self.rng.choice(self.statuses)
+        }, token
+
+    def mixed(self):
+        """Concurrent reads and writes: half list pages, half creates and status changes."""
+        return self.rng.choice([self.list, self.list, self.create, self.status])()
+
+
+class ClientTransport:
+    """In-process requests through the Django test client."""
+    name = 'client'
+
+    def __init__(self):
+        self.local = threading.local()
+
+    @contextlib.contextmanager
+    def running(self):
+        yield self
+
+    def request(self, method, path, body, token):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = Client()
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = client.generic(
+            method, path, json.dumps(body) if body is not None else '',
+            content_type='application/json', headers=headers
+        )
+        return response.status_code
+
+
+class HTTPTransport:
+    """Requests over real sockets to a server running in a background thread."""
+    def __init__(self):
+        self.port = None
+
+    def allow_host(self):
+        return override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, '127.0.0.1'])
+
+    def request(self, method, path, body, token):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        try:
+            connection.request(method, path, json.dumps(body) if body is not None else None, headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        finally:
+            connection.close()
+
+    @staticmethod
+    def free_port():
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            return sock.getsockname()[1]
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """wsgiref server handling requests on a fixed pool of threads, like gunicorn's gthread worker.
+
+    Threads live as long as the server, so persistent database
+    connections (CONN_MAX_AGE) are reused across requests.
+    """
+    request_queue_size = 1024
+    threads = 32
+
+    def server_activate(self):
+        super().server_activate()
+        self.pool = ThreadPoolExecutor(max_workers=self.threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+class WSGITransport(HTTPTransport):
+    """Django's WSGIHandler behind a wsgiref server with a thread pool."""
+    name = 'wsgi'
+
+    @contextlib.contextmanager
+    def running(self):
+        server = make_server(
+            '127.0.0.1', 0, WSGIHandler(), server_class=PooledWSGIServer, handler_class=QuietHandler
+        )
+        self.port = server.server_port
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            with self.allow_host():
+                yield self
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class ASGITransport(HTTPTransport):
+    """Django's ASGIHandler behind uvicorn, which is an optional dependency."""
+    name = 'asgi'
+
+    @classmethod
+    def available(cls):
+        try:
+            import uvicorn  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    @contextlib.contextmanager
+    def running(self):
+        import uvicorn
+        from django.core.handlers.asgi import ASGIHandler
+
+        self.port = self.free_port()
+        config = uvicorn.Config(
+            ASGIHandler(), host='127.0.0.1', port=self.port, log_level='warning', lifespan='off', backlog=1024
+        )
+        server = uvicorn.Server(config)
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.01)
+        try:
+            with self.allow_host():
+                yield self
+        finally:
+            server.should_exit = True
+            thread.join()
+
+
+TRANSPORTS = {transport.name: transport for transport in (ClientTransport, WSGITransport, ASGITransport)}
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_scenario(transport, build, requests, concurrency):
+    """Send ``requests`` requests built by ``build`` with ``concurrency`` workers and summarize them."""
+    plans = [build() for _ in range(requests)]
+    latencies = []
+    errors = 0
+
+    def send(plan):
+        started = time.perf_counter()
+        status_code = transport.request(*plan)
+        return time.perf_counter() - started, status_code
+
+    with QueryCounter() as queries:
+        start = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            if concurrency > 1:
+                responses = stack.enter_context(ThreadPoolExecutor(max_workers=concurrency)).map(send, plans)
+            else:
+                responses = map(send, plans)
+            for latency, status_code in responses:
+                latencies.append(latency)
+                errors += status_code >= 400
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'errors': errors,
+        'req_per_s': round(requests / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2),
+        'queries_per_request': round(queries.count / requests, 2),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Yield (key, metric, baseline, current) for results slower than baseline by more than ``threshold``."""
+    previous = {run['key']: run for run in baseline['runs']}
+    for run in results['runs']:
+        before = previous.get(run['key'])
+        if before is None:
+            continue
+        for metric in ('p95_ms', 'p99_ms'):
+            if before[metric] and run[metric] > before[metric] * (1 + threshold):
+                yield run['key'], metric, before[metric], run[metric]
+        if before['req_per_s'] and run['req_per_s'] < before['req_per_s'] * (1 - threshold):
+            yield run['key'], 'req_per_s', before['req_per_s'], run['req_per_s']
@@ -0,0 +1,156 @@
+import hashlib
+import os
+import threading
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from .replicas import cache_timeout, pinned_to_primary
+
+
+class LRUFileBasedCache(FileBasedCache):
+    """FileBasedCache that evicts the least recently used entries.
+
+    Reads touch the entry's mtime, and culling removes the files with the
+    oldest mtimes instead of a random sample.
+    """
+    def get(self, key, default=None, version=None):
+        value = super().get(key, default, version)
+        if value is not default:
+            try:
+                os.utime(self._key_to_file(key, version))
+            except OSError:
+                pass
+        return value
+
+    def _cull(self):
+        filelist = self._list_cache_files()
+        num_entries = len(filelist)
+        if num_entries < self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            return self.clear()
+
+        def mtime(fname):
+            try:
+                return os.path.getmtime(fname)
+            except OSError:
+                return 0
+        filelist.sort(key=mtime)
+        for fname in filelist[:int(num_entries / self._cull_frequency)]:
+            self._delete(fname)
+
+
+class TaskListCache:
+    """Per-user cache of task list responses.
+
+    Entries are keyed by user, a per-user generation and the normalized
+    query string. Any write to a user's tasks bumps the generation, which
+    orphans every cached page for that user at once; orphans age out
+    through the backend's eviction. The generation must be seen by every
+    worker process, so the backend must be shared between them (see
+    ``check_task_list_cache``).
+    """
+    def __init__(self, alias=None):
+        self.alias = alias
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias or settings.TASK_LIST_CACHE]
+
+    @property
+    def enabled(self):
+        return bool(self.alias or settings.TASK_LIST_CACHE)
+
+    def generation_key(self, user_id):
+        return f'tasks:gen:{user_id}'
+
+    def get_generation(self, user_id):
+        key = self.generation_key(user_id)
+        generation = self.cache.get(key)
+        if generation is None:
+            # Seed from the clock so a counter lost to eviction cannot
+            # come back at a value that older entries were stored under.
+            self.cache.add(key, time.time_ns(), timeout=None)
+            generation = self.cache.get(key)
+        return generation
+
+    def bump(self, user_id):
+        if not self.enabled:
+            return
+        # A fresh clock value rather than incr: file and database caches
+        # increment by read and write, which two processes can interleave.
+        self.cache.set(self.generation_key(user_id), time.time_ns(), timeout=None)
+
+    def entry_key(self, request, generation):
+        params = sorted(
+            (name, value) for name, values in request.query_params.lists() for value in values
+        )
+        # Paginated responses embed absolute links, so the host is part of the key.
+        normalized = f'{request.get_host()}?{urlencode(params)}'
+        digest = hashlib.md5(normalized.encode('utf-8'), usedforsecurity=False).hexdigest()
+        return f'tasks:list:{request.user.pk}:{generation}:{digest}'
+
+    def user_key(self, user_id, name):
+        """Key for another per-user entry that writes to the user's tasks invalidate."""
+        return f'tasks:{name}:{user_id}:{self.get_generation(user_id)}'
+
+    def get(self, request):
+        """Return (key, data); data is None on a miss and key is where to store it."""
+        key = self.entry_key(request, self.get_generation(request.user.pk))
+        # The entry may come from a replica that has not seen this client's recent write.
+        data = None if pinned_to_primary(request) else self.cache.get(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return key, data
+
+    def set(self, key, data):
+        self.cache.set(key, data, cache_timeout())
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+task_list_cache = TaskListCache()
+
+
+@checks.register(checks.Tags.caches)
+def check_task_list_cache(app_configs, **kwargs):
+    alias = settings.TASK_LIST_CACHE
+    if alias and isinstance(caches[alias], LocMemCache):
+        # Fine for a single process; with several, each serves the others' stale lists.
+        return [checks.Warning(
+            f"TASK_LIST_CACHE '{alias}' is a per-process LocMemCache, so task list generations "
+            f"are not shared between workers.",
+            hint='Use a shared cache backend, or None, when running several worker processes.',
+            id='todo.W004'
+        )]
+    return []
+
+
+def invalidate_user_tasks(user_id, using=None):
+    """Bump the user's cache generation now and again once the transaction commits.
+
+    The commit-time bump stops a concurrent reader from caching rows it read
+    before our transaction became visible.
+    """
+    task_list_cache.bump(user_id)
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(lambda: task_list_cache.bump(user_id), using=using)
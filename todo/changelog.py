@@ -0,0 +1,141 @@
+"""Task change log for delta sync, written by database triggers.
+
+Every INSERT, UPDATE and DELETE on todo_task appends a TaskChange row for
+the owning user (two when a task moves between users), whatever path the
+write took. ``changes_since`` turns the log into the sync payload: the
+current rows of tasks changed after a cursor and the ids of tasks that
+are gone. The triggers are created by migration 0008.
+
+Change ids are assigned in commit order on SQLite, which serializes
+writers. On PostgreSQL a transaction can commit after one holding a
+later id, so a client polling at that moment could step past its change.
+
+``compact`` drops superseded rows (only the latest change of a task
+matters to sync) and rows older than the retention period. Cursors carry
+a timestamp, so one older than the retention period is rejected rather
+than silently missing deletes.
+"""
+import base64
+import binascii
+import json
+import math
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Task, TaskChange
+from .shards import shard_for
+
+TASK_TABLE = Task._meta.db_table
+CHANGE_TABLE = TaskChange._meta.db_table
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class ExpiredCursor(ValueError):
+    pass
+
+
+class BaseChangeLog:
+    """Databases without triggers log nothing; sync is unavailable."""
+    enabled = False
+
+    def __init__(self, using='default'):
+        self.using = using
+
+
+class SQLiteChangeLog(BaseChangeLog):
+    enabled = True
+
+
+class PostgresChangeLog(BaseChangeLog):
+    enabled = True
+
+
+VENDOR_CHANGE_LOGS = {
+    'sqlite': SQLiteChangeLog,
+    'postgresql': PostgresChangeLog,
+}
+
+
+def get_change_log_class(vendor):
+    return VENDOR_CHANGE_LOGS.get(vendor, BaseChangeLog)
+
+
+def get_change_log(using='default'):
+    return get_change_log_class(connections[using].vendor)(using=using)
+
+
+def encode_cursor(change_id, changed_at, shard='default'):
+    cursor = {'c': change_id, 't': changed_at.timestamp()}
+    if shard != 'default':
+        cursor['s'] = shard
+    payload = json.dumps(cursor, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+
+
+def decode_cursor(cursor, retention, shard='default'):
+    """Return the change id of a cursor; raise InvalidCursor, or ExpiredCursor past ``retention``.
+
+    Change ids only order the changes of one shard, so a cursor issued
+    before the user moved to ``shard`` has expired too.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        change_id, changed_at = int(payload['c']), float(payload['t'])
+        cursor_shard = payload.get('s', 'default')
+    except (TypeError, ValueError, KeyError, AttributeError, OverflowError, binascii.Error, UnicodeEncodeError):
+        raise InvalidCursor(cursor)
+    if not 0 <= change_id < 2 ** 63 or not math.isfinite(changed_at):
+        # Past a bigint the id would overflow in the query instead.
+        raise InvalidCursor(cursor)
+    if changed_at < (timezone.now() - retention).timestamp() or cursor_shard != shard:
+        raise ExpiredCursor(cursor)
+    return change_id
+
+
+def current_cursor(user):
+    """Cursor for the user's latest change, from which a client that has every task starts syncing."""
+    change = TaskChange.objects.for_user(user).aggregate(latest=Max('id'))
+    return encode_cursor(change['latest'] or 0, timezone.now(), shard_for(user))
+
+
+def changes_since(user, since, limit, columns):
+    """Return (rows of changed tasks, ids of deleted tasks, next cursor, has_more).
+
+    Reads at most ``limit`` log rows after change ``since``; a task changed
+    several times in that window is returned once. A cursor is dated when
+    it was issued once the client has caught up, so polling keeps it
+    fresh; mid-backlog it is dated by its change, as older changes follow.
+    """
+    changes = list(
+        TaskChange.objects.for_user(user).filter(id__gt=since).order_by('id')
+        .values_list('id', 'task_id', 'changed_at')[:limit + 1]
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if not changes:
+        return [], [], encode_cursor(since, timezone.now(), shard_for(user)), False
+    task_ids = list(dict.fromkeys(task_id for _, task_id, _ in changes))
+    rows = list(Task.objects.for_user(user).filter(pk__in=task_ids).values(*columns))
+    present = {row['id'] for row in rows}
+    deleted = [task_id for task_id in task_ids if task_id not in present]
+    last_id, _, last_changed_at = changes[-1]
+    cursor = encode_cursor(last_id, last_changed_at if has_more else timezone.now(), shard_for(user))
+    return rows, deleted, cursor, has_more
+
+
+def compact(retention, using='default'):
+    """Delete superseded log rows and rows older than ``retention``; return how many were deleted."""
+    cutoff = timezone.now() - retention
+    with transaction.atomic(using=using):
+        expired, _ = TaskChange.objects.using(using).filter(changed_at__lt=cutoff).delete()
+        latest = (
+            TaskChange.objects.using(using).order_by().values('user_id', 'task_id')
+            .annotate(latest=Max('id')).values('latest')
+        )
+        superseded, _ = TaskChange.objects.using(using).exclude(id__in=latest).delete()
+    return expired + superseded
+
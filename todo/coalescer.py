@@ -0,0 +1,193 @@
+"""Group commit for task writes on SQLite.
+
+SQLite runs one writer at a time and, outside WAL mode or with
+synchronous=FULL, every commit waits for the disk. With
+TASK_WRITE_COALESCING on, the single-task writes of the API (create,
+update, status change) are handed to one writer thread, which runs the
+writes that arrive within TASK_WRITE_COALESCE_WINDOW seconds of each
+other in a single transaction: one commit, and one lock hand-off, for
+the whole batch.
+
+Each write runs in its own savepoint, so one that raises is rolled back
+alone and its caller gets the exception, while the rest of the batch
+commits. A caller returns only once the batch containing its write has
+committed, so a write that returned is exactly as durable as before; if
+the commit itself fails every caller in the batch gets that error and
+none of their writes persist. What changes is that a write no longer
+runs in the caller's thread or transaction: writes made while the
+caller is inside an atomic block run inline, as usual, and the writes
+themselves must not depend on thread-local state other than the
+database connection.
+
+Callers wait at most TASK_WRITE_COALESCE_TIMEOUT seconds. If the writer
+thread dies, the writes it held and those queued behind them fail with
+its error, and the next write starts a new thread.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+STOP = object()
+
+
+class WriteCoalescer:
+    """A writer thread committing the writes submitted within ``window`` seconds together."""
+    def __init__(self, window=0.002, max_batch=64, using='default', timeout=30):
+        self.window = window
+        self.max_batch = max_batch
+        self.using = using
+        self.timeout = timeout
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+        self.batches = 0
+        self.writes = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            self._start()
+
+    def _start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='task-write-coalescer', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Finish the queued writes and stop the writer thread."""
+        with self._lock:
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            self.queue.put(STOP)
+            thread.join()
+
+    def submit(self, func, *args, **kwargs):
+        """Run ``func`` on the writer thread and return its result, or raise its exception, once committed."""
+        future = Future()
+        with self._lock:
+            # Queued under the lock, so a dying writer either fails this write or a new one takes it.
+            self._start()
+            self.queue.put((future, func, args, kwargs))
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # A write that has not started never will; one already running may still commit.
+            future.cancel()
+            raise
+
+    def next_batch(self):
+        """Block for one write, then gather those arriving within the window; the batch may end with STOP."""
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.window
+        while batch[-1] is not STOP and len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        connection = connections[self.using]
+        batch = []
+        try:
+            while True:
+                batch = self.next_batch()
+                stop = batch[-1] is STOP
+                if stop:
+                    batch.pop()
+                if batch:
+                    connection.close_if_unusable_or_obsolete()
+                    self.commit(batch)
+                if stop:
+                    return
+        except BaseException as e:
+            logger.exception('Task write coalescer for %r stopped', self.using)
+            self.fail_pending(batch, e)
+        finally:
+            connection.close()
+
+    def fail_pending(self, batch, exc):
+        """Fail the writes of a writer thread that died with ``exc``, and let the next write start another."""
+        error = exc if isinstance(exc, Exception) else RuntimeError(f'The task write coalescer stopped: {exc!r}')
+        with self._lock:
+            if self.thread is threading.current_thread():
+                self.thread = None
+            pending = list(batch)
+            while True:
+                try:
+                    pending.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+        for item in pending:
+            if item is not STOP:
+                try:
+                    item[0].set_exception(error)
+                except InvalidStateError:
+                    # Done already, or cancelled by a caller that timed out.
+                    pass
+
+    def commit(self, batch):
+        results = []
+        try:
+            with transaction.atomic(using=self.using):
+                for future, func, args, kwargs in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with transaction.atomic(using=self.using):
+                            results.append((future, func(*args, **kwargs), None))
+                    except Exception as e:
+                        results.append((future, None, e))
+        except Exception as e:
+            for future, _, _, _ in batch:
+                if not future.done():
+                    # The commit failed, so no write of the batch persisted.
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.writes += len(results)
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+_coalescers = {}
+_coalescers_lock = threading.Lock()
+
+
+def get_write_coalescer(using='default'):
+    with _coalescers_lock:
+        coalescer = _coalescers.get(using)
+        if coalescer is None:
+            coalescer = _coalescers[using] = WriteCoalescer(
+                settings.TASK_WRITE_COALESCE_WINDOW, settings.TASK_WRITE_COALESCE_MAX_BATCH, using,
+                settings.TASK_WRITE_COALESCE_TIMEOUT
+            )
+        return coalescer
+
+
+def stop_write_coalescers():
+    with _coalescers_lock:
+        coalescers = list(_coalescers.values())
+        _coalescers.clear()
+    for coalescer in coalescers:
+        coalescer.stop()
+
+
+def coalesced_write(func, *args, using='default', **kwargs):
+    """Run a task write through the coalescer when TASK_WRITE_COALESCING is on, else call it inline.
+
+    Writes inside an atomic block always run inline, in the caller's transaction.
+    """
+    if not settings.TASK_WRITE_COALESCING or transaction.get_connection(using).in_atomic_block:
+        return func(*args, **kwargs)
+    return get_write_coalescer(using).submit(func, *args, **kwargs)
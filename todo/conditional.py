@@ -0,0 +1,74 @@
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def make_etag(*parts):
+    """Strong ETag hashed from the parts' reprs."""
+    digest = hashlib.md5(repr(parts).encode('utf-8'), usedforsecurity=False).hexdigest()
+    return quote_etag(digest)
+
+
+def _microseconds(value):
+    delta = value - datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+    return (delta.days * 86400 + delta.seconds) * 10**6 + delta.microseconds
+
+
+def task_etag(task_id, updated_at):
+    """ETag for a single task: its id and updated_at in microseconds.
+
+    The value is reversible so an If-Match precondition can be checked in the
+    UPDATE's WHERE clause instead of by reading the row first.
+    """
+    return quote_etag(f'{task_id}.{_microseconds(updated_at)}')
+
+
+def parse_task_etag(etag):
+    """Return (task_id, updated_at) from a task ETag, or None if it is not one."""
+    try:
+        task_id, microseconds = etag.strip('"').split('.')
+        seconds, micro = divmod(int(microseconds), 10**6)
+        updated_at = datetime.fromtimestamp(seconds, tz=dt_timezone.utc).replace(microsecond=micro)
+        return int(task_id), updated_at
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def matching_task_versions(if_match, task_id):
+    """updated_at values of the If-Match tags that name task ``task_id``."""
+    parsed = [parse_task_etag(tag) for tag in parse_etags(if_match)]
+    return [value[1] for value in parsed if value is not None and value[0] == int(task_id)]
+
+
+def etag_in(header, etag, weak=True):
+    """Whether ``etag`` matches one of the tags in an If-Match/If-None-Match header.
+
+    If-None-Match uses the weak comparison (W/ prefixes ignored), If-Match
+    the strong one (RFC 9110 13.1).
+    """
+    if not header:
+        return False
+    tags = parse_etags(header)
+    if '*' in tags:
+        return True
+    if weak:
+        tags = [tag.removeprefix('W/') for tag in tags]
+    return etag in tags
+
+
+def not_modified(etag):
+    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+
+def precondition_failed(detail="The task was modified since it was last fetched"):
+    return Response(
+        {
+            "success": False,
+            "message": "Precondition failed",
+            "detail": detail
+        },
+        status=status.HTTP_412_PRECONDITION_FAILED
+    )
@@ -0,0 +1,101 @@
+"""Per-user task counters in UserTaskStats, maintained by database triggers.
+
+Triggers rather than code in Task.save keep every write path counted:
+bulk_create, bulk_update, queryset deletes, the raw UPDATE in
+transition_status and the importer's executemany all go through them, in
+the same transaction as the change. Readers use the counters only when
+the backend for the database vendor maintains them and TASK_STATS_COUNTERS
+is on; otherwise they fall back to COUNT queries.
+
+The triggers are created by migration 0007.
+On SQLite, a migration that rebuilds todo_task (most AlterFields) drops
+them; reinstall them afterwards, as 0009 does.
+``manage.py rebuild_task_stats`` checks and repairs the counters.
+"""
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count
+
+from .models import Task, UserTaskStats
+
+TASK_TABLE = Task._meta.db_table
+STATS_TABLE = UserTaskStats._meta.db_table
+STATUSES = [status for status, _ in Task.STATUS_CHOICES]
+
+
+def is_status(alias, status):
+    return f"CASE WHEN {alias}.status = '{status}' THEN 1 ELSE 0 END"
+
+
+class BaseTaskCounters:
+    """Databases without triggers: nothing is maintained and readers count rows."""
+    enabled = False
+
+    def __init__(self, using='default'):
+        self.using = using
+
+    def rebuild(self, user_ids=None):
+        """Recompute the counters of ``user_ids`` (every user by default) from the task table."""
+        connection = connections[self.using]
+        where, params = '', []
+        if user_ids is not None:
+            user_ids = list(user_ids)
+            if not user_ids:
+                return
+            where = f" WHERE user_id IN ({', '.join(['%s'] * len(user_ids))})"
+            params = user_ids
+        counts = ', '.join(f'SUM({is_status(TASK_TABLE, status)})' for status in STATUSES)
+        with transaction.atomic(using=self.using), connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {STATS_TABLE}{where}', params)
+            cursor.execute(
+                f"INSERT INTO {STATS_TABLE} (user_id, total, {', '.join(STATUSES)}, updated_at) "
+                f"SELECT user_id, COUNT(*), {counts}, MAX(updated_at) FROM {TASK_TABLE}{where} GROUP BY user_id",
+                params
+            )
+
+    def check(self):
+        """Return [(user_id, stored counts, actual counts)] for every user whose counters are wrong."""
+        actual = {}
+        rows = Task.objects.using(self.using).order_by().values('user_id', 'status').annotate(count=Count('pk'))
+        for row in rows:
+            counts = actual.setdefault(row['user_id'], dict.fromkeys(['total', *STATUSES], 0))
+            counts[row['status']] = row['count']
+            counts['total'] += row['count']
+        stored = {
+            row.pop('user_id'): row
+            for row in UserTaskStats.objects.using(self.using).values('user_id', 'total', *STATUSES)
+        }
+        empty = dict.fromkeys(['total', *STATUSES], 0)
+        return [
+            (user_id, stored.get(user_id, empty), actual.get(user_id, empty))
+            for user_id in sorted(actual.keys() | stored.keys())
+            if stored.get(user_id, empty) != actual.get(user_id, empty)
+        ]
+
+
+class SQLiteTaskCounters(BaseTaskCounters):
+    """Row triggers, inserting the user's row on their first task with UPSERT."""
+    enabled = True
+
+
+class PostgresTaskCounters(BaseTaskCounters):
+    """One PL/pgSQL row trigger for inserts, updates and deletes."""
+    enabled = True
+
+
+VENDOR_COUNTERS = {
+    'sqlite': SQLiteTaskCounters,
+    'postgresql': PostgresTaskCounters,
+}
+
+
+def get_counters_class(vendor):
+    return VENDOR_COUNTERS.get(vendor, BaseTaskCounters)
+
+
+def get_task_counters(using='default'):
+    return get_counters_class(connections[using].vendor)(using=using)
+
+
+def counters_enabled(using='default'):
+    return settings.TASK_STATS_COUNTERS and get_task_counters(using).enabled
@@ -0,0 +1,22 @@
+"""Execute wrappers that stay installed on every database connection.
+
+``connection.execute_wrapper()`` covers one connection for one block, but
+the request metrics, the N+1 check and the bench count queries on every
+connection, including those server threads open later. Their wrappers are
+installed once per connection and decide per query, from a context
+variable or the like, whether to do anything.
+"""
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+def install_execute_wrapper(wrapper, dispatch_uid):
+    """Add ``wrapper`` to every open connection and to each one opened from now on; idempotent."""
+    def install(sender=None, connection=None, **kwargs):
+        if wrapper not in connection.execute_wrappers:
+            # At the bottom: execute_wrapper() blocks pop() their own wrapper off the top.
+            connection.execute_wrappers.insert(0, wrapper)
+
+    connection_created.connect(install, weak=False, dispatch_uid=dispatch_uid)
+    for connection in connections.all(initialized_only=True):
+        install(connection=connection)
@@ -0,0 +1,164 @@
+"""Push task changes to connected clients over server-sent events.
+
+Views publish an event per write (``created``, ``updated``, ``deleted``,
+``status``, and ``sync`` for bulk writes and imports) once the transaction
+commits. The broker fans each event out to the subscriptions of the
+task's owner; ``/api/tasks/events/`` streams a subscription to the client.
+
+Every subscription has a bounded queue and publishers never wait on a
+slow client: when its queue is full the subscription is dropped, and the
+stream ends with a ``resync`` event telling the client to catch up
+through ``/api/tasks/sync/`` before it reconnects.
+
+The broker is chosen by TASK_EVENTS_BROKER. LocalTaskEventBroker only
+reaches clients connected to the same process; deployments with several
+workers plug in a broker backed by a shared channel.
+"""
+import asyncio
+import collections
+import functools
+import json
+import threading
+import weakref
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+RESYNC = object()
+# Reconnection delay the stream asks EventSource clients to use.
+RETRY_MS = 3000
+
+
+class TaskEventSubscription:
+    """One client's queue of events, consumed on the event loop it was created on."""
+    def __init__(self, broker, user_id, maxsize):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def put(self, event):
+        """Queue ``event`` from any thread."""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The loop is closed; the client is gone.
+            self.close()
+
+    def _put(self, event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            self.close()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class BaseTaskEventBroker:
+    """Pub/sub of task events by user. Subclasses deliver ``publish`` to matching ``subscribe`` calls."""
+    def subscribe(self, user_id, maxsize):
+        """Return a TaskEventSubscription for ``user_id``. Must be called on the consuming event loop."""
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+    def publish(self, user_id, event):
+        """Deliver ``event`` (a dict with ``event`` and ``data``) to the user's subscriptions without blocking."""
+        raise NotImplementedError
+
+
+class LocalTaskEventBroker(BaseTaskEventBroker):
+    """In-process broker. Subscriptions are held weakly, so an abandoned stream cannot leak its queue."""
+    def __init__(self):
+        self._subscriptions = collections.defaultdict(weakref.WeakSet)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id, maxsize):
+        subscription = TaskEventSubscription(self, user_id, maxsize)
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def subscriber_count(self, user_id):
+        with self._lock:
+            return len(self._subscriptions.get(user_id, ()))
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.put(event)
+
+
+@functools.lru_cache(maxsize=None)
+def load_broker(path):
+    return import_string(path)()
+
+
+def get_task_event_broker():
+    return load_broker(settings.TASK_EVENTS_BROKER)
+
+
+def publish_task_event(user_id, event, data=None, using=None):
+    """Publish an event to the user's streams once the current transaction commits, or now outside one."""
+    payload = {'event': event, 'data': data}
+    transaction.on_commit(lambda: get_task_event_broker().publish(user_id, payload), using=using)
+
+
+def publish_task_event_now(user_id, event, data=None):
+    """Publish at once; for async views, which write outside transactions."""
+    get_task_event_broker().publish(user_id, {'event': event, 'data': data})
+
+
+def format_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'.encode()
+
+
+async def event_stream(subscription, heartbeat, max_duration):
+    """Yield a subscription's events as SSE frames.
+
+    A comment line goes out after ``heartbeat`` seconds without events so
+    proxies keep the connection open. The stream ends after
+    ``max_duration`` seconds; clients reconnect and pick up new events,
+    which bounds how long a dead connection can linger unnoticed.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_duration
+    try:
+        yield f'retry: {RETRY_MS}\n\n'.encode()
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                event = await asyncio.wait_for(subscription.get(), min(heartbeat, remaining))
+            except asyncio.TimeoutError:
+                yield b': ping\n\n'
+                continue
+            if event is RESYNC:
+                yield format_event('resync', None)
+                return
+            yield format_event(event['event'], event['data'])
+    finally:
+        subscription.close()
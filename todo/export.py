@@ -0,0 +1,36 @@
+import csv
+import json
+from itertools import islice
+
+
+class Echo:
+    """File-like object whose write() returns the value, for streaming csv.writer output."""
+    def write(self, value):
+        return value
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def ndjson_lines(chunks):
+    """One JSON object per line, one string yielded per chunk of rows."""
+    for chunk in chunks:
+        yield ''.join(
+            json.dumps(item, ensure_ascii=False, separators=(',', ':')) + '\n' for item in chunk
+        )
+
+
+def csv_lines(chunks, fieldnames):
+    writer = csv.DictWriter(Echo(), fieldnames=fieldnames)
+    yield writer.writeheader()
+    for chunk in chunks:
+        yield ''.join(writer.writerow(item) for item in chunk)
+
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'tasks.ndjson'),
+    'csv': ('text/csv', 'tasks.csv'),
+}
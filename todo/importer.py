@@ -0,0 +1,129 @@
+import codecs
+import csv
+import json
+
+from django.conf import settings
+from django.db import transaction
+
+from .cache import invalidate_user_tasks
+from .events import publish_task_event
+from .models import Task
+from .search import get_search_backend
+from .serializers import TaskSerializer, TaskWritePlan
+from .shards import shard_for
+
+IMPORT_FORMATS = ('ndjson', 'csv')
+
+
+class ImportFormatError(Exception):
+    """The upload cannot be read past ``line``; rows before it were processed."""
+    def __init__(self, line, message):
+        super().__init__(message)
+        self.line = line
+
+
+def decode_lines(stream):
+    """Decode a binary stream line by line without reading it into memory."""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    for line_no, raw in enumerate(iter(stream.readline, b''), start=1):
+        try:
+            yield decoder.decode(raw)
+        except UnicodeDecodeError:
+            raise ImportFormatError(line_no, f'Line {line_no} is not valid UTF-8.')
+
+
+def read_records(stream, input_format):
+    """Yield (line number, data, errors) for each record of an NDJSON or CSV upload.
+
+    ``errors`` is None unless the line itself could not be parsed. Empty CSV
+    cells are left out so that model defaults apply.
+    """
+    lines = decode_lines(stream)
+    if input_format == 'csv':
+        reader = csv.DictReader(lines)
+        try:
+            for row in reader:
+                yield reader.line_num, {
+                    name: value for name, value in row.items() if name is not None and value != ''
+                }, None
+        except csv.Error as exc:
+            raise ImportFormatError(reader.line_num, f'Line {reader.line_num}: {exc}')
+        return
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as exc:
+            yield line_no, None, {'non_field_errors': [f'Invalid JSON: {exc}']}
+        else:
+            yield line_no, data, None
+
+
+class TaskImporter:
+    """Validate and insert tasks from a stream of records in fixed-size batches.
+
+    Each batch is validated with TaskSerializer's rules, its valid rows are
+    inserted with one executemany in one transaction (indexing them for
+    search in a single pass), and ``checkpoint`` then
+    advances to the batch's last line. Lines at or before ``start_line`` are
+    skipped, so an interrupted import resumes from its last checkpoint
+    without inserting anything twice. ``on_checkpoint`` is called after
+    every committed batch.
+    """
+    def __init__(self, user, batch_size=None, start_line=0, on_checkpoint=None):
+        self.user = user
+        self.batch_size = batch_size or settings.TASK_IMPORT_BATCH_SIZE
+        self.checkpoint = start_line
+        self.on_checkpoint = on_checkpoint
+        self.write_plan = TaskWritePlan(TaskSerializer())
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def run(self, records):
+        batch = []
+        for line, data, errors in records:
+            if line <= self.checkpoint:
+                continue
+            batch.append((line, data, errors))
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch)
+                batch = []
+        if batch:
+            self.import_batch(batch)
+        return self.result()
+
+    def import_batch(self, batch):
+        rows = []
+        for line, data, errors in batch:
+            if errors is None:
+                rows.append((line, data))
+            else:
+                self.add_error(line, errors)
+        validated, item_errors = self.write_plan.validate([data for _, data in rows])
+        for index, errors in item_errors.items():
+            self.add_error(rows[index][0], errors)
+        if validated:
+            shard = shard_for(self.user)
+            with transaction.atomic(using=shard), get_search_backend(shard).deferred_indexing():
+                Task.objects.insert_rows(validated, user=self.user)
+                invalidate_user_tasks(self.user.pk, using=shard)
+                publish_task_event(self.user.pk, 'sync', using=shard)
+        self.created += len(validated)
+        self.checkpoint = batch[-1][0]
+        if self.on_checkpoint is not None:
+            self.on_checkpoint(self.checkpoint)
+
+    def add_error(self, line, errors):
+        self.failed += 1
+        if len(self.errors) < settings.TASK_IMPORT_MAX_ERRORS:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def result(self):
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'checkpoint': self.checkpoint,
+            'errors': self.errors,
+        }
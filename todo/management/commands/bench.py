@@ -0,0 +1,114 @@
+import json
+import platform
+import random
+import sys
+from datetime import datetime, timezone as dt_timezone
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from todo.bench import (
+    TRANSPORTS, ASGITransport, Scenarios, compare, database_profile, run_scenario, seed, test_database
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the API against a throwaway seeded database and report p50/p95/p99 latency, "
+        "req/s and queries per request for each scenario and transport."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help="Seeded users.")
+        parser.add_argument('--tasks', type=int, default=1000, help="Seeded tasks per user.")
+        parser.add_argument(
+            '--description-size', type=int, nargs='+', default=[200],
+            help="Task description lengths in characters; the dataset is reseeded for each."
+        )
+        parser.add_argument('--scenario', nargs='+', choices=Scenarios.names, default=Scenarios.names)
+        parser.add_argument(
+            '--database-profile', nargs='+', choices=list(settings.DATABASE_PROFILES),
+            default=[settings.DATABASE_PROFILE],
+            help="Database connection profiles (settings.DATABASE_PROFILES) to run the scenarios under."
+        )
+        parser.add_argument('--transport', nargs='+', choices=list(TRANSPORTS), default=['client', 'wsgi'])
+        parser.add_argument(
+            '--write-coalescing', action='store_true',
+            help="Run with TASK_WRITE_COALESCING on, so concurrent task writes are committed together."
+        )
+        parser.add_argument('--requests', type=int, default=200, help="Requests per scenario.")
+        parser.add_argument('--concurrency', type=int, default=8, help="Requests in flight at once.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed for the dataset and requests.")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+        parser.add_argument('--compare', help="Results JSON of a previous run to check for regressions.")
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help="Fail when p95/p99 or req/s is worse than --compare by more than this fraction."
+        )
+
+    def handle(self, *args, **options):
+        if 'asgi' in options['transport'] and not ASGITransport.available():
+            raise CommandError("The asgi transport needs uvicorn (pip install uvicorn).")
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+
+        results = {
+            'started_at': datetime.now(dt_timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'argv': sys.argv[1:],
+            'runs': [],
+        }
+        self.stdout.write(
+            f"{'scenario':<10} {'transport':<9} {'profile':<10} {'desc':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'p99 ms':>8} {'queries':>8} {'errors':>7}"
+        )
+        for profile in options['database_profile']:
+            for description_size in options['description_size']:
+                with database_profile(profile), test_database(on_disk=True), \
+                        override_settings(TASK_WRITE_COALESCING=options['write_coalescing']):
+                    rng = random.Random(options['seed'])
+                    seeded = seed(options['users'], options['tasks'], description_size, rng)
+                    scenarios = Scenarios(seeded, rng)
+                    for transport_name in options['transport']:
+                        with TRANSPORTS[transport_name]().running() as transport:
+                            for name in options['scenario']:
+                                run = run_scenario(
+                                    transport, getattr(scenarios, name), options['requests'], options['concurrency']
+                                )
+                                key = f'{name}/{transport_name}/{description_size}'
+                                if profile != 'default':
+                                    key = f'{key}/{profile}'
+                                if options['write_coalescing']:
+                                    key = f'{key}/coalesced'
+                                run.update(
+                                    key=key, scenario=name, transport=transport_name, database_profile=profile,
+                                    write_coalescing=options['write_coalescing'],
+                                    users=options['users'], tasks_per_user=options['tasks'],
+                                    description_size=description_size, concurrency=options['concurrency'],
+                                )
+                                results['runs'].append(run)
+                                self.report(run)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+        if baseline is not None:
+            regressions = list(compare(results, baseline, options['threshold']))
+            for key, metric, before, after in regressions:
+                self.stderr.write(f'{key}: {metric} {before} -> {after}')
+            if regressions:
+                raise CommandError(f'{len(regressions)} regression(s) against {options["compare"]}')
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['compare']}"))
+
+    def report(self, run):
+        self.stdout.write(
+            f"{run['scenario']:<10} {run['transport']:<9} {run['database_profile']:<10} {run['description_size']:>6} "
+            f"{run['req_per_s']:>8.1f} {run['p50_ms']:>8.2f} {run['p95_ms']:>8.2f} {run['p99_ms']:>8.2f} "
+            f"{run['queries_per_request']:>8.2f} {run['errors']:>7}"
+        )
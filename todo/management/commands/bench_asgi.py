@@ -0,0 +1,116 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.test.client import AsyncRequestFactory, RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from todo.bench import test_database
+from todo.models import Task, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare sync WSGI and async ASGI throughput of task polling with many concurrent "
+        "requests. Runs in process against a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1000, help="Requests in flight at once.")
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--threads', type=int, default=32, help="WSGI worker threads.")
+        parser.add_argument('--endpoint', choices=['list', 'detail'], default='list')
+        parser.add_argument('--no-cache', action='store_true', help="Disable the task list response cache.")
+        parser.add_argument(
+            '--no-middleware', action='store_true',
+            help="Run without MIDDLEWARE. Under ASGI each MiddlewareMixin hook is a hop to the sync thread."
+        )
+
+    def handle(self, *args, **options):
+        overrides = {'TASK_LIST_CACHE': None if options['no_cache'] else 'tasks'}
+        if options['no_middleware']:
+            overrides['MIDDLEWARE'] = []
+        with test_database(), override_settings(**overrides):
+            self.run(options)
+
+    def run(self, options):
+        user = User.objects.create_user(fullname='Bench', phone='0000000000', email='bench@example.com',
+                                        password='bench')
+        due = timezone.now() + timedelta(days=30)
+        tasks = Task.objects.on_shard_of(user).bulk_create(
+            Task(title=f'Task {i}', description='Benchmark task', due_date=due, user=user) for i in range(50)
+        )
+        token = f'Bearer {RefreshToken.for_user(user).access_token}'
+        if options['endpoint'] == 'list':
+            sync_path, async_path = reverse('task-list'), reverse('async-task-list')
+        else:
+            sync_path = reverse('task-detail', args=[tasks[0].pk])
+            async_path = reverse('async-task-detail', args=[tasks[0].pk])
+
+        self.stdout.write(
+            f"{options['requests']} GET requests, {options['concurrency']} in flight, endpoint={options['endpoint']}"
+        )
+        self.stdout.write(f"{'server':<22} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        self.report(f"WSGI ({options['threads']} threads)", *self.bench_wsgi(sync_path, token, options))
+        self.report('ASGI (event loop)', *asyncio.run(self.bench_asgi(async_path, token, options)))
+
+    def report(self, label, elapsed, latencies, errors):
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f'{label:<22} {len(latencies) / elapsed:>9.0f} {statistics.median(latencies) * 1000:>9.1f} '
+            f'{p99 * 1000:>9.1f} {errors:>7}'
+        )
+
+    def bench_wsgi(self, path, token, options):
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        in_flight = threading.BoundedSemaphore(options['concurrency'])
+        latencies = []
+        errors = 0
+
+        def call(started):
+            response = handler.get_response(factory.get(path, HTTP_AUTHORIZATION=token))
+            in_flight.release()
+            return time.perf_counter() - started, response.status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            futures = []
+            for _ in range(options['requests']):
+                # Requests beyond the worker count wait in the queue, as they would behind a WSGI server.
+                in_flight.acquire()
+                futures.append(pool.submit(call, time.perf_counter()))
+            for future in futures:
+                latency, status_code = future.result()
+                latencies.append(latency)
+                errors += status_code != 200
+        return time.perf_counter() - start, latencies, errors
+
+    async def bench_asgi(self, path, token, options):
+        handler = ASGIHandler()
+        factory = AsyncRequestFactory()
+        in_flight = asyncio.Semaphore(options['concurrency'])
+        latencies = []
+        errors = 0
+
+        async def call():
+            nonlocal errors
+            async with in_flight:
+                started = time.perf_counter()
+                response = await handler.get_response_async(factory.get(path, headers={'Authorization': token}))
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code != 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(call() for _ in range(options['requests'])))
+        return time.perf_counter() - start, latencies, errors
@@ -0,0 +1,42 @@
+import timeit
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from todo.models import Task
+from todo.serializers import TaskSerializer, get_read_plan
+
+
+class Command(BaseCommand):
+    help = "Compare TaskSerializer with the fast read plan on in-memory task pages."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        plan = get_read_plan(TaskSerializer)
+        renderer = JSONRenderer()
+        now = timezone.now()
+        self.stdout.write(f"{'rows':>6} {'serializer ms':>14} {'plan ms':>10} {'speedup':>8}")
+        for size in options['sizes']:
+            tasks = [
+                Task(
+                    id=i, user_id=1, title=f'Task {i}', description='Benchmark task', status='pending',
+                    due_date=now + timedelta(days=i), created_at=now, updated_at=now,
+                    status_changed_at=now if i % 2 else None
+                )
+                for i in range(1, size + 1)
+            ]
+            rows = [{column: getattr(task, column) for column in plan.columns} for task in tasks]
+            if renderer.render(TaskSerializer(tasks, many=True).data) != renderer.render(plan.serialize(rows)):
+                raise AssertionError('read plan output differs from TaskSerializer')
+
+            number = max(1, 10000 // size)
+            slow = min(timeit.repeat(
+                lambda: TaskSerializer(tasks, many=True).data, number=number, repeat=options['repeat']
+            )) / number
+            fast = min(timeit.repeat(lambda: plan.serialize(rows), number=number, repeat=options['repeat'])) / number
+            self.stdout.write(f'{size:>6} {slow * 1000:>14.3f} {fast * 1000:>10.3f} {slow / fast:>7.1f}x')
@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from todo.changelog import compact, get_change_log
+
+
+class Command(BaseCommand):
+    help = "Delete superseded and expired rows from the task change log used by /api/tasks/sync/."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help="Keep changes from the last DAYS days (default and minimum: TASK_SYNC_RETENTION_DAYS, "
+                 "as cursors younger than that are still accepted)."
+        )
+
+    def handle(self, *args, **options):
+        if not get_change_log(options['database']).enabled:
+            raise CommandError('This database has no task change log triggers.')
+        retention_days = settings.TASK_SYNC_RETENTION_DAYS
+        days = options['days'] if options['days'] is not None else retention_days
+        if days < retention_days:
+            raise CommandError(f'--days must be at least TASK_SYNC_RETENTION_DAYS ({retention_days}).')
+        deleted = compact(timedelta(days=days), using=options['database'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} task change(s)'))
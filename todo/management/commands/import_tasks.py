@@ -0,0 +1,64 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from todo.importer import IMPORT_FORMATS, ImportFormatError, TaskImporter, read_records
+from todo.models import User
+
+
+class Command(BaseCommand):
+    help = "Import tasks for a user from an NDJSON or CSV file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True, help="Email or id of the user who will own the tasks.")
+        parser.add_argument('--input', choices=IMPORT_FORMATS, help="Defaults to csv for .csv files, else ndjson.")
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument(
+            '--checkpoint',
+            help="File recording the last committed line. An existing checkpoint resumes the import; "
+                 "it is removed once the import finishes."
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        if user.task_shard_moving:
+            raise CommandError("The user's tasks are being moved to another shard; import them once it is done.")
+        input_format = options['input'] or ('csv' if options['path'].lower().endswith('.csv') else 'ndjson')
+        checkpoint_path = options['checkpoint']
+        start_line = 0
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                start_line = int(f.read().strip() or 0)
+            self.stdout.write(f"Resuming after line {start_line}")
+
+        def save_checkpoint(line):
+            tmp_path = f'{checkpoint_path}.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(str(line))
+            os.replace(tmp_path, checkpoint_path)
+
+        importer = TaskImporter(
+            user, batch_size=options['batch_size'], start_line=start_line,
+            on_checkpoint=save_checkpoint if checkpoint_path else None
+        )
+        try:
+            with open(options['path'], 'rb') as stream:
+                result = importer.run(read_records(stream, input_format))
+        except ImportFormatError as exc:
+            raise CommandError(f"{exc} Rows up to line {importer.checkpoint} were imported.")
+
+        for error in result['errors']:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['created']} tasks, {result['failed']} rows failed."
+        ))
+
+    def get_user(self, value):
+        lookup = {'pk': value} if value.isdigit() else {'email': value}
+        try:
+            return User.objects.get(**lookup)
+        except User.DoesNotExist:
+            raise CommandError(f"User {value} does not exist.")
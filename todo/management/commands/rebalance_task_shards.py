@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from todo.models import Task, User
+from todo.shards import MoveConflict, hash_shard, move_user, placement_key, shard_for
+
+
+class Command(BaseCommand):
+    help = (
+        "Move users' tasks to the shard their email hashes to under the current TASK_SHARDS, "
+        "or the given users to --to, then print the users and tasks on each shard."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help="Only move this user id.")
+        parser.add_argument('--to', help="Move the --user users to this shard instead of their hashed one.")
+        parser.add_argument('--dry-run', action='store_true', help="Only list the moves.")
+
+    def handle(self, *args, **options):
+        target = options['to']
+        if target is not None:
+            if target not in settings.TASK_SHARDS:
+                raise CommandError(f"'{target}' is not in TASK_SHARDS.")
+            if not options['user_ids']:
+                raise CommandError('--to needs --user.')
+        users = User.objects.only('pk', 'email', 'task_shard').order_by('pk')
+        if options['user_ids']:
+            users = users.filter(pk__in=options['user_ids'])
+
+        moves = 0
+        for user in users.iterator():
+            source = shard_for(user)
+            destination = target or hash_shard(placement_key(user.email))
+            if source == destination:
+                continue
+            moves += 1
+            if options['dry_run']:
+                self.stdout.write(f'user {user.pk}: {source} -> {destination}')
+                continue
+            try:
+                moved = move_user(user, destination)
+            except MoveConflict as exc:
+                self.stderr.write(str(exc))
+                continue
+            self.stdout.write(f'user {user.pk}: moved {moved} task(s) from {source} to {destination}')
+
+        directory = dict(
+            User.objects.order_by().values_list('task_shard').annotate(count=Count('pk'))
+        )
+        directory['default'] = directory.get('default', 0) + directory.pop(None, 0) + directory.pop('', 0)
+        for alias in settings.TASK_SHARDS:
+            tasks = Task.objects.using(alias).count()
+            self.stdout.write(f'{alias}: {directory.get(alias, 0)} user(s), {tasks} task(s)')
+        verb = 'to move' if options['dry_run'] else 'moved'
+        self.stdout.write(self.style.SUCCESS(f'{moves} user(s) {verb}'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from todo.counters import get_task_counters
+
+
+class Command(BaseCommand):
+    help = "Check the per-user task counters (UserTaskStats) against the task table and repair them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Only report users whose counters are wrong, exiting non-zero if there are any."
+        )
+
+    def handle(self, *args, **options):
+        counters = get_task_counters(options['database'])
+        if not counters.enabled:
+            raise CommandError('This database has no task counter triggers; readers use COUNT queries.')
+        mismatches = counters.check()
+        for user_id, stored, actual in mismatches:
+            self.stdout.write(f'user {user_id}: stored {stored}, actual {actual}')
+        if options['check']:
+            if mismatches:
+                raise CommandError(f'{len(mismatches)} user(s) with wrong task counters')
+            self.stdout.write(self.style.SUCCESS('Task counters are consistent'))
+            return
+        if mismatches:
+            counters.rebuild(user_id for user_id, _, _ in mismatches)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt task counters for {len(mismatches)} user(s)'))
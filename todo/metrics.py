@@ -0,0 +1,240 @@
+"""Per-view request metrics: query count, SQL time, serialization time and total time.
+
+``RequestMetricsMiddleware`` samples a share of requests
+(``TASK_METRICS_SAMPLE_RATE``). For a sampled request it collects every
+query run on its behalf, on any connection and in any thread, since the
+collector travels in a context variable that sync_to_async copies along.
+Samples feed in-process histograms, exposed in the Prometheus text format
+at ``/metrics`` to a scraper holding ``TASK_METRICS_TOKEN`` or to staff,
+and, when ``TASK_METRICS_SERVER_TIMING`` is on, a ``Server-Timing`` header
+on the response. Each worker process keeps its own histograms; Prometheus
+aggregates them.
+"""
+import bisect
+import contextlib
+import contextvars
+import random
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from .dbwrappers import install_execute_wrapper
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_collector = contextvars.ContextVar('todo_request_metrics', default=None)
+
+
+class Histogram:
+    """Cumulative histogram with fixed upper bounds, safe to observe from many threads."""
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class MetricsRegistry:
+    """Named counters and histograms keyed by label values."""
+    metrics = {
+        'todo_requests_total': ('counter', 'Requests served, sampled or not.', None),
+        'todo_request_duration_seconds': ('histogram', 'Total time spent in the request.', DURATION_BUCKETS),
+        'todo_request_db_seconds': ('histogram', 'Time spent executing SQL.', DURATION_BUCKETS),
+        'todo_request_serialize_seconds': (
+            'histogram', 'Time spent serializing and rendering the response.', DURATION_BUCKETS
+        ),
+        'todo_request_queries': ('histogram', 'SQL queries run per request.', QUERY_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.values = {name: {} for name in self.metrics}
+
+    def increment(self, name, labels):
+        with self._lock:
+            series = self.values[name]
+            series[labels] = series.get(labels, 0) + 1
+
+    def observe(self, name, labels, value):
+        series = self.values[name]
+        histogram = series.get(labels)
+        if histogram is None:
+            with self._lock:
+                histogram = series.setdefault(labels, Histogram(self.metrics[name][2]))
+        histogram.observe(value)
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        for name, (kind, help_text, buckets) in self.metrics.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            with self._lock:
+                series = sorted(self.values[name].items())
+            for labels, value in series:
+                label_text = format_labels(labels)
+                if kind == 'counter':
+                    lines.append(f'{name}{{{label_text}}} {value}')
+                    continue
+                counts, total, count = value.snapshot()
+                cumulative = 0
+                for bound, bucket_count in zip([*buckets, '+Inf'], counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{label_text}}} {total}')
+                lines.append(f'{name}_count{{{label_text}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    return ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"')) for key, value in labels
+    )
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetrics:
+    """Timings collected for one sampled request."""
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper installed on every connection; a no-op unless a sampled request is running."""
+    metrics = _collector.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - started
+        metrics.queries += 1
+
+
+@contextlib.contextmanager
+def timing(phase):
+    """Add the time spent in the block to the current request's ``phase``_time."""
+    metrics = _collector.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(metrics, f'{phase}_time', getattr(metrics, f'{phase}_time') + time.perf_counter() - started)
+
+
+class RequestMetricsMiddleware:
+    """Sample requests into the registry and add a Server-Timing header to sampled responses.
+
+    Supports both sync and async requests natively, so under ASGI it does
+    not cost a thread hop. Place it first in MIDDLEWARE so the total
+    covers the rest of the stack.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        install_execute_wrapper(record_query, 'todo.metrics')
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics = self.start()
+        token = _collector.set(metrics) if metrics is not None else None
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                _collector.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = self.start()
+        token = _collector.set(metrics) if metrics is not None else None
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                _collector.reset(token)
+        return self.finish(request, response, metrics)
+
+    def start(self):
+        rate = settings.TASK_METRICS_SAMPLE_RATE
+        if rate >= 1 or (rate > 0 and random.random() < rate):
+            return RequestMetrics()
+        return None
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; time the render as serialization.
+        metrics = _collector.get()
+        if metrics is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                metrics.serialize_time += time.perf_counter() - started
+            response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, metrics):
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unmatched'
+        registry.increment('todo_requests_total', (
+            ('view', view), ('method', request.method), ('status', response.status_code)
+        ))
+        if metrics is None:
+            return response
+        total = time.perf_counter() - metrics.started
+        labels = (('view', view), ('method', request.method))
+        registry.observe('todo_request_duration_seconds', labels, total)
+        registry.observe('todo_request_db_seconds', labels, metrics.db_time)
+        registry.observe('todo_request_serialize_seconds', labels, metrics.serialize_time)
+        registry.observe('todo_request_queries', labels, metrics.queries)
+        if settings.TASK_METRICS_SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries} queries", '
+                f'serialize;dur={metrics.serialize_time * 1000:.2f}, '
+                f'total;dur={total * 1000:.2f}'
+            )
+        return response
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, for the bearer TASK_METRICS_TOKEN or a signed-in staff user."""
+    token = settings.TASK_METRICS_TOKEN
+    scraper = bool(token) and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not scraper and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+# Frozen like 0005: the old triggers are dropped and recreated so that
+# inserts skip the index while todo_task_fts_deferred has rows.
+REINSTALL_SQL = {
+    'sqlite': [
+        'DROP TRIGGER IF EXISTS todo_task_fts_ai',
+        'DROP TRIGGER IF EXISTS todo_task_fts_ad',
+        'DROP TRIGGER IF EXISTS todo_task_fts_au',
+        'DROP TABLE IF EXISTS todo_task_fts',
+        'DROP TABLE IF EXISTS todo_task_fts_deferred',
+        "CREATE VIRTUAL TABLE IF NOT EXISTS todo_task_fts USING fts5("
+        "title, description, content='todo_task', content_rowid='id', "
+        "prefix='2 3', tokenize='unicode61 remove_diacritics 2')",
+        'CREATE TABLE IF NOT EXISTS todo_task_fts_deferred (id INTEGER PRIMARY KEY)',
+        "CREATE TRIGGER IF NOT EXISTS todo_task_fts_ai AFTER INSERT ON todo_task "
+        "WHEN NOT EXISTS (SELECT 1 FROM todo_task_fts_deferred) BEGIN "
+        "INSERT INTO todo_task_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+        "CREATE TRIGGER IF NOT EXISTS todo_task_fts_ad AFTER DELETE ON todo_task BEGIN "
+        "INSERT INTO todo_task_fts(todo_task_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); END",
+        "CREATE TRIGGER IF NOT EXISTS todo_task_fts_au AFTER UPDATE OF title, description ON todo_task BEGIN "
+        "INSERT INTO todo_task_fts(todo_task_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); "
+        "INSERT INTO todo_task_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+        "INSERT INTO todo_task_fts(todo_task_fts) VALUES ('rebuild')",
+    ],
+}
+
+
+def reinstall_search_index(apps, schema_editor):
+    for sql in REINSTALL_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0005_task_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(reinstall_search_index, migrations.RunPython.noop),
+    ]
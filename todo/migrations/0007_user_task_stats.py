@@ -0,0 +1,138 @@
+# Generated by Django 5.2.1 on 2026-10-18 05:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# The statements are frozen here rather than taken from todo.counters, like
+# the search index SQL of 0005.
+INSTALL_SQL = {
+    'sqlite': [
+        "CREATE TRIGGER IF NOT EXISTS todo_task_stats_ai AFTER INSERT ON todo_task BEGIN "
+        "INSERT INTO todo_usertaskstats (user_id, total, pending, in_progress, completed, updated_at) "
+        "VALUES (new.user_id, 1, CASE WHEN new.status = 'pending' THEN 1 ELSE 0 END, "
+        "CASE WHEN new.status = 'in_progress' THEN 1 ELSE 0 END, CASE WHEN new.status = 'completed' THEN 1 ELSE 0 END, "
+        "strftime('%Y-%m-%d %H:%M:%f', 'now')) "
+        "ON CONFLICT (user_id) DO UPDATE SET total = total + 1, pending = pending + excluded.pending, "
+        "in_progress = in_progress + excluded.in_progress, completed = completed + excluded.completed, "
+        "updated_at = excluded.updated_at; END",
+        "CREATE TRIGGER IF NOT EXISTS todo_task_stats_ad AFTER DELETE ON todo_task BEGIN "
+        "UPDATE todo_usertaskstats SET total = total - 1, "
+        "pending = pending - CASE WHEN old.status = 'pending' THEN 1 ELSE 0 END, "
+        "in_progress = in_progress - CASE WHEN old.status = 'in_progress' THEN 1 ELSE 0 END, "
+        "completed = completed - CASE WHEN old.status = 'completed' THEN 1 ELSE 0 END, "
+        "updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE user_id = old.user_id; END",
+        "CREATE TRIGGER IF NOT EXISTS todo_task_stats_au AFTER UPDATE ON todo_task "
+        "WHEN old.user_id = new.user_id BEGIN "
+        "UPDATE todo_usertaskstats SET "
+        "pending = pending - CASE WHEN old.status = 'pending' THEN 1 ELSE 0 END "
+        "+ CASE WHEN new.status = 'pending' THEN 1 ELSE 0 END, "
+        "in_progress = in_progress - CASE WHEN old.status = 'in_progress' THEN 1 ELSE 0 END "
+        "+ CASE WHEN new.status = 'in_progress' THEN 1 ELSE 0 END, "
+        "completed = completed - CASE WHEN old.status = 'completed' THEN 1 ELSE 0 END "
+        "+ CASE WHEN new.status = 'completed' THEN 1 ELSE 0 END, "
+        "updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE user_id = new.user_id; END",
+        "CREATE TRIGGER IF NOT EXISTS todo_task_stats_au_user AFTER UPDATE OF user_id ON todo_task "
+        "WHEN old.user_id <> new.user_id BEGIN "
+        "UPDATE todo_usertaskstats SET total = total - 1, "
+        "pending = pending - CASE WHEN old.status = 'pending' THEN 1 ELSE 0 END, "
+        "in_progress = in_progress - CASE WHEN old.status = 'in_progress' THEN 1 ELSE 0 END, "
+        "completed = completed - CASE WHEN old.status = 'completed' THEN 1 ELSE 0 END, "
+        "updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE user_id = old.user_id; "
+        "INSERT INTO todo_usertaskstats (user_id, total, pending, in_progress, completed, updated_at) "
+        "VALUES (new.user_id, 1, CASE WHEN new.status = 'pending' THEN 1 ELSE 0 END, "
+        "CASE WHEN new.status = 'in_progress' THEN 1 ELSE 0 END, CASE WHEN new.status = 'completed' THEN 1 ELSE 0 END, "
+        "strftime('%Y-%m-%d %H:%M:%f', 'now')) "
+        "ON CONFLICT (user_id) DO UPDATE SET total = total + 1, pending = pending + excluded.pending, "
+        "in_progress = in_progress + excluded.in_progress, completed = completed + excluded.completed, "
+        "updated_at = excluded.updated_at; END",
+    ],
+    'postgresql': [
+        "CREATE OR REPLACE FUNCTION todo_task_stats() RETURNS trigger AS $$ BEGIN "
+        "IF TG_OP = 'UPDATE' AND OLD.user_id = NEW.user_id THEN "
+        "UPDATE todo_usertaskstats SET "
+        "pending = pending - CASE WHEN OLD.status = 'pending' THEN 1 ELSE 0 END "
+        "+ CASE WHEN NEW.status = 'pending' THEN 1 ELSE 0 END, "
+        "in_progress = in_progress - CASE WHEN OLD.status = 'in_progress' THEN 1 ELSE 0 END "
+        "+ CASE WHEN NEW.status = 'in_progress' THEN 1 ELSE 0 END, "
+        "completed = completed - CASE WHEN OLD.status = 'completed' THEN 1 ELSE 0 END "
+        "+ CASE WHEN NEW.status = 'completed' THEN 1 ELSE 0 END, "
+        "updated_at = now() WHERE user_id = NEW.user_id; RETURN NULL; END IF; "
+        "IF TG_OP IN ('UPDATE', 'DELETE') THEN "
+        "UPDATE todo_usertaskstats SET total = total - 1, "
+        "pending = pending - CASE WHEN OLD.status = 'pending' THEN 1 ELSE 0 END, "
+        "in_progress = in_progress - CASE WHEN OLD.status = 'in_progress' THEN 1 ELSE 0 END, "
+        "completed = completed - CASE WHEN OLD.status = 'completed' THEN 1 ELSE 0 END, "
+        "updated_at = now() WHERE user_id = OLD.user_id; END IF; "
+        "IF TG_OP IN ('UPDATE', 'INSERT') THEN "
+        "INSERT INTO todo_usertaskstats (user_id, total, pending, in_progress, completed, updated_at) "
+        "VALUES (NEW.user_id, 1, CASE WHEN NEW.status = 'pending' THEN 1 ELSE 0 END, "
+        "CASE WHEN NEW.status = 'in_progress' THEN 1 ELSE 0 END, CASE WHEN NEW.status = 'completed' THEN 1 ELSE 0 END, "
+        "now()) "
+        "ON CONFLICT (user_id) DO UPDATE SET total = todo_usertaskstats.total + 1, "
+        "pending = todo_usertaskstats.pending + excluded.pending, "
+        "in_progress = todo_usertaskstats.in_progress + excluded.in_progress, "
+        "completed = todo_usertaskstats.completed + excluded.completed, "
+        "updated_at = excluded.updated_at; END IF; "
+        "RETURN NULL; END $$ LANGUAGE plpgsql",
+        'DROP TRIGGER IF EXISTS todo_task_stats ON todo_task',
+        'CREATE TRIGGER todo_task_stats AFTER INSERT OR UPDATE OR DELETE ON todo_task '
+        'FOR EACH ROW EXECUTE FUNCTION todo_task_stats()',
+    ],
+}
+
+UNINSTALL_SQL = {
+    'sqlite': [
+        'DROP TRIGGER IF EXISTS todo_task_stats_ai',
+        'DROP TRIGGER IF EXISTS todo_task_stats_ad',
+        'DROP TRIGGER IF EXISTS todo_task_stats_au',
+        'DROP TRIGGER IF EXISTS todo_task_stats_au_user',
+    ],
+    'postgresql': [
+        'DROP TRIGGER IF EXISTS todo_task_stats ON todo_task',
+        'DROP FUNCTION IF EXISTS todo_task_stats()',
+    ],
+}
+
+# Counts the existing tasks, on every vendor.
+REBUILD_SQL = [
+    'DELETE FROM todo_usertaskstats',
+    "INSERT INTO todo_usertaskstats (user_id, total, pending, in_progress, completed, updated_at) "
+    "SELECT user_id, COUNT(*), "
+    "SUM(CASE WHEN todo_task.status = 'pending' THEN 1 ELSE 0 END), "
+    "SUM(CASE WHEN todo_task.status = 'in_progress' THEN 1 ELSE 0 END), "
+    "SUM(CASE WHEN todo_task.status = 'completed' THEN 1 ELSE 0 END), "
+    "MAX(updated_at) FROM todo_task GROUP BY user_id",
+]
+
+
+def install_task_counters(apps, schema_editor):
+    for sql in INSTALL_SQL.get(schema_editor.connection.vendor, []) + REBUILD_SQL:
+        schema_editor.execute(sql)
+
+
+def uninstall_task_counters(apps, schema_editor):
+    for sql in UNINSTALL_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0006_task_search_deferred_indexing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTaskStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='task_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total', models.IntegerField(default=0)),
+                ('pending', models.IntegerField(default=0)),
+                ('in_progress', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.RunPython(install_task_counters, uninstall_task_counters),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.1 on 2026-10-18 05:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# The statements are frozen here rather than taken from todo.changelog, like
+# the search index SQL of 0005.
+INSTALL_SQL = {
+    'sqlite': [
+        "CREATE TRIGGER IF NOT EXISTS todo_task_change_ai AFTER INSERT ON todo_task BEGIN "
+        "INSERT INTO todo_taskchange (user_id, task_id, changed_at) "
+        "VALUES (new.user_id, new.id, strftime('%Y-%m-%d %H:%M:%f', 'now')); END",
+        "CREATE TRIGGER IF NOT EXISTS todo_task_change_ad AFTER DELETE ON todo_task BEGIN "
+        "INSERT INTO todo_taskchange (user_id, task_id, changed_at) "
+        "VALUES (old.user_id, old.id, strftime('%Y-%m-%d %H:%M:%f', 'now')); END",
+        "CREATE TRIGGER IF NOT EXISTS todo_task_change_au AFTER UPDATE ON todo_task BEGIN "
+        "INSERT INTO todo_taskchange (user_id, task_id, changed_at) "
+        "VALUES (new.user_id, new.id, strftime('%Y-%m-%d %H:%M:%f', 'now')); END",
+        "CREATE TRIGGER IF NOT EXISTS todo_task_change_au_user AFTER UPDATE OF user_id ON todo_task "
+        "WHEN old.user_id <> new.user_id BEGIN "
+        "INSERT INTO todo_taskchange (user_id, task_id, changed_at) "
+        "VALUES (old.user_id, old.id, strftime('%Y-%m-%d %H:%M:%f', 'now')); END",
+    ],
+    'postgresql': [
+        "CREATE OR REPLACE FUNCTION todo_task_change() RETURNS trigger AS $$ BEGIN "
+        "IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND OLD.user_id <> NEW.user_id) THEN "
+        "INSERT INTO todo_taskchange (user_id, task_id, changed_at) VALUES (OLD.user_id, OLD.id, now()); END IF; "
+        "IF TG_OP IN ('INSERT', 'UPDATE') THEN "
+        "INSERT INTO todo_taskchange (user_id, task_id, changed_at) VALUES (NEW.user_id, NEW.id, now()); END IF; "
+        "RETURN NULL; END $$ LANGUAGE plpgsql",
+        'DROP TRIGGER IF EXISTS todo_task_change ON todo_task',
+        'CREATE TRIGGER todo_task_change AFTER INSERT OR UPDATE OR DELETE ON todo_task '
+        'FOR EACH ROW EXECUTE FUNCTION todo_task_change()',
+    ],
+}
+
+UNINSTALL_SQL = {
+    'sqlite': [
+        'DROP TRIGGER IF EXISTS todo_task_change_ai',
+        'DROP TRIGGER IF EXISTS todo_task_change_ad',
+        'DROP TRIGGER IF EXISTS todo_task_change_au',
+        'DROP TRIGGER IF EXISTS todo_task_change_au_user',
+    ],
+    'postgresql': [
+        'DROP TRIGGER IF EXISTS todo_task_change ON todo_task',
+        'DROP FUNCTION IF EXISTS todo_task_change()',
+    ],
+}
+
+
+def install_change_log(apps, schema_editor):
+    for sql in INSTALL_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def uninstall_change_log(apps, schema_editor):
+    for sql in UNINSTALL_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0007_user_task_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.BigIntegerField()),
+                ('changed_at', models.DateTimeField()),
+                ('user', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'id'], name='taskchange_user_id_idx')],
+            },
+        ),
+        migrations.RunPython(install_change_log, uninstall_change_log),
+    ]
@@ -0,0 +1,123 @@
+# Generated by Django 5.2.1 on 2026-10-18 06:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# SQLite rebuilds todo_task to drop the user foreign key constraint, which
+# drops its triggers; these put back the search index, counter and change
+# log triggers as 0006, 0007 and 0008 left them. Frozen like 0005.
+REINSTALL_SQL = {
+    'sqlite': [
+        'DROP TRIGGER IF EXISTS todo_task_fts_ai',
+        'DROP TRIGGER IF EXISTS todo_task_fts_ad',
+        'DROP TRIGGER IF EXISTS todo_task_fts_au',
+        'DROP TABLE IF EXISTS todo_task_fts',
+        'DROP TABLE IF EXISTS todo_task_fts_deferred',
+        "CREATE VIRTUAL TABLE IF NOT EXISTS todo_task_fts USING fts5("
+        "title, description, content='todo_task', content_rowid='id', "
+        "prefix='2 3', tokenize='unicode61 remove_diacritics 2')",
+        'CREATE TABLE IF NOT EXISTS todo_task_fts_deferred (id INTEGER PRIMARY KEY)',
+        "CREATE TRIGGER IF NOT EXISTS todo_task_fts_ai AFTER INSERT ON todo_task "
+        "WHEN NOT EXISTS (SELECT 1 FROM todo_task_fts_deferred) BEGIN "
+        "INSERT INTO todo_task_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+        "CREATE TRIGGER IF NOT EXISTS todo_task_fts_ad AFTER DELETE ON todo_task BEGIN "
+        "INSERT INTO todo_task_fts(todo_task_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); END",
+        "CREATE TRIGGER IF NOT EXISTS todo_task_fts_au AFTER UPDATE OF title, description ON todo_task BEGIN "
+        "INSERT INTO todo_task_fts(todo_task_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); "
+        "INSERT INTO todo_task_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+        "INSERT INTO todo_task_fts(todo_task_fts) VALUES ('rebuild')",
+        'DROP TRIGGER IF EXISTS todo_task_stats_ai',
+        'DROP TRIGGER IF EXISTS todo_task_stats_ad',
+        'DROP TRIGGER IF EXISTS todo_task_stats_au',
+        'DROP TRIGGER IF EXISTS todo_task_stats_au_user',
+        "CREATE TRIGGER IF NOT EXISTS todo_task_stats_ai AFTER INSERT ON todo_task BEGIN "
+        "INSERT INTO todo_usertaskstats (user_id, total, pending, in_progress, completed, updated_at) "
+        "VALUES (new.user_id, 1, CASE WHEN new.status = 'pending' THEN 1 ELSE 0 END, "
+        "CASE WHEN new.status = 'in_progress' THEN 1 ELSE 0 END, CASE WHEN new.status = 'completed' THEN 1 ELSE 0 END, "
+        "strftime('%Y-%m-%d %H:%M:%f', 'now')) "
+        "ON CONFLICT (user_id) DO UPDATE SET total = total + 1, pending = pending + excluded.pending, "
+        "in_progress = in_progress + excluded.in_progress, completed = completed + excluded.completed, "
+        "updated_at = excluded.updated_at; END",
+        "CREATE TRIGGER IF NOT EXISTS todo_task_stats_ad AFTER DELETE ON todo_task BEGIN "
+        "UPDATE todo_usertaskstats SET total = total - 1, "
+        "pending = pending - CASE WHEN old.status = 'pending' THEN 1 ELSE 0 END, "
+        "in_progress = in_progress - CASE WHEN old.status = 'in_progress' THEN 1 ELSE 0 END, "
+        "completed = completed - CASE WHEN old.status = 'completed' THEN 1 ELSE 0 END, "
+        "updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE user_id = old.user_id; END",
+        "CREATE TRIGGER IF NOT EXISTS todo_task_stats_au AFTER UPDATE ON todo_task "
+        "WHEN old.user_id = new.user_id BEGIN "
+        "UPDATE todo_usertaskstats SET "
+        "pending = pending - CASE WHEN old.status = 'pending' THEN 1 ELSE 0 END "
+        "+ CASE WHEN new.status = 'pending' THEN 1 ELSE 0 END, "
+        "in_progress = in_progress - CASE WHEN old.status = 'in_progress' THEN 1 ELSE 0 END "
+        "+ CASE WHEN new.status = 'in_progress' THEN 1 ELSE 0 END, "
+        "completed = completed - CASE WHEN old.status = 'completed' THEN 1 ELSE 0 END "
+        "+ CASE WHEN new.status = 'completed' THEN 1 ELSE 0 END, "
+        "updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE user_id = new.user_id; END",
+        "CREATE TRIGGER IF NOT EXISTS todo_task_stats_au_user AFTER UPDATE OF user_id ON todo_task "
+        "WHEN old.user_id <> new.user_id BEGIN "
+        "UPDATE todo_usertaskstats SET total = total - 1, "
+        "pending = pending - CASE WHEN old.status = 'pending' THEN 1 ELSE 0 END, "
+        "in_progress = in_progress - CASE WHEN old.status = 'in_progress' THEN 1 ELSE 0 END, "
+        "completed = completed - CASE WHEN old.status = 'completed' THEN 1 ELSE 0 END, "
+        "updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE user_id = old.user_id; "
+        "INSERT INTO todo_usertaskstats (user_id, total, pending, in_progress, completed, updated_at) "
+        "VALUES (new.user_id, 1, CASE WHEN new.status = 'pending' THEN 1 ELSE 0 END, "
+        "CASE WHEN new.status = 'in_progress' THEN 1 ELSE 0 END, CASE WHEN new.status = 'completed' THEN 1 ELSE 0 END, "
+        "strftime('%Y-%m-%d %H:%M:%f', 'now')) "
+        "ON CONFLICT (user_id) DO UPDATE SET total = total + 1, pending = pending + excluded.pending, "
+        "in_progress = in_progress + excluded.in_progress, completed = completed + excluded.completed, "
+        "updated_at = excluded.updated_at; END",
+        'DROP TRIGGER IF EXISTS todo_task_change_ai',
+        'DROP TRIGGER IF EXISTS todo_task_change_ad',
+        'DROP TRIGGER IF EXISTS todo_task_change_au',
+        'DROP TRIGGER IF EXISTS todo_task_change_au_user',
+        "CREATE TRIGGER IF NOT EXISTS todo_task_change_ai AFTER INSERT ON todo_task BEGIN "
+        "INSERT INTO todo_taskchange (user_id, task_id, changed_at) "
+        "VALUES (new.user_id, new.id, strftime('%Y-%m-%d %H:%M:%f', 'now')); END",
+        "CREATE TRIGGER IF NOT EXISTS todo_task_change_ad AFTER DELETE ON todo_task BEGIN "
+        "INSERT INTO todo_taskchange (user_id, task_id, changed_at) "
+        "VALUES (old.user_id, old.id, strftime('%Y-%m-%d %H:%M:%f', 'now')); END",
+        "CREATE TRIGGER IF NOT EXISTS todo_task_change_au AFTER UPDATE ON todo_task BEGIN "
+        "INSERT INTO todo_taskchange (user_id, task_id, changed_at) "
+        "VALUES (new.user_id, new.id, strftime('%Y-%m-%d %H:%M:%f', 'now')); END",
+        "CREATE TRIGGER IF NOT EXISTS todo_task_change_au_user AFTER UPDATE OF user_id ON todo_task "
+        "WHEN old.user_id <> new.user_id BEGIN "
+        "INSERT INTO todo_taskchange (user_id, task_id, changed_at) "
+        "VALUES (old.user_id, old.id, strftime('%Y-%m-%d %H:%M:%f', 'now')); END",
+    ],
+}
+
+
+def reinstall_task_triggers(apps, schema_editor):
+    for sql in REINSTALL_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0008_task_change_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='task_shard',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='usertaskstats',
+            name='user',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='task_stats', serialize=False, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(reinstall_task_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.1 on 2026-10-18 06:06
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def clear_duplicate_phones(apps, schema_editor):
+    # Blank phones become NULL, and a phone shared by several users stays with the earliest.
+    User = apps.get_model('todo', 'User')
+    users = User.objects.using(schema_editor.connection.alias)
+    users.filter(phone='').update(phone=None)
+    duplicates = list(
+        users.exclude(phone=None).order_by().values('phone').annotate(count=Count('pk'))
+        .filter(count__gt=1).values_list('phone', flat=True)
+    )
+    for phone in duplicates:
+        keep = users.filter(phone=phone).order_by('pk').values_list('pk', flat=True)[0]
+        users.filter(phone=phone).exclude(pk=keep).update(phone=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0009_task_shards'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='phone',
+            field=models.CharField(max_length=20, null=True),
+        ),
+        migrations.RunPython(clear_duplicate_phones, migrations.RunPython.noop, hints={'model_name': 'user'}),
+        migrations.AlterField(
+            model_name='user',
+            name='phone',
+            field=models.CharField(max_length=20, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-18 06:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0010_user_phone_unique'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_user_open_due_idx',
+        ),
+        # Drop the foreign key's own index directly: AlterField would rebuild
+        # todo_task on SQLite and drop its triggers.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='task',
+                    name='user',
+                    field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    'DROP INDEX IF EXISTS todo_task_user_id_69f329a5',
+                    'CREATE INDEX todo_task_user_id_69f329a5 ON todo_task (user_id)',
+                    hints={'model_name': 'task'},
+                ),
+            ],
+        ),
+    ]
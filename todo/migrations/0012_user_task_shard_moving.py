@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0011_drop_redundant_task_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='task_shard_moving',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,13 +1,26 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
-from django.db import models
+from asgiref.sync import sync_to_async
+from django.db import models, connections, router, transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Window
+from django.db.models.functions import RowNumber
+from django.db.models.expressions import Col
 from django.utils import timezone
-from datetime import datetime
+from datetime import datetime, timedelta
+
+from .shards import hash_shard, placement_key, shard_for
 
 class CustomUserManager(BaseUserManager):
     def create_user(self, fullname, phone, email, password=None):
         if not email:
             raise ValueError("Users must have an email")
-        user = self.model(email=self.normalize_email(email))
+        email = self.normalize_email(email)
+        user = self.model(
+            fullname=fullname,
+            # Unknown phones are NULL, which the unique constraint lets repeat.
+            phone=phone or None,
+            email=email,
+            task_shard=hash_shard(placement_key(email)),
+        )
         user.set_password(password)
         user.save(using = self._db)
         return user
@@ -20,10 +33,14 @@ class CustomUserManager(BaseUserManager):
 
 class User(AbstractBaseUser, PermissionsMixin):
     fullname = models.CharField(max_length = 20)
-    phone = models.CharField(max_length = 20)
+    phone = models.CharField(max_length = 20, unique = True, null = True)
     email = models.EmailField(unique = True)
     is_active = models.BooleanField(default = True)
     is_admin = models.BooleanField(default = False)
+    # The database alias holding the user's tasks (see todo.shards); empty means 'default'.
+    task_shard = models.CharField(max_length = 100, null = True, blank = True)
+    # Set while move_user copies the tasks to another shard; task writes are refused meanwhile.
+    task_shard_moving = models.BooleanField(default = False)
 
     objects = CustomUserManager()
     USERNAME_FIELD = "email"
@@ -43,12 +60,225 @@ class User(AbstractBaseUser, PermissionsMixin):
         return self.is_admin
 
 
+class StaleTaskError(Exception):
+    """A conditional save found the task modified since it was loaded."""
+
+
+class UserScopedQuerySet(models.QuerySet):
+    """Rows that belong to a user and live on the user's shard (see todo.shards)."""
+    def for_user(self, user):
+        return self.on_shard_of(user).filter(user=user)
+
+    def on_shard_of(self, user):
+        """This queryset on the database holding ``user``'s rows."""
+        shard = shard_for(user)
+        if self._db is not None or shard == 'default':
+            return self
+        return self.using(shard)
+
+
+class TaskQuerySet(UserScopedQuerySet):
+    def overdue(self, now=None):
+        """Open tasks whose due date has passed."""
+        return self.filter(overdue_q(now or timezone.now()))
+
+    def stats(self, now=None, counts=None):
+        """Dashboard counts for these tasks.
+
+        Counts by status, overdue open tasks and open tasks due today or
+        by the end of the current week (Monday to Sunday, in the current
+        time zone) come from one aggregate query. ``counts`` (total and
+        by_status, e.g. from UserTaskStats) saves counting every row: the
+        query then only reads the open tasks due before next week. The
+        median completion time, from creation to the status change of
+        completed tasks, takes one more query.
+        """
+        now = now or timezone.now()
+        today = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+        tomorrow = today + timedelta(days=1)
+        next_week = today + timedelta(days=7 - today.weekday())
+        due_counts = {
+            'overdue': Count('pk', filter=overdue_q(now)),
+            'due_today': Count('pk', filter=Q(due_date__gte=today, due_date__lt=tomorrow)),
+            'due_this_week': Count('pk', filter=Q(due_date__gte=today)),
+        }
+        if counts is None:
+            # Every column here is in task_user_status_due_idx, so SQLite answers from that index alone.
+            is_open = Q(status__in=Task.OPEN_STATUSES)
+            due_before_next_week = is_open & Q(due_date__lt=next_week)
+            result = self.aggregate(
+                total=Count('pk'),
+                **{
+                    status: Count('pk', filter=Q(status=status))
+                    for status, _ in Task.STATUS_CHOICES
+                },
+                **{
+                    name: Count('pk', filter=due_before_next_week & aggregate.filter)
+                    for name, aggregate in due_counts.items()
+                },
+            )
+            counts = {
+                'total': result['total'],
+                'by_status': {status: result[status] for status, _ in Task.STATUS_CHOICES},
+            }
+        else:
+            # Range scans of task_user_status_due_idx, one per open status.
+            result = self.filter(status__in=Task.OPEN_STATUSES, due_date__lt=next_week).aggregate(**due_counts)
+        return {
+            **counts,
+            'overdue': result['overdue'],
+            'due_today': result['due_today'],
+            'due_this_week': result['due_this_week'],
+            'median_completion_seconds': (
+                self.median_completion() if counts['by_status']['completed'] else None
+            ),
+        }
+
+    def median_completion(self):
+        """Median seconds from creation to the status change of completed tasks, or None.
+
+        Numbers the rows by completion time in the database and returns only
+        the middle one or two.
+        """
+        completion = ExpressionWrapper(F('status_changed_at') - F('created_at'), output_field=DurationField())
+        durations = list(
+            self.filter(status='completed', status_changed_at__isnull=False)
+            .annotate(
+                completion=completion,
+                position=Window(RowNumber(), order_by=completion.asc()),
+                count=Window(Count('pk')),
+            )
+            .filter(Q(position=(F('count') + 1) / 2) | Q(position=(F('count') + 2) / 2))
+            .values_list('completion', flat=True)
+        )
+        if not durations:
+            return None
+        return sum(duration.total_seconds() for duration in durations) / len(durations)
+
+    def transition_status(self, pk, user, status, expected_status=None, expected_updated_at=None):
+        """Set a task's status with one conditional UPDATE.
+
+        status_changed_at and updated_at only move when the status actually
+        changes. Returns the updated row as a dict, or None when no task with
+        this pk belongs to the user (or a precondition did not match).
+        """
+        tasks = self.on_shard_of(user)
+        connection = connections[tasks.db]
+        qn = connection.ops.quote_name
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        returning = ['id', 'status', 'status_changed_at', 'updated_at']
+
+        sql = (
+            f"UPDATE {qn(self.model._meta.db_table)} SET "
+            f"{qn('status_changed_at')} = CASE WHEN {qn('status')} <> %s THEN %s ELSE {qn('status_changed_at')} END, "
+            f"{qn('updated_at')} = CASE WHEN {qn('status')} <> %s THEN %s ELSE {qn('updated_at')} END, "
+            f"{qn('status')} = %s "
+            f"WHERE {qn('id')} = %s AND {qn('user_id')} = %s"
+        )
+        params = [status, now, status, now, status, pk, user.pk]
+        if expected_status is not None:
+            sql += f" AND {qn('status')} = %s"
+            params.append(expected_status)
+        if expected_updated_at is not None:
+            sql += f" AND {qn('updated_at')} = %s"
+            params.append(connection.ops.adapt_datetimefield_value(expected_updated_at))
+
+        if not supports_update_returning(connection):
+            with transaction.atomic(using=tasks.db):
+                with connection.cursor() as cursor:
+                    cursor.execute(sql, params)
+                    if not cursor.rowcount:
+                        return None
+                return tasks.filter(pk=pk).values(*returning).get()
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"{sql} RETURNING {', '.join(qn(name) for name in returning)}", params)
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        return tasks._convert_row(connection, returning, row)
+
+    async def atransition_status(self, *args, **kwargs):
+        return await sync_to_async(self.transition_status)(*args, **kwargs)
+
+    def insert_rows(self, rows, **common):
+        """INSERT plain field-name dicts with a single executemany.
+
+        Like bulk_create without the model instances and per-batch SQL
+        compilation, which dominate large imports. ``common`` values apply to
+        every row; other missing fields take their defaults, and auto_now /
+        auto_now_add fields the current time. Sends no signals and returns
+        no ids. Rows go to the shard of ``common``'s user, when it is a User.
+        """
+        user = common.get('user')
+        if isinstance(user, models.Model):
+            return self.on_shard_of(user)._insert_rows(rows, common)
+        return self._insert_rows(rows, common)
+
+    def _insert_rows(self, rows, common):
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        now = timezone.now()
+        fields = [field for field in self.model._meta.concrete_fields if not field.primary_key]
+        constants = {}
+        for field in fields:
+            if field.attname in common or field.name in common:
+                value = common.get(field.attname, common.get(field.name))
+                if field.is_relation and isinstance(value, models.Model):
+                    value = value.pk
+            elif getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                value = now
+            else:
+                value = field.get_default()
+            constants[field.name] = field.get_db_prep_save(value, connection)
+
+        sql = "INSERT INTO {} ({}) VALUES ({})".format(
+            qn(self.model._meta.db_table),
+            ', '.join(qn(field.column) for field in fields),
+            ', '.join(['%s'] * len(fields))
+        )
+        params = [
+            [
+                field.get_db_prep_save(row[field.name], connection) if field.name in row else constants[field.name]
+                for field in fields
+            ]
+            for row in rows
+        ]
+        with transaction.atomic(using=self.db, savepoint=False):
+            with connection.cursor() as cursor:
+                cursor.executemany(sql, params)
+
+    def _convert_row(self, connection, field_names, row):
+        """Apply the backend converters the ORM would use to raw column values."""
+        result = {}
+        for name, value in zip(field_names, row):
+            field = self.model._meta.get_field(name)
+            col = Col(self.model._meta.db_table, field)
+            for converter in connection.ops.get_db_converters(col) + field.get_db_converters(connection):
+                value = converter(value, col, connection)
+            result[name] = value
+        return result
+
+
+def supports_update_returning(connection):
+    """Whether UPDATE ... RETURNING works; MariaDB, for one, only supports it on INSERT and DELETE."""
+    if connection.vendor == 'sqlite':
+        # RETURNING arrived in SQLite 3.35 for every statement at once.
+        return connection.features.can_return_columns_from_insert
+    return connection.vendor == 'postgresql'
+
+
+def overdue_q(now):
+    return Q(due_date__lt=now, status__in=Task.OPEN_STATUSES)
+
+
 class Task(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('in_progress', 'In Progress'),
         ('completed', 'Completed'),
     ]
+    OPEN_STATUSES = ['pending', 'in_progress']
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     due_date = models.DateTimeField()
@@ -56,18 +286,146 @@ class Task(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     status_changed_at = models.DateTimeField(null=True, blank = True)
-    user = models.ForeignKey(User, on_delete = models.CASCADE, related_name= 'tasks')
+    # No database constraint: the user may live on another database (see todo.shards).
+    # No index of its own either: every index above leads with the user.
+    user = models.ForeignKey(
+        User, on_delete = models.CASCADE, db_constraint = False, db_index = False, related_name= 'tasks'
+    )
+
+    objects = TaskQuerySet.as_manager()
 
+    _loaded_values = None
+    # When set, save() only updates the row if updated_at still has this value.
+    _expected_updated_at = None
+
+    class Meta:
+        # Every list query is scoped by user first, so each index leads with it.
+        indexes = [
+            models.Index(fields=['user', 'status', 'due_date'], name='task_user_status_due_idx'),
+            models.Index(fields=['user', 'due_date'], name='task_user_due_idx'),
+            models.Index(fields=['user', 'created_at'], name='task_user_created_idx'),
+            models.Index(fields=['user', 'status_changed_at'], name='task_user_status_chg_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the loaded column values so save() can tell what changed."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._snapshot_loaded_values(fields)
+
+    def _snapshot_loaded_values(self, fields=None):
+        if self._loaded_values is None:
+            self._loaded_values = {}
+        for field in self._meta.concrete_fields:
+            if fields is not None and field.name not in fields and field.attname not in fields:
+                continue
+            if field.attname in self.__dict__:
+                self._loaded_values[field.attname] = getattr(self, field.attname)
+
+    def get_changed_fields(self):
+        """Return the attnames of fields modified since load, or None if untracked."""
+        if self._loaded_values is None:
+            return None
+        changed = []
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.attname not in self.__dict__:
+                continue
+            if (field.attname not in self._loaded_values
+                    or self._loaded_values[field.attname] != getattr(self, field.attname)):
+                changed.append(field.attname)
+        return changed
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        if self._expected_updated_at is None:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+        base_qs = base_qs.filter(updated_at=self._expected_updated_at)
+        if not super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update):
+            raise StaleTaskError
+        self._expected_updated_at = None
+        return True
+
     def save(self, *args, **kwargs):
         if self.pk is not None:
-            old_task = Task.objects.get(pk=self.pk)
-            if old_task.status != self.status:
-                self.status_changed_at = timezone.now()
+            changed = self.get_changed_fields()
+            if changed is None:
+                # Instance was not loaded from the database, so there is no snapshot to compare.
+                old_status = (
+                    Task.objects.using(kwargs.get('using') or router.db_for_write(Task, instance=self))
+                    .filter(pk=self.pk).values_list('status', flat=True).first()
+                )
+                status_changed = old_status != self.status
             else:
+                status_changed = 'status' in changed
+            if status_changed:
                 self.status_changed_at = timezone.now()
 
-            super().save(*args, **kwargs)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                if status_changed and 'status' in update_fields:
+                    kwargs['update_fields'] = {*update_fields, 'status_changed_at'}
+            elif changed is not None and not args:
+                if status_changed:
+                    changed.append('status_changed_at')
+                # An empty list makes save() a no-op when nothing changed.
+                kwargs['update_fields'] = changed + ['updated_at'] if changed else []
+
+        super().save(*args, **kwargs)
+        self._snapshot_loaded_values(kwargs.get('update_fields'))
+
+
+class UserTaskStats(models.Model):
+    """Per-user task counts, kept current by database triggers (see todo.counters).
+
+    A user without a row has no tasks. ``updated_at`` is when the user's
+    tasks last changed.
+    """
+    user = models.OneToOneField(
+        User, primary_key=True, on_delete=models.CASCADE, db_constraint=False, related_name='task_stats'
+    )
+    total = models.IntegerField(default=0)
+    pending = models.IntegerField(default=0)
+    in_progress = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(null=True)
+
+    objects = UserScopedQuerySet.as_manager()
+
+    def __str__(self):
+        return f'{self.user_id}: {self.total} tasks'
+
+    def counts(self):
+        return {
+            'total': self.total,
+            'by_status': {status: getattr(self, status) for status, _ in Task.STATUS_CHOICES},
+        }
+
+
+class TaskChange(models.Model):
+    """A write to one of a user's tasks, logged by database triggers (see todo.changelog).
+
+    Ids are the sync cursor. A task with a change after the cursor is
+    either still the user's (changed or created) or gone (deleted or moved
+    to another user), so no separate tombstone is needed. No foreign key
+    constraints: rows outlive the tasks they describe, and deleting a user
+    logs the deletes of their tasks.
+    """
+    user = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+'
+    )
+    task_id = models.BigIntegerField()
+    changed_at = models.DateTimeField()
+
+    objects = UserScopedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='taskchange_user_id_idx'),
+        ]
@@ -0,0 +1,239 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, PageNumberPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class TaskPageNumberPagination(PageNumberPagination):
+    """Page-number pagination using the API's flat response envelope."""
+    page_size_query_param = 'page_size'
+    max_page_size = settings.TASK_MAX_PAGE_SIZE
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.page.paginator.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            **data
+        })
+
+    def get_etag_parts(self):
+        return (self.page.paginator.count, self.get_next_link(), self.get_previous_link())
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Paginate, taking the count from ``view.get_known_count()`` when it has one."""
+        paginator = self.get_paginator(queryset, request)
+        if paginator is None:
+            return None
+        count = view.get_known_count() if hasattr(view, 'get_known_count') else None
+        if count is not None:
+            paginator.count = count
+        self.set_page(paginator, request)
+        return list(self.page)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset for async views: the count and the page go through the async ORM."""
+        paginator = self.get_paginator(queryset, request)
+        if paginator is None:
+            return None
+        count = await view.aget_known_count() if hasattr(view, 'aget_known_count') else None
+        paginator.count = count if count is not None else await queryset.acount()
+        self.set_page(paginator, request)
+        self.page.object_list = [row async for row in self.page.object_list]
+        return list(self.page)
+
+    def get_paginator(self, queryset, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        return self.django_paginator_class(queryset, page_size)
+
+    def set_page(self, paginator, request):
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(page_number=page_number, message=str(exc))
+            raise NotFound(msg)
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+
+
+class TaskCursorPagination(BasePagination):
+    """Keyset pagination over the list ordering with ``id`` as tiebreaker.
+
+    Each page is a single indexed range query, so latency does not depend on
+    how deep the client has scrolled. Selected with ``?pagination=cursor`` or
+    by sending a ``cursor``. The total is only counted when ``?count=true``.
+
+    NULLs sort first in ascending and last in descending order on every
+    backend, which is SQLite's native behaviour.
+    """
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    max_page_size = settings.TASK_MAX_PAGE_SIZE
+    default_ordering = ('-created_at',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    @classmethod
+    def is_requested(cls, request):
+        params = request.query_params
+        return params.get(cls.mode_query_param) == 'cursor' or cls.cursor_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.get_page_queryset(queryset, request, view)
+        if self.count_requested:
+            self.count = queryset.count()
+        return self.set_page(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset for async views, querying through the async ORM."""
+        page_queryset = self.get_page_queryset(queryset, request, view)
+        if self.count_requested:
+            self.count = await queryset.acount()
+        return self.set_page([row async for row in page_queryset])
+
+    def get_page_queryset(self, queryset, request, view):
+        """The query for this page: one row past the page size tells whether another page follows."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.count = None
+        self.count_requested = request.query_params.get(self.count_query_param, '').lower() == 'true'
+
+        self.cursor = self.decode_cursor(request, queryset.model)
+        reverse = self.cursor is not None and self.cursor['reverse']
+        if self.cursor is not None:
+            queryset = queryset.filter(self.get_position_filter(self.cursor['position'], reverse))
+        queryset = queryset.order_by(*[self.get_order_expression(name, reverse) for name in self.ordering])
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, rows):
+        cursor = self.cursor
+        reverse = cursor is not None and cursor['reverse']
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = cursor is not None, has_more
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        envelope = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+        }
+        if self.count is not None:
+            envelope['count'] = self.count
+        envelope.update(data)
+        return Response(envelope)
+
+    def get_etag_parts(self):
+        return (self.count, self.get_next_link(), self.get_previous_link())
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        ordering = None
+        if view is not None and any(issubclass(backend, OrderingFilter) for backend in view.filter_backends):
+            ordering = OrderingFilter().get_ordering(request, queryset, view)
+        ordering = [name for name in ordering or self.default_ordering if name.lstrip('-') not in ('id', 'pk')]
+        tiebreaker = '-id' if ordering[0].startswith('-') else 'id'
+        return tuple(ordering) + (tiebreaker,)
+
+    def get_order_expression(self, name, reverse):
+        descending = name.startswith('-') != reverse
+        expression = F(name.lstrip('-'))
+        if descending:
+            return expression.desc(nulls_last=True)
+        return expression.asc(nulls_first=True)
+
+    def get_position_filter(self, position, reverse):
+        """Rows strictly after ``position`` in the (possibly reversed) ordering."""
+        condition = Q(pk__in=[])
+        equal = Q()
+        for name, value in zip(self.ordering, position):
+            field = name.lstrip('-')
+            descending = name.startswith('-') != reverse
+            if value is None:
+                # NULLs come first ascending and last descending.
+                after = Q(pk__in=[]) if descending else Q(**{f'{field}__isnull': False})
+                same = Q(**{f'{field}__isnull': True})
+            else:
+                lookup = 'lt' if descending else 'gt'
+                after = Q(**{f'{field}__{lookup}': value})
+                if descending:
+                    after |= Q(**{f'{field}__isnull': True})
+                same = Q(**{field: value})
+            condition |= equal & after
+            equal &= same
+        return condition
+
+    def get_position(self, row):
+        values = []
+        for name in self.ordering:
+            field = name.lstrip('-')
+            values.append(row[field] if isinstance(row, dict) else getattr(row, field))
+        return values
+
+    def encode_cursor(self, position, reverse):
+        # isoformat() keeps microseconds, which DjangoJSONEncoder would truncate.
+        payload = json.dumps(
+            {'o': list(self.ordering), 'p': position, 'r': reverse},
+            default=lambda value: value.isoformat(),
+            separators=(',', ':')
+        )
+        cursor = base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            if tuple(payload['o']) != self.ordering or len(payload['p']) != len(self.ordering):
+                raise ValueError('cursor does not match the requested ordering')
+            position = [
+                None if value is None else model._meta.get_field(name.lstrip('-')).to_python(value)
+                for name, value in zip(self.ordering, payload['p'])
+            ]
+            return {'position': position, 'reverse': bool(payload['r'])}
+        except (TypeError, ValueError, KeyError, binascii.Error, UnicodeEncodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]), False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.get_position(self.page[0]), True)
@@ -0,0 +1,93 @@
+"""Detect N+1 queries: the same SQL template run many times in one request.
+
+``RepeatedQueryMiddleware`` is opt-in through
+``TASK_REPEATED_QUERY_THRESHOLD``. While it is set, every query a request
+runs is counted by its SQL template, with ``IN (%s, %s, ...)`` lists
+collapsed so batches of different sizes count as one template. When a
+template runs more than the threshold, the middleware logs a warning or,
+with ``TASK_REPEATED_QUERY_ACTION = 'raise'``, raises RepeatedQueryError
+once the response is built, outside the views' own error handling, so a
+test that triggers it fails.
+"""
+import collections
+import contextvars
+import logging
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .dbwrappers import install_execute_wrapper
+
+logger = logging.getLogger(__name__)
+
+_counter = contextvars.ContextVar('todo_repeated_queries', default=None)
+_placeholder_list = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+
+
+class RepeatedQueryError(AssertionError):
+    """A request ran one SQL template more often than TASK_REPEATED_QUERY_THRESHOLD allows."""
+
+
+def sql_template(sql):
+    return _placeholder_list.sub('(%s...)', sql)
+
+
+def count_query(execute, sql, params, many, context):
+    counter = _counter.get()
+    if counter is not None:
+        counter[sql_template(sql)] += 1
+    return execute(sql, params, many, context)
+
+
+def repeated_queries(counter, threshold):
+    """Return [(template, count)] for templates run more than ``threshold`` times, most frequent first."""
+    return [(sql, count) for sql, count in counter.most_common() if count > threshold]
+
+
+class RepeatedQueryMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        install_execute_wrapper(count_query, 'todo.querycheck')
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        threshold = settings.TASK_REPEATED_QUERY_THRESHOLD
+        if threshold is None:
+            return self.get_response(request)
+        token = _counter.set(collections.Counter())
+        try:
+            response = self.get_response(request)
+            self.check(request, _counter.get(), threshold)
+        finally:
+            _counter.reset(token)
+        return response
+
+    async def __acall__(self, request):
+        threshold = settings.TASK_REPEATED_QUERY_THRESHOLD
+        if threshold is None:
+            return await self.get_response(request)
+        token = _counter.set(collections.Counter())
+        try:
+            response = await self.get_response(request)
+            self.check(request, _counter.get(), threshold)
+        finally:
+            _counter.reset(token)
+        return response
+
+    def check(self, request, counter, threshold):
+        repeated = repeated_queries(counter, threshold)
+        if not repeated:
+            return
+        details = '\n'.join(f'{count}x {sql}' for sql, count in repeated)
+        message = f'{request.method} {request.path} repeated queries more than {threshold} times:\n{details}'
+        if settings.TASK_REPEATED_QUERY_ACTION == 'raise':
+            raise RepeatedQueryError(message)
+        logger.warning(message)
@@ -0,0 +1,143 @@
+"""Send the reads of safe-method requests to read replicas.
+
+TASK_READ_REPLICAS maps database aliases, each a copy of ``default``
+kept current outside Django (LiteFS, Litestream, streaming replication),
+to relative weights. ``ReplicaRoutingMiddleware`` picks one by weight for
+every GET, HEAD and OPTIONS request and ``ReplicaRouter`` sends that
+request's reads to it, including those a streaming response makes
+while its content is sent; writes, and every query outside a request,
+use ``default``.
+
+Replicas lag the primary, so after a successful write the middleware
+sets a cookie that pins the client to the primary for
+TASK_REPLICA_PIN_SECONDS: a client reads its own writes as long as the
+window covers the replication lag. Cached responses follow the same
+rule: pinned requests skip cache lookups, and data read from a replica
+is cached for no longer than the pin window (see ``cache_timeout``).
+"""
+import contextvars
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+PIN_COOKIE = 'todo_read_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_read_alias = contextvars.ContextVar('todo_read_alias', default=None)
+
+
+def choose_replica(replicas, rng=random):
+    aliases = list(replicas)
+    return rng.choices(aliases, weights=[replicas[alias] for alias in aliases])[0]
+
+
+def pinned_to_primary(request):
+    return PIN_COOKIE in request.COOKIES
+
+
+def cache_timeout(timeout=DEFAULT_TIMEOUT):
+    """Timeout for caching data read in the current request.
+
+    Data read from a replica may predate a write the client just made on
+    the primary, so it is cached for at most TASK_REPLICA_PIN_SECONDS.
+    """
+    if _read_alias.get() is None:
+        return timeout
+    pin_seconds = settings.TASK_REPLICA_PIN_SECONDS
+    if timeout is DEFAULT_TIMEOUT or timeout is None or timeout > pin_seconds:
+        return pin_seconds
+    return timeout
+
+
+def read_from(alias, content):
+    """Iterate ``content`` with its reads routed to ``alias``, which is unset between chunks."""
+    iterator = iter(content)
+    while True:
+        token = _read_alias.set(alias)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _read_alias.reset(token)
+        yield chunk
+
+
+async def aread_from(alias, content):
+    iterator = aiter(content)
+    while True:
+        token = _read_alias.set(alias)
+        try:
+            chunk = await anext(iterator)
+        except StopAsyncIteration:
+            return
+        finally:
+            _read_alias.reset(token)
+        yield chunk
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        # Also for instances read from a replica, which would otherwise be saved back to it.
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def get_read_alias(self, request):
+        """The replica for this request's reads, or None for the primary."""
+        replicas = settings.TASK_READ_REPLICAS
+        if not replicas or request.method not in SAFE_METHODS or pinned_to_primary(request):
+            return None
+        return choose_replica(replicas)
+
+    def pin_primary(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400 and settings.TASK_READ_REPLICAS:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.TASK_REPLICA_PIN_SECONDS, httponly=True, samesite='Lax'
+            )
+        return response
+
+    def route_streaming(self, response, alias):
+        # Streamed content is produced after the middleware returns, so it carries the alias along.
+        if alias is not None and response.streaming:
+            reader = aread_from if response.is_async else read_from
+            response.streaming_content = reader(alias, response.streaming_content)
+        return response
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        alias = self.get_read_alias(request)
+        token = _read_alias.set(alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        return self.pin_primary(request, self.route_streaming(response, alias))
+
+    async def __acall__(self, request):
+        alias = self.get_read_alias(request)
+        token = _read_alias.set(alias)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        return self.pin_primary(request, self.route_streaming(response, alias))
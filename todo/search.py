@@ -0,0 +1,179 @@
+import re
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from rest_framework import filters
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class BaseSearchBackend:
+    """Full-text search over task titles and descriptions.
+
+    ``search`` narrows a Task queryset to the rows matching every term of
+    ``query`` (each term also matches as a prefix) and, when ``rank`` is set,
+    orders them best match first. ``fields`` restricts matching to a subset
+    of ``search_fields``.
+    """
+    search_fields = ('title', 'description')
+
+    def __init__(self, using='default'):
+        self.using = using
+
+    def tokenize(self, query):
+        return TOKEN_RE.findall(query)
+
+    def search(self, queryset, query, fields=None, rank=True):
+        raise NotImplementedError
+
+    @contextmanager
+    def deferred_indexing(self):
+        """Index rows INSERTed inside the block in one pass when it exits.
+
+        Backends whose per-row maintenance is expensive override this; the
+        block must only insert tasks.
+        """
+        yield
+
+
+class ContainsSearchBackend(BaseSearchBackend):
+    """Unindexed ``icontains`` matching, for databases without a full-text index."""
+
+    def search(self, queryset, query, fields=None, rank=True):
+        terms = self.tokenize(query)
+        if not terms:
+            return queryset.none()
+        for term in terms:
+            condition = Q()
+            for field in fields or self.search_fields:
+                condition |= Q(**{f'{field}__icontains': term})
+            queryset = queryset.filter(condition)
+        return queryset
+
+
+class SQLiteFTS5SearchBackend(BaseSearchBackend):
+    """SQLite FTS5 external-content index over todo_task, kept in sync by triggers.
+
+    Triggers rather than model signals keep bulk_create, bulk_update and raw
+    UPDATEs indexed too. Results are ranked with bm25, weighting title hits
+    above description hits.
+
+    The insert trigger is skipped while ``todo_task_fts_deferred`` has a row.
+    ``deferred_indexing`` sets that flag inside its transaction and indexes
+    the new rows with one INSERT ... SELECT, which is several times faster
+    than firing the trigger row by row. SQLite admits one writer at a time,
+    so no other connection can insert while the flag is set. The index, flag
+    table and triggers are created by migrations 0005 and 0006.
+    """
+    table = 'todo_task_fts'
+    deferred_table = 'todo_task_fts_deferred'
+    weights = {'title': 10.0, 'description': 1.0}
+
+    def match_expression(self, terms, fields):
+        phrase = ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+        if fields and set(fields) != set(self.search_fields):
+            return '{%s} : (%s)' % (' '.join(fields), phrase)
+        return phrase
+
+    def search(self, queryset, query, fields=None, rank=True):
+        terms = self.tokenize(query)
+        if not terms:
+            return queryset.none()
+        match = self.match_expression(terms, fields)
+        queryset = queryset.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', [match])
+        )
+        if rank:
+            weights = ', '.join(str(self.weights[field]) for field in self.search_fields)
+            queryset = queryset.annotate(search_rank=RawSQL(
+                f'SELECT -bm25({self.table}, {weights}) FROM {self.table} '
+                f'WHERE {self.table} MATCH %s AND rowid = {queryset.model._meta.db_table}.id',
+                [match],
+                output_field=FloatField()
+            )).order_by('-search_rank')
+        return queryset
+
+    @contextmanager
+    def deferred_indexing(self):
+        columns = ', '.join(self.search_fields)
+        with transaction.atomic(using=self.using), connections[self.using].cursor() as cursor:
+            # Take the write lock before reading max(id), so every later id is ours.
+            cursor.execute(f"INSERT INTO {self.deferred_table} DEFAULT VALUES")
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM todo_task")
+            last_id = cursor.fetchone()[0]
+            yield
+            cursor.execute(
+                f"INSERT INTO {self.table}(rowid, {columns}) SELECT id, {columns} FROM todo_task WHERE id > %s",
+                [last_id]
+            )
+            cursor.execute(f"DELETE FROM {self.deferred_table}")
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """tsvector search backed by a GIN expression index.
+
+    Titles are weighted 'A' and descriptions 'B' in a single indexed vector,
+    so restricting a search to one field is a weight filter in the tsquery
+    rather than a separate unindexed expression. The index, created by
+    migration 0005, is maintained by PostgreSQL itself.
+    """
+    config = 'simple'
+    weight_labels = {'title': 'A', 'description': 'B'}
+
+    @property
+    def vector(self):
+        return (
+            f"(setweight(to_tsvector('{self.config}', coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{self.config}', coalesce(description, '')), 'B'))"
+        )
+
+    def tsquery(self, terms, fields):
+        labels = ''.join(self.weight_labels[field] for field in fields or self.search_fields)
+        # Quote each lexeme so punctuation in user input cannot break the tsquery syntax.
+        return ' & '.join("'{}':*{}".format(term.replace("'", "''"), labels) for term in terms)
+
+    def search(self, queryset, query, fields=None, rank=True):
+        terms = self.tokenize(query)
+        if not terms:
+            return queryset.none()
+        tsquery = self.tsquery(terms, fields)
+        queryset = queryset.filter(RawSQL(
+            f"{self.vector} @@ to_tsquery('{self.config}', %s)", [tsquery], output_field=BooleanField()
+        ))
+        if rank:
+            queryset = queryset.annotate(search_rank=RawSQL(
+                f"ts_rank({self.vector}, to_tsquery('{self.config}', %s))", [tsquery], output_field=FloatField()
+            )).order_by('-search_rank')
+        return queryset
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteFTS5SearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend_class(vendor):
+    """Backend class from TASK_SEARCH_BACKEND, or the default for the database vendor."""
+    if settings.TASK_SEARCH_BACKEND:
+        return import_string(settings.TASK_SEARCH_BACKEND)
+    return VENDOR_BACKENDS.get(vendor, ContainsSearchBackend)
+
+
+def get_search_backend(using='default'):
+    return get_backend_class(connections[using].vendor)(using=using)
+
+
+class TaskSearchFilter(filters.SearchFilter):
+    """SearchFilter that delegates ``?search=`` to the configured search backend."""
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip():
+            return queryset
+        fields = getattr(view, 'search_fields', None)
+        return get_search_backend(queryset.db).search(queryset, query, fields=fields)
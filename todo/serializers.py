@@ -1,5 +1,15 @@
+import functools
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 from rest_framework import serializers
+from rest_framework import ISO_8601
+from rest_framework.fields import empty
+from rest_framework.settings import api_settings
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from .metrics import timing
 from .models import User, Task
 from django.utils import timezone
 
@@ -13,14 +23,21 @@ class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only = True)
     confirm_password = serializers.CharField(write_only = True)
 
+    # Messages for a registration that breaks a unique constraint, by field.
+    unique_errors = {
+        'email': "Email is already registered.",
+        'phone': "Phone number is already registered.",
+    }
+
     class Meta:
         model = User
         fields = ['fullname', 'phone', 'email', 'password', 'confirm_password']
-    extra_kwargs = {
-        'fullname': {'required': True},
-        'phone': {'required': True},
-        'email': {'required': True, 'allow_blank': False},
-    }
+        # No UniqueValidators: the INSERT itself checks uniqueness (see create).
+        extra_kwargs = {
+            'fullname': {'required': True},
+            'phone': {'required': True, 'allow_null': False, 'validators': []},
+            'email': {'required': True, 'allow_blank': False, 'validators': []},
+        }
 
     def validate_empty_values(self, data):
         errors = {}
@@ -34,18 +51,6 @@ class RegisterSerializer(serializers.ModelSerializer):
         
         return super().validate_empty_values(data)
 
-    def validate_email(self, value):
-        """Check if the email is already registered."""
-        if User.objects.filter(email=value).exists():
-            raise serializers.ValidationError("Email is already registered.")
-        return value
-    
-    def validate_phone(self, value):
-        """Check if the phone number is already registered."""
-        if User.objects.filter(phone=value).exists():
-            raise serializers.ValidationError("Phone number is already registered.")
-        return value
-    
     def validate (self, data):
         """Check if password and confirm_password match."""
         if data['password'] != data['confirm_password']:
@@ -54,19 +59,150 @@ class RegisterSerializer(serializers.ModelSerializer):
     
     
     def create(self, validated_data):
-        user = User.objects.create_user(
-                fullname = validated_data['fullname'],
-                phone = validated_data['phone'],
-                email = validated_data['email'],
-                password = validated_data['password']
-                )
+        """Insert the user, turning a unique constraint violation into field errors.
+
+        Registering costs one INSERT; only a conflict looks up which of the
+        unique fields are taken.
+        """
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(
+                        fullname = validated_data['fullname'],
+                        phone = validated_data['phone'],
+                        email = validated_data['email'],
+                        password = validated_data['password']
+                        )
+        except IntegrityError:
+            email = User.objects.normalize_email(validated_data['email'])
+            taken = User.objects.filter(Q(email=email) | Q(phone=validated_data['phone'])).values('email', 'phone')
+            errors = {}
+            for row in taken:
+                if row['email'] == email:
+                    errors['email'] = [self.unique_errors['email']]
+                if row['phone'] == validated_data['phone']:
+                    errors['phone'] = [self.unique_errors['phone']]
+            if not errors:
+                # The conflicting user was deleted in the meantime.
+                raise
+            raise serializers.ValidationError(errors)
         return user
 
+class TaskBulkSerializer(serializers.ListSerializer):
+    """Validate a list of tasks item by item and write the valid ones in bulk.
+
+    Invalid items do not reject the whole batch: their errors are kept in
+    ``item_errors`` (keyed by position) and ``valid_indexes`` maps each entry
+    of ``validated_data`` back to its position in the request. For updates,
+    ``instance`` is a dict of the user's tasks keyed by id and every item
+    must carry the ``id`` of one of them.
+    """
+    # Converts item ids for updates, so "12" finds task 12 and "x" is a validation error.
+    id_field = serializers.IntegerField(min_value=1)
+
+    @classmethod
+    def item_id(cls, item):
+        """The task id of an update item as an int; raises ValidationError keyed by ``id``."""
+        try:
+            return cls.id_field.run_validation(item.get('id', empty))
+        except serializers.ValidationError as exc:
+            raise serializers.ValidationError({'id': exc.detail})
+
+    @classmethod
+    def item_ids(cls, data):
+        """The valid task ids of a list of update items, for loading the tasks up front."""
+        task_ids = []
+        for item in data if isinstance(data, list) else []:
+            if isinstance(item, dict):
+                try:
+                    task_ids.append(cls.item_id(item))
+                except serializers.ValidationError:
+                    pass
+        return task_ids
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: ['Expected a list of items.']
+            })
+        if not data:
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: ['This list may not be empty.']
+            })
+        if self.max_length is not None and len(data) > self.max_length:
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [f'Ensure this field has no more than {self.max_length} elements.']
+            })
+
+        self.item_errors = {}
+        self.valid_indexes = []
+        validated = []
+        for index, item in enumerate(data):
+            try:
+                attrs = self.child.run_validation(item)
+                if self.instance is not None:
+                    task_id = self.item_id(item)
+                    if task_id not in self.instance:
+                        raise serializers.ValidationError({'id': ['Task not found.']})
+                    attrs['id'] = task_id
+            except serializers.ValidationError as exc:
+                self.item_errors[index] = exc.detail
+            else:
+                validated.append(attrs)
+                self.valid_indexes.append(index)
+        return validated
+
+    def create(self, validated_data):
+        tasks = [Task(**attrs) for attrs in validated_data]
+        if not tasks:
+            return tasks
+        # Every item belongs to the requesting user, so one shard takes them all.
+        return Task.objects.on_shard_of(tasks[0].user).bulk_create(tasks, batch_size=settings.TASK_BULK_BATCH_SIZE)
+
+    def update(self, instance, validated_data):
+        task_ids = [attrs['id'] for attrs in validated_data]
+        now = timezone.now()
+        tasks = {}
+        changed_fields = set()
+        for attrs in validated_data:
+            task = instance[attrs.pop('id')]
+            for attr, value in attrs.items():
+                setattr(task, attr, value)
+            changed = task.get_changed_fields()
+            if changed:
+                if 'status' in changed:
+                    task.status_changed_at = now
+                    changed.append('status_changed_at')
+                task.updated_at = now
+                changed_fields.update(changed, ['updated_at'])
+                tasks[task.pk] = task
+        if tasks:
+            # The instances were loaded from their user's shard.
+            using = next(iter(tasks.values()))._state.db
+            Task.objects.using(using).bulk_update(
+                tasks.values(), changed_fields, batch_size=settings.TASK_BULK_BATCH_SIZE
+            )
+            for task in tasks.values():
+                task._snapshot_loaded_values()
+        return [instance[task_id] for task_id in task_ids]
+
+
 class TaskSerializer(serializers.ModelSerializer):
     class Meta:
         model = Task
         fields = ['id', 'title', 'description', 'due_date', 'status', 'created_at', 'updated_at', 'status_changed_at', 'user']
         read_only_fields = ['id', 'created_at', 'updated_at', 'status_changed_at', 'user']
+        list_serializer_class = TaskBulkSerializer
+
+    def create(self, validated_data):
+        # ModelSerializer.create would insert into the default database, not the user's shard.
+        return Task.objects.on_shard_of(validated_data['user']).create(**validated_data)
+
+    def update(self, instance, validated_data):
+        # Note what changes before save() retakes the snapshot; None when the instance is untracked.
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        self.changed_fields = instance.get_changed_fields()
+        return super().update(instance, validated_data)
 
     def validate_title(self, value):
         """Check if the title is not empty."""
@@ -77,20 +213,134 @@ class TaskSerializer(serializers.ModelSerializer):
     def validate_due_date(self, value):
         """ Check if the due date is in the future."""
         try:
-            if value < timezone.now().date():
+            if value.date() < timezone.now().date():
                 raise serializers.ValidationError("""Due date cannot be in the past.""")
         except TypeError:
             raise serializers.ValidationError("Due date must be a valid date.")
         return value
 
+class TaskReadPlan:
+    """Read-only fast path producing a serializer's output from ``.values()`` rows.
+
+    A ModelSerializer walks its field objects and calls get_attribute and
+    to_representation for every field of every row. The plan resolves each
+    readable field to a column and a converter once, so a row is one dict
+    lookup per column plus one format call per datetime. Output matches the
+    serializer exactly; fields the plan cannot map raise ValueError when
+    the plan is built.
+    """
+    passthrough_fields = (
+        serializers.CharField,
+        serializers.ChoiceField,
+        serializers.IntegerField,
+        serializers.BooleanField,
+        serializers.PrimaryKeyRelatedField,
+    )
+
+    def __init__(self, serializer_class):
+        serializer = serializer_class()
+        model = serializer.Meta.model
+        self.plan = []
+        for field in serializer._readable_fields:
+            if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is not None:
+                raise ValueError(f'{field.field_name}: pk_field is not supported')
+            column = model._meta.get_field(field.source).attname
+            if isinstance(field, serializers.DateTimeField):
+                convert = self.datetime_converter(getattr(field, 'format', api_settings.DATETIME_FORMAT))
+            elif isinstance(field, self.passthrough_fields):
+                convert = None
+            else:
+                raise ValueError(f'{field.field_name}: {type(field).__name__} is not supported')
+            self.plan.append((field.field_name, column, convert))
+        self.columns = [column for _, column, _ in self.plan]
+
+    @staticmethod
+    def datetime_converter(output_format):
+        """Mirror DateTimeField.to_representation for one output format."""
+        if output_format is None:
+            return None
+
+        def convert(value, tz):
+            if tz is not None:
+                value = value.astimezone(tz) if value.tzinfo is not None else timezone.make_aware(value, tz)
+            elif value.tzinfo is not None:
+                value = timezone.make_naive(value, dt_timezone.utc)
+            if output_format.lower() == ISO_8601:
+                value = value.isoformat()
+                if value.endswith('+00:00'):
+                    value = value[:-6] + 'Z'
+                return value
+            return value.strftime(output_format)
+        return convert
+
+    def serialize(self, rows):
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        plan = self.plan
+        data = []
+        with timing('serialize'):
+            for row in rows:
+                item = {}
+                for name, column, convert in plan:
+                    value = row[column]
+                    if value is not None and convert is not None:
+                        value = convert(value, tz)
+                    item[name] = value
+                data.append(item)
+        return data
+
+    def serialize_row(self, row):
+        return self.serialize([row])[0]
+
+
+@functools.lru_cache(maxsize=None)
+def get_read_plan(serializer_class):
+    return TaskReadPlan(serializer_class)
+
+
+class TaskWritePlan:
+    """Validate many input dicts with one serializer, as ``is_valid()`` on a serializer per item would.
+
+    Goes through the serializer's public ``run_validation``, so every rule
+    of the serializer applies, without building and binding a serializer
+    for each item.
+    """
+    def __init__(self, serializer):
+        self.serializer = serializer
+
+    def validate(self, items):
+        """Return (validated attrs, {index: errors}) for a list of input items."""
+        validated = []
+        item_errors = {}
+        for index, data in enumerate(items):
+            try:
+                validated.append(self.serializer.run_validation(data))
+            except serializers.ValidationError as exc:
+                item_errors[index] = exc.detail
+        return validated, item_errors
+
+
+class TaskBulkDeleteSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=settings.TASK_BULK_MAX_ITEMS
+    )
+
+
 class TaskStatusSerializer(serializers.ModelSerializer):
+    expected_status = serializers.ChoiceField(choices=Task.STATUS_CHOICES, required=False, write_only=True)
+
     class Meta:
         model = Task
-        fields = ['status']
+        fields = ['id', 'status', 'status_changed_at', 'expected_status']
+        read_only_fields = ['id', 'status_changed_at']
+        extra_kwargs = {
+            'status': {'required': True},
+        }
 
     def validate_status(self, value):
         """check if status is validated"""
         valid_statuses = [status[0] for status in Task.STATUS_CHOICES]
         if value not in valid_statuses:
             raise serializers.ValidationError(f"status must be one of: {', '.join(valid_statuses)}")
-        return value
\ No newline at end of file
+        return value
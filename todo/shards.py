@@ -0,0 +1,285 @@
+"""Spread users' tasks over several databases.
+
+TASK_SHARDS lists the database aliases that hold tasks, 'default' first.
+Each user's tasks, task counters and change log live on one of them, the
+user's shard; users and everything else stay on 'default'. The directory
+is ``User.task_shard``: it is set when a user is created, to the shard
+``hash_shard`` picks from the email, and an empty entry means 'default',
+where tasks lived before sharding. As the user is loaded for every
+request anyway, finding the shard costs no query.
+
+``TaskQuerySet.for_user`` and ``on_shard_of`` scope queries to the
+user's shard; ``ShardRouter`` routes saves and related lookups of
+sharded models by their user, and runs only the sharded tables'
+migrations on the other shards.
+
+Task and change ids come from a separate range on each shard (see
+``reserve_ids``), so a task keeps its id, and clients their references
+and ETags, when ``manage.py rebalance_task_shards`` moves its owner to
+another shard. While a user moves, ``TaskWritesAllowed`` answers their
+task writes with 503. Adding a shard only reassigns the users ``hash_shard``
+now places on it; append new aliases and never reorder the list, as a
+shard's position fixes its id range. ``across_shards`` runs admin
+queries over every shard.
+"""
+import hashlib
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core import checks
+from django.db import connections, transaction
+from django.db.models import Count, Max
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+
+from .cache import invalidate_user_tasks
+from .export import chunked
+
+SHARDED_MODELS = {'todo.task', 'todo.usertaskstats', 'todo.taskchange'}
+# Ids each shard can hand out: a shard's ids start at its position in TASK_SHARDS times this.
+SHARD_ID_SPAN = 2 ** 40
+
+
+def hash_shard(key, shards=None):
+    """The shard for ``key`` by rendezvous hashing: adding a shard only moves the keys it wins."""
+    shards = settings.TASK_SHARDS if shards is None else shards
+    return max(shards, key=lambda alias: hashlib.md5(f'{alias}:{key}'.encode()).digest())
+
+
+def placement_key(email):
+    return email.lower()
+
+
+def shard_for(user):
+    """The alias holding ``user``'s tasks."""
+    return user.task_shard or 'default'
+
+
+def shard_for_user_id(user_id):
+    from .models import User
+    shard = User.objects.using('default').filter(pk=user_id).values_list('task_shard', flat=True).first()
+    return shard or 'default'
+
+
+def across_shards(queryset):
+    """``queryset`` on each shard, for admin queries over all users' tasks."""
+    return [queryset.using(alias) for alias in settings.TASK_SHARDS]
+
+
+def count_across_shards(queryset):
+    return sum(shard_queryset.count() for shard_queryset in across_shards(queryset))
+
+
+def iterate_across_shards(queryset, chunk_size=2000):
+    for shard_queryset in across_shards(queryset):
+        yield from shard_queryset.iterator(chunk_size=chunk_size)
+
+
+class MoveConflict(RuntimeError):
+    """Tasks changed on the source after ``move_user`` switched the directory; they were left there."""
+
+
+def move_user(user, target, batch_size=500):
+    """Move ``user``'s tasks to shard ``target`` and point the directory at it; return how many moved.
+
+    Every process holds the user, directory entry included, in its auth
+    cache for up to TASK_AUTH_USER_CACHE_TTL seconds. So the user is first
+    marked as moving, which makes task writes fail with 503, and the move
+    waits until every process has seen the mark. The tasks are then copied
+    with their ids and timestamps; the target's triggers rebuild the
+    counters, change log and search index.
+
+    A write that passed the check before the mark arrived (one waiting on
+    the write coalescer or on a database lock) can still commit on the
+    source. So the directory switches to ``target`` under the source's
+    write lock, after the copy is redone if the source's change log moved
+    on meanwhile. Once no process can still be reading the old shard, the
+    originals, counters and change log rows are deleted from it, again
+    under the write lock; if the source changed after the switch, they are
+    left in place and MoveConflict is raised. Re-running a move that failed
+    before the switch is safe, as a partial copy on the target is replaced.
+    """
+    from .models import Task, TaskChange, UserTaskStats
+    source = shard_for(user)
+    if source == target:
+        return 0
+    user.task_shard_moving = True
+    user.save(using='default', update_fields=['task_shard_moving'])
+    try:
+        time.sleep(settings.TASK_AUTH_USER_CACHE_TTL)
+        mark = change_mark(user.pk, source)
+        moved = copy_tasks(user.pk, source, target, batch_size)
+        with write_locked(source):
+            if change_mark(user.pk, source) != mark:
+                mark = change_mark(user.pk, source)
+                moved = copy_tasks(user.pk, source, target, batch_size)
+            user.task_shard, user.task_shard_moving = target, False
+            user.save(using='default', update_fields=['task_shard', 'task_shard_moving'])
+    except BaseException:
+        user.task_shard, user.task_shard_moving = source, False
+        user.save(using='default', update_fields=['task_shard_moving'])
+        raise
+    invalidate_user_tasks(user.pk)
+    # Processes still holding the old entry read the source (and refuse writes) until it expires.
+    time.sleep(settings.TASK_AUTH_USER_CACHE_TTL)
+    with write_locked(source):
+        if change_mark(user.pk, source) != mark:
+            raise MoveConflict(
+                f"User {user.pk}'s tasks changed on '{source}' after they were copied to '{target}'; "
+                f"they were left on '{source}'."
+            )
+        Task.objects.using(source).filter(user_id=user.pk).delete()
+        UserTaskStats.objects.using(source).filter(user_id=user.pk).delete()
+        # Last, as deleting the tasks logs a change for each of them.
+        TaskChange.objects.using(source).filter(user_id=user.pk).delete()
+    return moved
+
+
+def copy_tasks(user_id, source, target, batch_size=500):
+    """Replace the user's tasks on ``target`` with a copy of those on ``source``; return how many."""
+    from .models import Task
+    fields = Task._meta.concrete_fields
+    copied = 0
+    with transaction.atomic(using=target):
+        Task.objects.using(target).filter(user_id=user_id).delete()
+        tasks = Task.objects.using(source).filter(user_id=user_id).order_by('pk')
+        for chunk in chunked(tasks.iterator(chunk_size=batch_size), batch_size):
+            # A raw insert, unlike bulk_create, keeps the auto_now timestamps and so the ETags.
+            Task.objects.using(target)._insert(chunk, fields=fields, raw=True, using=target)
+            copied += len(chunk)
+    return copied
+
+
+def change_mark(user_id, using):
+    """How many change log rows the user has on ``using``, and the last id; any task write changes it.
+
+    The count catches a PostgreSQL transaction that commits after one with
+    a later id.
+    """
+    from .models import TaskChange
+    return TaskChange.objects.using(using).filter(user_id=user_id).aggregate(count=Count('pk'), last=Max('pk'))
+
+
+@contextmanager
+def write_locked(using):
+    """A transaction on ``using`` that holds off other task writes until it ends."""
+    from .models import Task
+    connection = connections[using]
+    table = connection.ops.quote_name(Task._meta.db_table)
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE')
+        else:
+            # Any write statement, even one matching no rows, takes SQLite's write lock.
+            cursor.execute(f'DELETE FROM {table} WHERE 0 = 1')
+        yield
+
+
+def reserve_ids(using):
+    """Start the shard's task and change ids at its range, unless they are past it already.
+
+    Run after every migrate, because SQLite forgets the sequence when a
+    migration rebuilds the table of an empty shard.
+    """
+    if using not in settings.TASK_SHARDS:
+        return
+    start = settings.TASK_SHARDS.index(using) * SHARD_ID_SPAN
+    if not start:
+        return
+    from .models import Task, TaskChange
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        for model in (Task, TaskChange):
+            table = model._meta.db_table
+            if connection.vendor == 'sqlite':
+                cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = %s", [table])
+                row = cursor.fetchone()
+                if row is None:
+                    cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)", [table, start])
+                elif row[0] < start:
+                    cursor.execute("UPDATE sqlite_sequence SET seq = %s WHERE name = %s", [start, table])
+            elif connection.vendor == 'postgresql':
+                cursor.execute(
+                    f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                    f"GREATEST(%s, (SELECT COALESCE(MAX(id), 0) FROM {connection.ops.quote_name(table)})))",
+                    [table, start]
+                )
+
+
+class TasksMoving(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Your tasks are being moved to another database; try again shortly.'
+    default_code = 'tasks_moving'
+
+    @property
+    def wait(self):
+        # Sent as Retry-After.
+        return max(settings.TASK_AUTH_USER_CACHE_TTL, 1)
+
+
+class TaskWritesAllowed(BasePermission):
+    """Refuse task writes, with TasksMoving, while ``move_user`` moves the user's tasks."""
+    def has_permission(self, request, view):
+        if request.method not in SAFE_METHODS and getattr(request.user, 'task_shard_moving', False):
+            raise TasksMoving()
+        return True
+
+
+class ShardRouter:
+    """Route sharded models by their user; must come before routers that claim every write."""
+    def shard_for_instance(self, model, instance):
+        if instance is None or model._meta.label_lower not in SHARDED_MODELS:
+            return None
+        if instance._meta.label_lower == settings.AUTH_USER_MODEL.lower():
+            # A related lookup from the user, e.g. user.tasks.all().
+            return shard_for(instance)
+        if instance._state.db in settings.TASK_SHARDS:
+            return instance._state.db
+        user = instance._meta.get_field('user').get_cached_value(instance, None)
+        if user is not None:
+            return shard_for(user)
+        return shard_for_user_id(instance.user_id)
+
+    def db_for_read(self, model, **hints):
+        shard = self.shard_for_instance(model, hints.get('instance'))
+        # Reads from 'default' are left to the next router, which may send them to a replica.
+        return None if shard == 'default' else shard
+
+    def db_for_write(self, model, **hints):
+        return self.shard_for_instance(model, hints.get('instance'))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._meta.label_lower, obj2._meta.label_lower} & SHARDED_MODELS:
+            # Their foreign keys to users have no database constraint.
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == 'default' or db not in settings.TASK_SHARDS:
+            return None
+        if app_label != 'todo':
+            return False
+        # Data migrations and triggers (no model_name) run everywhere the tables exist.
+        return model_name is None or f'todo.{model_name}' in SHARDED_MODELS
+
+
+@checks.register()
+def check_shards(app_configs, **kwargs):
+    errors = []
+    shards = settings.TASK_SHARDS
+    if not shards or shards[0] != 'default':
+        errors.append(checks.Error(
+            "TASK_SHARDS must start with 'default'.", id='todo.E001'
+        ))
+    for alias in shards:
+        if alias not in settings.DATABASES:
+            errors.append(checks.Error(
+                f"TASK_SHARDS lists '{alias}', which is not in DATABASES.", id='todo.E002'
+            ))
+    if len(shards) > 1 and 'todo.shards.ShardRouter' not in settings.DATABASE_ROUTERS:
+        errors.append(checks.Error(
+            "TASK_SHARDS needs 'todo.shards.ShardRouter' in DATABASE_ROUTERS.", id='todo.E003'
+        ))
+    return errors
@@ -0,0 +1,57 @@
+from django.core.signals import setting_changed
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .authentication import user_cache
+from .cache import invalidate_user_tasks
+from .coalescer import stop_write_coalescers
+from .models import Task, User, UserTaskStats
+from .serializers import get_read_plan
+from .shards import reserve_ids, shard_for
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def invalidate_task_list_cache(sender, instance, using, **kwargs):
+    invalidate_user_tasks(instance.user_id, using=using)
+
+
+@receiver(post_save, sender=User)
+def invalidate_new_user_task_list_cache(sender, instance, created, using, **kwargs):
+    # A new user may reuse the id of a deleted one; never serve that user's pages.
+    if created:
+        invalidate_user_tasks(instance.pk, using=using)
+
+
+@receiver(setting_changed)
+def reset_read_plans(setting, **kwargs):
+    # Plans capture the serializer fields' output formats when they are built.
+    if setting == 'REST_FRAMEWORK':
+        get_read_plan.cache_clear()
+
+
+@receiver(setting_changed)
+def reset_write_coalescers(setting, **kwargs):
+    if setting.startswith('TASK_WRITE_COALESC'):
+        stop_write_coalescers()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def delete_sharded_tasks(sender, instance, **kwargs):
+    # The deletion cascade only reaches rows on the user's own database.
+    shard = shard_for(instance)
+    if shard != 'default':
+        Task.objects.using(shard).filter(user_id=instance.pk).delete()
+        UserTaskStats.objects.using(shard).filter(user_id=instance.pk).delete()
+
+
+@receiver(post_migrate)
+def reserve_shard_ids(sender, using, **kwargs):
+    if sender.name == 'todo':
+        reserve_ids(using)
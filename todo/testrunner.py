@@ -0,0 +1,29 @@
+"""Test runner that keeps the suite's file-based caches out of the working tree."""
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TaskTestRunner(DiscoverRunner):
+    """Point every file-based cache at a fresh temporary directory for the run.
+
+    Entries such as the task list generations never expire, so a cache
+    directory shared between runs would make results depend on earlier ones.
+    """
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix='todo-test-cache-')
+        self.cache_settings = override_settings(CACHES={
+            alias: {**config, 'LOCATION': f'{self.cache_dir}/{alias}'}
+            if config['BACKEND'].endswith('FileBasedCache') else config
+            for alias, config in settings.CACHES.items()
+        })
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -1,11 +1,53 @@
-from django.test import TestCase
-from rest_framework.test import APITestCase
+import asyncio
+import base64
+import collections
+import csv
+import gc
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.backends.signals import connection_created
+from rest_framework.test import APITestCase, APIRequestFactory, force_authenticate
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from django.urls import reverse
-from .models import User, Task
+from .models import User, Task, StaleTaskError, TaskChange, UserTaskStats, supports_update_returning
+from .counters import get_task_counters
+from .changelog import encode_cursor
+from .events import get_task_event_broker
+from .coalescer import WriteCoalescer, coalesced_write, get_write_coalescer
+from .replicas import PIN_COOKIE, ReplicaRouter, ReplicaRoutingMiddleware, cache_timeout, choose_replica
+from .shards import (
+    SHARD_ID_SPAN, MoveConflict, TasksMoving, copy_tasks, count_across_shards, hash_shard, move_user, placement_key
+)
+from .serializers import TaskSerializer, TaskWritePlan, get_read_plan
+from .views import TaskList
+from .cache import TaskListCache, LRUFileBasedCache, check_task_list_cache, task_list_cache
+from .authentication import UserCache
+from .bench import ClientTransport, Scenarios, compare, run_scenario, seed
+from .conditional import task_etag
+from .metrics import Histogram, registry
+from .dbwrappers import install_execute_wrapper
+from .querycheck import RepeatedQueryError, RepeatedQueryMiddleware, sql_template
 from unittest.mock import patch
+from asgiref.sync import sync_to_async
 from django.utils import timezone
-from datetime import datetime
+from datetime import datetime, timedelta
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from rest_framework_simplejwt.tokens import RefreshToken
 
 
@@ -45,6 +87,22 @@ class UserTests(APITestCase):
         response = self.client.post(self.register_url, self.user_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn('phone', response.data['errors'])
+    def test_user_registration_existing_phone_only(self):
+        data = dict(self.user_data, email='other@example.com')
+        response = self.client.post(self.register_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'], {'phone': ['Phone number is already registered.']})
+        self.assertFalse(User.objects.filter(email='other@example.com').exists())
+    def test_user_registration_is_one_insert(self):
+        data = dict(self.user_data, email='single@example.com', phone='0541810031')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.register_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        statements = [query['sql'] for query in queries if 'SAVEPOINT' not in query['sql']]
+        self.assertEqual(len(statements), 1)
+        self.assertTrue(statements[0].startswith('INSERT INTO "todo_user"'))
+        user = User.objects.get(email='single@example.com')
+        self.assertEqual((user.fullname, user.phone), ('Benjamin Torfu', '0541810031'))
     def test_user_login(self):
         response = self.client.post(self.login_url, {
             'email': self.user_data['email'],
@@ -479,4 +537,2111 @@ class TaskTests(APITestCase):
           # Test combination with status
           response = self.client.get(f"{self.task_url}?is_overdue=true&status=completed", format='json')
           self.assertEqual(response.status_code, status.HTTP_200_OK)
-          self.assertEqual(len(response.data['data']), 0)  # No completed overdue tasks
\ No newline at end of file
+          self.assertEqual(len(response.data['data']), 0)  # No completed overdue tasks
+
+class TaskQueryPlanTests(TestCase):
+    """Each list filter combination must be served by one of the Task indexes."""
+    composite_indexes = (
+        'task_user_status_due_idx',
+        'task_user_due_idx',
+        'task_user_created_idx',
+        'task_user_status_chg_idx',
+    )
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            fullname='Plan User',
+            phone='0541810000',
+            email='plan@example.com',
+            password='Sp33d1'
+        )
+        self.factory = APIRequestFactory()
+
+    def get_list_queryset(self, query_string):
+        request = self.factory.get(f"{reverse('task-list')}?{query_string}")
+        force_authenticate(request, user=self.user)
+        view = TaskList()
+        view.request = view.initialize_request(request)
+        view.format_kwarg = None
+        return view.filter_queryset(view.get_queryset())
+
+    def assertUsesTaskIndex(self, query_string):
+        plan = self.get_list_queryset(query_string).explain()
+        self.assertTrue(
+            any(name in plan for name in self.composite_indexes),
+            f"?{query_string} does not use a composite task index:\n{plan}"
+        )
+
+    def test_list_filters_use_indexes(self):
+        for query_string in [
+            'ordering=created_at',
+            'ordering=-due_date',
+            'ordering=status_changed_at',
+            'status=pending',
+            'status=pending&ordering=due_date',
+            'due_date_after=2024-01-01',
+            'due_date_after=2024-01-01&due_date_before=2024-12-31',
+            'status_changed_at=2024-01-01T00:00:00Z',
+            'is_overdue=true',
+            'is_overdue=true&ordering=due_date',
+            'is_overdue=true&status=pending',
+        ]:
+            with self.subTest(query_string=query_string):
+                self.assertUsesTaskIndex(query_string)
+
+
+class TaskSaveTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            fullname='Save User',
+            phone='0541810001',
+            email='save@example.com',
+            password='Sp33d1'
+        )
+        self.token = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token.access_token}')
+        self.task = Task.objects.create(
+            title='Tracked Task',
+            description='Tracks its status.',
+            due_date=timezone.make_aware(datetime(2030, 1, 1)),
+            user=self.user
+        )
+
+    def test_create_leaves_status_changed_at_empty(self):
+        self.assertIsNotNone(self.task.pk)
+        self.assertIsNone(self.task.status_changed_at)
+
+    def test_status_change_is_a_single_update(self):
+        task = Task.objects.get(pk=self.task.pk)
+        task.status = 'completed'
+        with CaptureQueriesContext(connection) as queries:
+            task.save()
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]['sql'].startswith('UPDATE'))
+        self.assertNotIn('"description"', queries[0]['sql'])
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'completed')
+        self.assertIsNotNone(task.status_changed_at)
+
+    def test_save_without_status_change_keeps_status_changed_at(self):
+        task = Task.objects.get(pk=self.task.pk)
+        task.title = 'Renamed'
+        with CaptureQueriesContext(connection) as queries:
+            task.save()
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"status_changed_at"', queries[0]['sql'])
+        task.refresh_from_db()
+        self.assertEqual(task.title, 'Renamed')
+        self.assertIsNone(task.status_changed_at)
+
+    def test_save_without_changes_skips_query(self):
+        task = Task.objects.get(pk=self.task.pk)
+        with self.assertNumQueries(0):
+            task.save()
+
+    def test_detached_instance_still_tracks_status(self):
+        task = Task(
+            pk=self.task.pk,
+            title=self.task.title,
+            description=self.task.description,
+            due_date=self.task.due_date,
+            status='in_progress',
+            created_at=self.task.created_at,
+            user=self.user
+        )
+        task.save()
+        task.refresh_from_db()
+        self.assertIsNotNone(task.status_changed_at)
+
+    def test_partial_update_queries(self):
+        # auth user lookup, get_object() and a single UPDATE
+        with self.assertNumQueries(3):
+            response = self.client.patch(
+                reverse('task-detail', args=[self.task.id]), {'title': 'Patched'}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.title, 'Patched')
+
+
+class TaskStatusTransitionTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            fullname='Kanban User',
+            phone='0541810002',
+            email='kanban@example.com',
+            password='Sp33d1'
+        )
+        self.token = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token.access_token}')
+        self.task = Task.objects.create(
+            title='Card',
+            due_date=timezone.make_aware(datetime(2030, 1, 1)),
+            user=self.user
+        )
+        self.status_url = reverse('task-status', args=[self.task.id])
+
+    def test_transition_is_a_single_update(self):
+        # auth user lookup and the UPDATE ... RETURNING
+        with self.assertNumQueries(2):
+            response = self.client.patch(self.status_url, {'status': 'in_progress'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['id'], self.task.id)
+        self.assertEqual(response.data['data']['status'], 'in_progress')
+        self.assertIsNotNone(response.data['data']['status_changed_at'])
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'in_progress')
+
+    def test_same_status_keeps_timestamps(self):
+        response = self.client.patch(self.status_url, {'status': 'pending'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data['data']['status_changed_at'])
+        updated_at = self.task.updated_at
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.updated_at, updated_at)
+
+    def test_update_returning_is_not_inferred_from_insert_returning(self):
+        mariadb = SimpleNamespace(vendor='mysql', features=SimpleNamespace(can_return_columns_from_insert=True))
+        self.assertFalse(supports_update_returning(mariadb))
+        with patch('todo.models.supports_update_returning', return_value=False):
+            row = Task.objects.transition_status(self.task.pk, self.user, 'completed')
+        self.assertEqual(row['status'], 'completed')
+        self.assertIsNotNone(row['status_changed_at'])
+
+    def test_expected_status_precondition(self):
+        response = self.client.patch(
+            self.status_url, {'status': 'completed', 'expected_status': 'in_progress'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'pending')
+
+        response = self.client.patch(
+            self.status_url, {'status': 'completed', 'expected_status': 'pending'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'completed')
+
+    def test_other_users_task_is_not_found(self):
+        other = User.objects.create_user(
+            fullname='Other User',
+            phone='0541810003',
+            email='other@example.com',
+            password='Sp33d1'
+        )
+        self.client.force_authenticate(user=other)
+        response = self.client.patch(
+            self.status_url, {'status': 'completed', 'expected_status': 'pending'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'pending')
+
+    def test_status_is_required(self):
+        response = self.client.patch(self.status_url, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('status', response.data['errors'])
+
+
+class TaskBulkTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            fullname='Sync User',
+            phone='0541810004',
+            email='sync@example.com',
+            password='Sp33d1'
+        )
+        self.token = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token.access_token}')
+        self.bulk_url = reverse('task-bulk')
+
+    def make_items(self, count, prefix='Offline'):
+        return [
+            {'title': f'{prefix} {i}', 'description': 'Written offline', 'due_date': '2030-01-01'}
+            for i in range(count)
+        ]
+
+    def test_bulk_create(self):
+        response = self.client.post(self.bulk_url, self.make_items(3), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.data['success'])
+        self.assertEqual([result['index'] for result in response.data['data']], [0, 1, 2])
+        self.assertTrue(all(result['data']['id'] for result in response.data['data']))
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 3)
+
+    @override_settings(TASK_AUTH_USER_CACHE_TTL=0)
+    def test_bulk_create_query_count_is_constant(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(self.bulk_url, self.make_items(5), format='json')
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(self.bulk_url, self.make_items(50), format='json')
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 55)
+
+    def test_bulk_create_reports_item_errors(self):
+        items = self.make_items(2)
+        items.insert(1, {'title': '', 'due_date': '2030-01-01'})
+        response = self.client.post(self.bulk_url, items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertFalse(response.data['success'])
+        results = response.data['data']
+        self.assertTrue(results[0]['success'])
+        self.assertFalse(results[1]['success'])
+        self.assertIn('title', results[1]['errors'])
+        self.assertTrue(results[2]['success'])
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_create_rejects_non_list(self):
+        response = self.client.post(self.bulk_url, {'title': 'Single'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update(self):
+        tasks = Task.objects.bulk_create([
+            Task(title=f'Task {i}', due_date=timezone.make_aware(datetime(2030, 1, 1)), user=self.user)
+            for i in range(3)
+        ])
+        other = User.objects.create_user(
+            fullname='Other User',
+            phone='0541810005',
+            email='othersync@example.com',
+            password='Sp33d1'
+        )
+        foreign = Task.objects.create(
+            title='Not yours', due_date=timezone.make_aware(datetime(2030, 1, 1)), user=other
+        )
+        response = self.client.patch(self.bulk_url, [
+            {'id': tasks[0].id, 'status': 'completed'},
+            {'id': tasks[1].id, 'title': 'Renamed'},
+            {'id': foreign.id, 'title': 'Hijacked'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        results = response.data['data']
+        self.assertEqual(results[0]['data']['status'], 'completed')
+        self.assertIsNotNone(results[0]['data']['status_changed_at'])
+        self.assertEqual(results[1]['data']['title'], 'Renamed')
+        self.assertIsNone(results[1]['data']['status_changed_at'])
+        self.assertEqual(results[2]['errors'], {'id': ['Task not found.']})
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.title, 'Not yours')
+        tasks[2].refresh_from_db()
+        self.assertEqual(tasks[2].title, 'Task 2')
+
+    def test_bulk_update_converts_ids(self):
+        task = Task.objects.create(title='Task', due_date=timezone.make_aware(datetime(2030, 1, 1)), user=self.user)
+        response = self.client.patch(self.bulk_url, [
+            {'id': str(task.id), 'title': 'By string id'},
+            {'id': 'twelve', 'title': 'Bad id'},
+            {'title': 'No id'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        results = response.data['data']
+        self.assertEqual(results[0]['data']['title'], 'By string id')
+        self.assertEqual(results[1]['errors'], {'id': ['A valid integer is required.']})
+        self.assertEqual(results[2]['errors'], {'id': ['This field is required.']})
+
+    def test_bulk_delete(self):
+        tasks = Task.objects.bulk_create([
+            Task(title=f'Task {i}', due_date=timezone.make_aware(datetime(2030, 1, 1)), user=self.user)
+            for i in range(3)
+        ])
+        response = self.client.delete(
+            self.bulk_url, {'ids': [tasks[0].id, tasks[1].id, 999999]}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['success'])
+        self.assertEqual(
+            [result['success'] for result in response.data['data']], [True, True, False]
+        )
+        self.assertEqual(list(Task.objects.filter(user=self.user).values_list('id', flat=True)), [tasks[2].id])
+
+
+class TaskCursorPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            fullname='Scroll User',
+            phone='0541810006',
+            email='scroll@example.com',
+            password='Sp33d1'
+        )
+        self.token = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token.access_token}')
+        self.task_url = reverse('task-list')
+        base = timezone.make_aware(datetime(2030, 1, 1))
+        self.tasks = Task.objects.bulk_create([
+            Task(
+                title=f'Task {i}',
+                # Repeated due dates and missing status_changed_at values exercise the tiebreaker.
+                due_date=base + timedelta(days=i % 4),
+                status_changed_at=None if i % 3 else base + timedelta(hours=i % 5),
+                user=self.user
+            )
+            for i in range(23)
+        ])
+
+    def expected_ids(self, ordering):
+        field = ordering.lstrip('-')
+        descending = ordering.startswith('-')
+
+        def key(task):
+            value = getattr(task, field)
+            # NULLs first ascending, last descending
+            return (value is not None, value or 0, task.id)
+        return [task.id for task in sorted(self.tasks, key=key, reverse=descending)]
+
+    def walk(self, url):
+        ids, pages = [], []
+        while url and len(pages) < 50:
+            response = self.client.get(url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response.data['success'])
+            ids.extend(task['id'] for task in response.data['data'])
+            pages.append(response.data)
+            url = response.data['next']
+        return ids, pages
+
+    def test_walks_every_ordering(self):
+        for ordering in ['created_at', '-created_at', 'due_date', '-due_date',
+                         'status_changed_at', '-status_changed_at']:
+            with self.subTest(ordering=ordering):
+                ids, pages = self.walk(f'{self.task_url}?pagination=cursor&page_size=5&ordering={ordering}')
+                self.assertEqual(ids, self.expected_ids(ordering))
+                self.assertEqual(len(pages), 5)
+                self.assertIsNone(pages[0]['previous'])
+
+    def test_previous_links_walk_back(self):
+        ids, pages = self.walk(f'{self.task_url}?pagination=cursor&page_size=5&ordering=-due_date')
+        url, seen = pages[-1]['previous'], []
+        while url:
+            response = self.client.get(url, format='json')
+            seen = [task['id'] for task in response.data['data']] + seen
+            url = response.data['previous']
+        self.assertEqual(seen, ids[:20])
+
+    def test_count_only_on_request(self):
+        # auth user lookup and the page query, no COUNT(*)
+        with self.assertNumQueries(2):
+            response = self.client.get(f'{self.task_url}?pagination=cursor', format='json')
+        self.assertNotIn('count', response.data)
+        self.assertEqual(len(response.data['data']), 10)
+
+        response = self.client.get(f'{self.task_url}?pagination=cursor&count=true', format='json')
+        self.assertEqual(response.data['count'], 23)
+
+    def test_page_size_is_capped(self):
+        with self.settings(TASK_MAX_PAGE_SIZE=100):
+            response = self.client.get(f'{self.task_url}?pagination=cursor&page_size=1000', format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['data']), 23)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(f'{self.task_url}?cursor=not-a-cursor', format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        _, pages = self.walk(f'{self.task_url}?pagination=cursor&page_size=20&ordering=due_date')
+        next_url = self.client.get(
+            f'{self.task_url}?pagination=cursor&page_size=5&ordering=due_date', format='json'
+        ).data['next']
+        response = self.client.get(next_url.replace('ordering=due_date', 'ordering=created_at'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TaskSearchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            fullname='Search User',
+            phone='0541810007',
+            email='search@example.com',
+            password='Sp33d1'
+        )
+        self.token = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token.access_token}')
+        self.task_url = reverse('task-list')
+        due_date = timezone.make_aware(datetime(2030, 1, 1))
+        self.meeting = Task.objects.create(
+            title='Quarterly meeting', description='Prepare the budget slides', due_date=due_date, user=self.user
+        )
+        self.budget = Task.objects.create(
+            title='Budget review', description='Numbers for the meeting', due_date=due_date, user=self.user
+        )
+        self.groceries = Task.objects.create(
+            title='Groceries', description='Milk and eggs', due_date=due_date, user=self.user
+        )
+
+    def search_ids(self, query):
+        response = self.client.get(self.task_url, {'search': query}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [task['id'] for task in response.data['data']]
+
+    def test_prefix_match(self):
+        self.assertEqual(self.search_ids('groc'), [self.groceries.id])
+        self.assertEqual(self.search_ids('egg'), [self.groceries.id])
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.search_ids('budget slides'), [self.meeting.id])
+        self.assertEqual(self.search_ids('budget eggs'), [])
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(self.search_ids('meeting'), [self.meeting.id, self.budget.id])
+        self.assertEqual(self.search_ids('budget'), [self.budget.id, self.meeting.id])
+
+    def test_punctuation_is_ignored(self):
+        self.assertEqual(self.search_ids('"milk" AND (eggs'), [self.groceries.id])
+        self.assertEqual(self.search_ids('***'), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.groceries.title = 'Hardware store'
+        self.groceries.save()
+        self.assertEqual(self.search_ids('groceries'), [])
+        self.assertEqual(self.search_ids('hardware'), [self.groceries.id])
+
+        Task.objects.filter(pk=self.budget.pk).update(description='Spreadsheet')
+        self.assertEqual(self.search_ids('numbers'), [])
+
+        self.meeting.delete()
+        self.assertEqual(self.search_ids('quarterly'), [])
+
+    def test_field_filter_uses_single_column(self):
+        response = self.client.get(self.task_url, {'title': 'meet'}, format='json')
+        self.assertEqual([task['id'] for task in response.data['data']], [self.meeting.id])
+        response = self.client.get(self.task_url, {'description': 'meeting'}, format='json')
+        self.assertEqual([task['id'] for task in response.data['data']], [self.budget.id])
+
+    def test_search_is_scoped_to_user(self):
+        other = User.objects.create_user(
+            fullname='Other User',
+            phone='0541810008',
+            email='othersearch@example.com',
+            password='Sp33d1'
+        )
+        Task.objects.create(
+            title='Groceries for someone else', due_date=self.groceries.due_date, user=other
+        )
+        self.assertEqual(self.search_ids('groceries'), [self.groceries.id])
+
+
+class TaskListCacheTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            fullname='Polling User',
+            phone='0541810009',
+            email='polling@example.com',
+            password='Sp33d1'
+        )
+        self.token = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token.access_token}')
+        self.task_url = reverse('task-list')
+        self.task = Task.objects.create(
+            title='Cached', due_date=timezone.make_aware(datetime(2030, 1, 1)), user=self.user
+        )
+        task_list_cache.cache.clear()
+        task_list_cache.reset_stats()
+
+    def titles(self, query=''):
+        response = self.client.get(f'{self.task_url}?{query}', format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [task['title'] for task in response.data['data']]
+
+    @override_settings(TASK_AUTH_USER_CACHE_TTL=0)
+    def test_repeat_poll_is_served_from_cache(self):
+        self.titles('status=pending&ordering=due_date')
+        # only the auth user lookup
+        with self.assertNumQueries(1):
+            self.assertEqual(self.titles('ordering=due_date&status=pending'), ['Cached'])
+        self.assertEqual(task_list_cache.stats(), {'hits': 1, 'misses': 1})
+
+    def test_writes_invalidate(self):
+        self.assertEqual(self.titles(), ['Cached'])
+
+        self.client.post(self.task_url, {'title': 'Second', 'due_date': '2030-01-02'}, format='json')
+        self.assertEqual(sorted(self.titles()), ['Cached', 'Second'])
+
+        self.client.patch(reverse('task-status', args=[self.task.id]), {'status': 'completed'}, format='json')
+        self.assertEqual(self.titles('status=completed'), ['Cached'])
+        self.assertEqual(self.titles('status=completed'), ['Cached'])
+
+        self.client.post(reverse('task-bulk'), [{'title': 'Third', 'due_date': '2030-01-03'}], format='json')
+        self.assertEqual(sorted(self.titles()), ['Cached', 'Second', 'Third'])
+
+        self.client.delete(reverse('task-detail', args=[self.task.id]), format='json')
+        self.assertEqual(sorted(self.titles()), ['Second', 'Third'])
+
+    def test_users_do_not_share_entries(self):
+        self.titles()
+        other = User.objects.create_user(
+            fullname='Other User',
+            phone='0541810010',
+            email='otherpolling@example.com',
+            password='Sp33d1'
+        )
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.titles(), [])
+
+    def test_generation_is_seen_by_other_processes(self):
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        shared = {'BACKEND': 'todo.cache.LRUFileBasedCache', 'LOCATION': directory}
+        self.enterContext(self.settings(CACHES={**settings.CACHES, 'tasks': shared}))
+        generation = task_list_cache.get_generation(self.user.pk)
+        # Another worker's handle on the same cache directory.
+        other = LRUFileBasedCache(directory, {})
+        self.assertEqual(other.get(task_list_cache.generation_key(self.user.pk)), generation)
+        task_list_cache.bump(self.user.pk)
+        self.assertNotEqual(other.get(task_list_cache.generation_key(self.user.pk)), generation)
+        self.assertEqual(TaskListCache('tasks').stats(), {'hits': 0, 'misses': 0})
+
+    def test_per_process_backend_is_flagged(self):
+        self.assertEqual(check_task_list_cache(None), [])
+        locmem = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        with self.settings(CACHES={'default': locmem, 'tasks': locmem}):
+            messages = check_task_list_cache(None)
+            self.assertEqual([message.id for message in messages], ['todo.W004'])
+            self.assertFalse(messages[0].is_serious())
+            with self.settings(TASK_LIST_CACHE=None):
+                self.assertEqual(check_task_list_cache(None), [])
+
+
+class LRUFileBasedCacheTests(TestCase):
+    def test_evicts_least_recently_read(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = LRUFileBasedCache(directory, {'OPTIONS': {'MAX_ENTRIES': 3, 'CULL_FREQUENCY': 3}})
+            for key in ('a', 'b', 'c'):
+                cache.set(key, key)
+                time.sleep(0.01)
+            self.assertEqual(cache.get('a'), 'a')
+            cache.set('d', 'd')
+            self.assertIsNone(cache.get('b'))
+            self.assertEqual([cache.get(key) for key in ('a', 'c', 'd')], ['a', 'c', 'd'])
+
+
+class TaskConditionalRequestTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            fullname='Fleet User',
+            phone='0541810011',
+            email='fleet@example.com',
+            password='Sp33d1'
+        )
+        self.token = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token.access_token}')
+        self.task_url = reverse('task-list')
+        self.task = Task.objects.create(
+            title='Conditional', due_date=timezone.make_aware(datetime(2030, 1, 1)), user=self.user
+        )
+        self.detail_url = reverse('task-detail', args=[self.task.id])
+
+    @override_settings(TASK_AUTH_USER_CACHE_TTL=0)
+    def test_detail_not_modified(self):
+        response = self.client.get(self.detail_url, format='json')
+        etag = response['ETag']
+        # auth user lookup and the task row
+        with self.assertNumQueries(2):
+            response = self.client.get(self.detail_url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        self.client.patch(self.detail_url, {'title': 'Changed'}, format='json')
+        response = self.client.get(self.detail_url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    @override_settings(TASK_AUTH_USER_CACHE_TTL=0)
+    def test_list_not_modified_without_serializing(self):
+        response = self.client.get(self.task_url, format='json')
+        etag = response['ETag']
+        with self.settings(TASK_LIST_CACHE=None), \
+                patch.object(TaskSerializer, 'to_representation', side_effect=AssertionError):
+            response = self.client.get(self.task_url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # served from the cache: only the auth user lookup
+        with self.assertNumQueries(1):
+            response = self.client.get(self.task_url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.patch(reverse('task-status', args=[self.task.id]), {'status': 'completed'}, format='json')
+        response = self.client.get(self.task_url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_etag_changes_on_delete(self):
+        Task.objects.create(title='Second', due_date=self.task.due_date, user=self.user)
+        etag = self.client.get(self.task_url, format='json')['ETag']
+        with self.settings(TASK_LIST_CACHE=None):
+            Task.objects.filter(pk=self.task.pk).delete()
+            response = self.client.get(self.task_url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_update_if_match(self):
+        etag = self.client.get(self.detail_url, format='json')['ETag']
+        self.client.patch(self.detail_url, {'title': 'Elsewhere'}, format='json')
+
+        response = self.client.patch(self.detail_url, {'title': 'Mine'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.title, 'Elsewhere')
+
+        etag = self.client.get(self.detail_url, format='json')['ETag']
+        response = self.client.patch(self.detail_url, {'title': 'Mine'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_conditional_save_detects_concurrent_write(self):
+        task = Task.objects.get(pk=self.task.pk)
+        Task.objects.filter(pk=self.task.pk).update(updated_at=timezone.now() + timedelta(seconds=1))
+        task._expected_updated_at = task.updated_at
+        task.title = 'Lost update'
+        with self.assertRaises(StaleTaskError):
+            task.save()
+
+    def test_delete_if_match(self):
+        response = self.client.delete(self.detail_url, format='json', HTTP_IF_MATCH='"stale"')
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertTrue(Task.objects.filter(pk=self.task.pk).exists())
+
+        etag = self.client.get(self.detail_url, format='json')['ETag']
+        response = self.client.delete(self.detail_url, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Task.objects.filter(pk=self.task.pk).exists())
+
+    @override_settings(TASK_AUTH_USER_CACHE_TTL=0)
+    def test_status_if_match(self):
+        etag = self.client.get(self.detail_url, format='json')['ETag']
+        status_url = reverse('task-status', args=[self.task.id])
+        with self.assertNumQueries(2):
+            response = self.client.patch(status_url, {'status': 'in_progress'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.patch(status_url, {'status': 'completed'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+        response = self.client.patch(
+            status_url, {'status': 'completed'}, format='json',
+            HTTP_IF_MATCH=self.client.get(self.detail_url, format='json')['ETag']
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class TaskReadPlanTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            fullname='Plan User',
+            phone='0541810012',
+            email='plan@example.com',
+            password='Sp33d1'
+        )
+        self.token = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token.access_token}')
+        due = timezone.make_aware(datetime(2030, 1, 1, 9, 30, 15, 123456))
+        Task.objects.create(title='Plain', due_date=due, user=self.user)
+        changed = Task.objects.create(title='Changed', description='', due_date=due, user=self.user)
+        Task.objects.transition_status(changed.pk, self.user, 'completed')
+
+    def assertMatchesSerializer(self):
+        tasks = list(Task.objects.for_user(self.user).order_by('id'))
+        rows = Task.objects.for_user(self.user).order_by('id').values(*get_read_plan(TaskSerializer).columns)
+        expected = JSONRenderer().render(TaskSerializer(tasks, many=True).data)
+        self.assertEqual(JSONRenderer().render(get_read_plan(TaskSerializer).serialize(rows)), expected)
+
+    def test_output_is_byte_identical(self):
+        self.assertMatchesSerializer()
+        with timezone.override('America/New_York'):
+            self.assertMatchesSerializer()
+        with self.settings(REST_FRAMEWORK={'DATETIME_FORMAT': '%Y-%m-%d %H:%M'}):
+            self.assertMatchesSerializer()
+
+    def test_list_and_detail_skip_the_serializer(self):
+        with patch.object(TaskSerializer, 'to_representation', side_effect=AssertionError):
+            response = self.client.get(reverse('task-list'), format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            task_id = response.data['data'][0]['id']
+            response = self.client.get(reverse('task-detail', args=[task_id]), format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(reverse('task-detail', args=[0]), format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_disabled_plan_falls_back(self):
+        fast = self.client.get(reverse('task-list'), format='json').content
+        with self.settings(TASK_FAST_READ=False, TASK_LIST_CACHE=None):
+            self.assertEqual(self.client.get(reverse('task-list'), format='json').content, fast)
+
+
+class TaskExportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            fullname='Export User',
+            phone='0541810013',
+            email='export@example.com',
+            password='Sp33d1'
+        )
+        self.token = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token.access_token}')
+        self.export_url = reverse('task-export')
+        due = timezone.make_aware(datetime(2030, 1, 1))
+        Task.objects.bulk_create([
+            Task(title=f'Export {i}', description='Line, with "quotes"', due_date=due, user=self.user,
+                 status='completed' if i % 3 == 0 else 'pending')
+            for i in range(25)
+        ])
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_ndjson_matches_list(self):
+        with self.settings(TASK_EXPORT_CHUNK_SIZE=10):
+            response = self.client.get(self.export_url)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual(len(lines), 25)
+        tasks = Task.objects.filter(user=self.user).order_by('id')
+        self.assertEqual(lines, TaskSerializer(tasks, many=True).data)
+
+    def test_csv(self):
+        response = self.client.get(self.export_url, {'output': 'csv', 'status': 'completed'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(self.read(response))))
+        self.assertEqual(len(rows), 9)
+        self.assertEqual(list(rows[0]), TaskSerializer.Meta.fields)
+        self.assertEqual(rows[0]['description'], 'Line, with "quotes"')
+
+    def test_filters_and_ordering(self):
+        response = self.client.get(self.export_url, {'search': 'export', 'status': 'pending', 'ordering': '-created_at'})
+        lines = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual(len(lines), 16)
+        self.assertEqual({line['status'] for line in lines}, {'pending'})
+
+    def test_unknown_output(self):
+        response = self.client.get(self.export_url, {'output': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.export_url, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class TaskImportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            fullname='Import User',
+            phone='0541810014',
+            email='import@example.com',
+            password='Sp33d1'
+        )
+        self.token = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token.access_token}')
+        self.import_url = reverse('task-import')
+
+    def ndjson(self, *items):
+        return ''.join((item if isinstance(item, str) else json.dumps(item)) + '\n' for item in items)
+
+    def test_ndjson_body_with_line_errors(self):
+        body = self.ndjson(
+            {'title': 'Alpha report', 'due_date': '2030-01-01T10:00:00Z'},
+            {'title': '', 'due_date': '2030-01-01T10:00:00Z'},
+            '{not json',
+            {'title': 'Beta', 'due_date': '2030-01-02T10:00:00Z', 'status': 'done'},
+            {'title': 'Gamma', 'due_date': '2030-01-02T10:00:00Z', 'status': 'completed'},
+        )
+        with self.settings(TASK_IMPORT_BATCH_SIZE=2):
+            response = self.client.post(self.import_url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.data['data']
+        self.assertEqual((data['created'], data['failed'], data['checkpoint']), (2, 3, 5))
+        self.assertEqual([error['line'] for error in data['errors']], [2, 3, 4])
+        self.assertIn('title', data['errors'][0]['errors'])
+        self.assertIn('status', data['errors'][2]['errors'])
+        self.assertEqual(
+            sorted(Task.objects.filter(user=self.user).values_list('title', flat=True)), ['Alpha report', 'Gamma']
+        )
+        # imported rows are searchable
+        response = self.client.get(reverse('task-list'), {'search': 'alph'})
+        self.assertEqual([task['title'] for task in response.data['data']], ['Alpha report'])
+
+    def test_errors_match_task_serializer(self):
+        items = [
+            {'title': 'x' * 201, 'due_date': 'soon'},
+            {'description': 'no title'},
+            {'title': 'Past', 'due_date': '2000-01-01T00:00:00Z'},
+            ['not', 'a', 'dict'],
+        ]
+        plan = TaskWritePlan(TaskSerializer())
+        _, errors = plan.validate(items)
+        for index, item in enumerate(items):
+            serializer = TaskSerializer(data=item)
+            self.assertFalse(serializer.is_valid())
+            self.assertEqual(errors[index], serializer.errors)
+
+    def test_multipart_csv_and_resume(self):
+        upload = io.BytesIO(
+            b'title,description,due_date,status\n'
+            b'First,,2030-01-01T10:00:00Z,\n'
+            b'"Second, quoted","multi\nline",2030-01-01T10:00:00Z,in_progress\n'
+            b'Third,,2030-01-01T10:00:00Z,completed\n'
+        )
+        upload.name = 'tasks.csv'
+        response = self.client.post(self.import_url + '?resume_from=2', {'file': upload}, format='multipart')
+        self.assertEqual(response.data['data']['created'], 2)
+        self.assertEqual(response.data['data']['checkpoint'], 5)
+        second = Task.objects.get(user=self.user, title='Second, quoted')
+        self.assertEqual((second.description, second.status), ('multi\nline', 'in_progress'))
+        self.assertFalse(Task.objects.filter(title='First').exists())
+
+    def test_export_round_trip(self):
+        Task.objects.create(title='Round trip', due_date=timezone.make_aware(datetime(2030, 1, 1)), user=self.user)
+        exported = b''.join(self.client.get(reverse('task-export')).streaming_content)
+        response = self.client.post(self.import_url, exported, content_type='application/x-ndjson')
+        self.assertEqual(response.data['data']['created'], 1)
+        self.assertEqual(Task.objects.filter(user=self.user, title='Round trip').count(), 2)
+
+    def test_invalid_requests(self):
+        response = self.client.post(self.import_url + '?input=xml', 'x', content_type='application/xml')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.import_url, b'\xff\xfe\n', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['data']['checkpoint'], 0)
+
+    def test_command_resumes_from_checkpoint(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = f'{directory}/tasks.ndjson'
+            checkpoint = f'{directory}/tasks.checkpoint'
+            with open(path, 'w') as f:
+                f.write(self.ndjson(*[
+                    {'title': f'Task {i}', 'due_date': '2030-01-01T10:00:00Z'} for i in range(1, 6)
+                ]))
+            with open(checkpoint, 'w') as f:
+                f.write('3')
+            out = io.StringIO()
+            call_command('import_tasks', path, '--user', self.user.email, '--checkpoint', checkpoint, stdout=out)
+            self.assertIn('Imported 2 tasks', out.getvalue())
+            self.assertFalse(os.path.exists(checkpoint))
+        self.assertEqual(
+            sorted(Task.objects.filter(user=self.user).values_list('title', flat=True)), ['Task 4', 'Task 5']
+        )
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            fullname='Auth User',
+            phone='0541810015',
+            email='auth@example.com',
+            password='Sp33d1'
+        )
+        self.token = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token.access_token}')
+        self.task_url = reverse('task-list')
+
+    def test_second_request_skips_user_query(self):
+        self.client.get(self.task_url, format='json')
+        with self.settings(TASK_LIST_CACHE=None), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.task_url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any('"todo_user"' in query['sql'] for query in queries))
+
+    def test_deactivation_is_seen_immediately(self):
+        self.client.get(self.task_url, format='json')
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.task_url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_changes_in_other_processes_are_seen_within_ttl(self):
+        self.assertLessEqual(settings.TASK_AUTH_USER_CACHE_TTL, 5)
+        self.client.get(self.task_url, format='json')
+        # update() sends no signal, like a save in another process.
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.get(self.task_url, format='json').status_code, status.HTTP_200_OK)
+        expired = time.monotonic() + settings.TASK_AUTH_USER_CACHE_TTL + 1
+        with patch('todo.authentication.time.monotonic', return_value=expired):
+            response = self.client.get(self.task_url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_zero_ttl_turns_the_cache_off(self):
+        with self.settings(TASK_AUTH_USER_CACHE_TTL=0, TASK_LIST_CACHE=None):
+            self.client.get(self.task_url, format='json')
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(self.task_url, format='json')
+        self.assertTrue(any('"todo_user"' in query['sql'] for query in queries))
+
+    def test_password_change_revokes_old_tokens(self):
+        self.client.get(self.task_url, format='json')
+        self.user.set_password('N3wPass')
+        self.user.save()
+        with patch.object(jwt_settings, 'CHECK_REVOKE_TOKEN', True):
+            old_token = RefreshToken.for_user(User.objects.get(pk=self.user.pk)).access_token
+            response = self.client.get(self.task_url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {old_token}')
+            self.assertEqual(self.client.get(self.task_url, format='json').status_code, status.HTTP_200_OK)
+
+    def test_entries_expire_and_are_bounded(self):
+        cache = UserCache()
+        with self.settings(TASK_AUTH_USER_CACHE_TTL=60, TASK_AUTH_USER_CACHE_SIZE=2):
+            cache.set(1, self.user)
+            cache.set(2, self.user)
+            self.assertIsNotNone(cache.get(1))
+            cache.set(3, self.user)
+            self.assertIsNone(cache.get(2))
+            self.assertIsNotNone(cache.get(1))
+            with patch('todo.authentication.time.monotonic', return_value=time.monotonic() + 61):
+                self.assertIsNone(cache.get(1))
+        self.assertIsNot(cache.get(3), cache.get(3))
+
+
+class AsyncTaskEndpointTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            fullname='Async User',
+            phone='0541810016',
+            email='async@example.com',
+            password='Sp33d1'
+        )
+        self.token = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token.access_token}')
+        due = timezone.make_aware(datetime(2030, 1, 1))
+        self.tasks = [
+            Task.objects.create(title=f'Async {i}', due_date=due + timedelta(days=i), user=self.user)
+            for i in range(12)
+        ]
+
+    def assertSameResponse(self, sync_url, async_url, params=None, **headers):
+        with self.settings(TASK_LIST_CACHE=None):
+            expected = self.client.get(sync_url, params, **headers)
+            actual = self.client.get(async_url, params, **headers)
+        self.assertEqual(actual.status_code, expected.status_code)
+        # page links point at the endpoint that served them
+        self.assertEqual(actual.content.replace(b'/api/async/', b'/api/'), expected.content)
+        return actual
+
+    def test_list_matches_sync(self):
+        sync_url, async_url = reverse('task-list'), reverse('async-task-list')
+        self.assertSameResponse(sync_url, async_url)
+        self.assertSameResponse(sync_url, async_url, {'page': 2, 'ordering': '-due_date', 'search': 'async'})
+        self.assertSameResponse(sync_url, async_url, {'status': 'bogus'})
+        first = self.assertSameResponse(sync_url, async_url, {'pagination': 'cursor', 'page_size': 5})
+        self.assertSameResponse(sync_url, async_url, {'cursor': first.json()['next'].split('cursor=')[1]})
+        self.assertSameResponse(sync_url, async_url, {'cursor': 'garbage'})
+        response = self.client.get(async_url, {'pagination': 'cursor', 'page_size': 5}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_matches_sync(self):
+        task = self.tasks[0]
+        response = self.assertSameResponse(
+            reverse('task-detail', args=[task.pk]), reverse('async-task-detail', args=[task.pk])
+        )
+        self.assertEqual(response['ETag'], task_etag(task.pk, task.updated_at))
+        self.assertSameResponse(reverse('task-detail', args=[0]), reverse('async-task-detail', args=[0]))
+
+    def test_status_update(self):
+        task = self.tasks[0]
+        url = reverse('async-task-status', args=[task.pk])
+        etag = self.client.get(reverse('async-task-detail', args=[task.pk]))['ETag']
+        response = self.client.patch(url, {'status': 'completed'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['data']['status'], 'completed')
+        response = self.client.patch(url, {'status': 'pending'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        response = self.client.patch(url, {'status': 'done'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.patch(reverse('async-task-status', args=[0]), {'status': 'pending'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_csrf_exempt_like_sync(self):
+        client = self.client_class(enforce_csrf_checks=True)
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token.access_token}')
+        task = self.tasks[0]
+        for name in ('task-status', 'async-task-status'):
+            response = client.patch(reverse(name, args=[task.pk]), {'status': 'completed'}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK, name)
+
+    def test_authentication_required(self):
+        self.client.credentials()
+        response = self.client.get(reverse('async-task-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer not-a-token')
+        response = self.client.get(reverse('async-task-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.json()['code'], 'token_not_valid')
+
+    async def test_runs_on_the_event_loop(self):
+        response = await self.async_client.get(
+            reverse('async-task-list'), headers={'Authorization': f'Bearer {self.token.access_token}'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['count'], 12)
+
+
+class BenchTests(APITestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        self.seeded = seed(2, 5, 50, rng)
+        self.scenarios = Scenarios(self.seeded, rng)
+
+    def test_seed(self):
+        self.assertEqual(Task.objects.count(), 10)
+        self.assertTrue(all(len(task.description) <= 50 for task in Task.objects.all()))
+        self.assertEqual([len(task_ids) for _, _, task_ids in self.seeded], [5, 5])
+
+    def test_scenarios_succeed(self):
+        transport = ClientTransport()
+        for name in ['login', 'list', 'filter', 'search', 'create', 'status', 'mixed']:
+            with self.subTest(name):
+                run = run_scenario(transport, getattr(self.scenarios, name), 3, 1)
+                self.assertEqual(run['errors'], 0)
+                self.assertEqual(run['requests'], 3)
+                self.assertLessEqual(run['p50_ms'], run['p95_ms'])
+                self.assertLessEqual(run['p95_ms'], run['p99_ms'])
+                self.assertGreater(run['queries_per_request'], 0)
+
+    def test_compare(self):
+        run = {'key': 'list/client/200', 'p95_ms': 10.0, 'p99_ms': 20.0, 'req_per_s': 100.0}
+        baseline = {'runs': [run]}
+        self.assertEqual(list(compare({'runs': [dict(run, p95_ms=11.0)]}, baseline, 0.2)), [])
+        self.assertEqual(
+            list(compare({'runs': [dict(run, p99_ms=30.0, req_per_s=50.0)]}, baseline, 0.2)),
+            [('list/client/200', 'p99_ms', 20.0, 30.0), ('list/client/200', 'req_per_s', 100.0, 50.0)]
+        )
+        self.assertEqual(list(compare({'runs': [dict(run, key='new')]}, baseline, 0.2)), [])
+
+
+class DatabaseProfileTests(TestCase):
+    def test_production_profile_pragmas(self):
+        with tempfile.TemporaryDirectory() as directory:
+            profile = settings.DATABASE_PROFILES['production']
+            wrapper = type(connections['default'])(
+                {**connection.settings_dict, **profile, 'NAME': os.path.join(directory, 'profile.sqlite3')},
+                alias='profile'
+            )
+            try:
+                with wrapper.cursor() as cursor:
+                    pragmas = {}
+                    for pragma in ['journal_mode', 'synchronous', 'busy_timeout', 'temp_store']:
+                        cursor.execute(f'PRAGMA {pragma}')
+                        pragmas[pragma] = cursor.fetchone()[0]
+            finally:
+                wrapper.close()
+        self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 5000, 'temp_store': 2})
+        self.assertEqual(wrapper.transaction_mode, 'IMMEDIATE')
+        self.assertEqual(profile['CONN_MAX_AGE'], 600)
+
+
+class RequestMetricsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            fullname='Metrics User',
+            phone='0541810017',
+            email='metrics@example.com',
+            password='Sp33d1'
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        due = timezone.make_aware(datetime(2030, 1, 1))
+        Task.objects.bulk_create(Task(title=f'Metric {i}', due_date=due, user=self.user) for i in range(3))
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def scrape(self):
+        with self.settings(TASK_METRICS_TOKEN='scrape'):
+            response = self.client_class().get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.content.decode()
+
+    def test_sampled_request(self):
+        url = reverse('task-list')
+        with self.settings(TASK_METRICS_SAMPLE_RATE=1, TASK_METRICS_SERVER_TIMING=True, TASK_LIST_CACHE=None):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            query_count = len(queries)
+            metrics = self.scrape()
+        self.assertRegex(
+            response['Server-Timing'],
+            rf'^db;dur=[\d.]+;desc="{query_count} queries", serialize;dur=[\d.]+, total;dur=[\d.]+$'
+        )
+        self.assertIn('todo_requests_total{view="task-list",method="GET",status="200"} 1', metrics)
+        self.assertIn('todo_request_duration_seconds_count{view="task-list",method="GET"} 1', metrics)
+        self.assertIn(f'todo_request_queries_sum{{view="task-list",method="GET"}} {query_count}', metrics)
+        self.assertIn('todo_request_queries_bucket{view="task-list",method="GET",le="+Inf"} 1', metrics)
+
+    def test_unsampled_request(self):
+        with self.settings(TASK_METRICS_SAMPLE_RATE=0, TASK_METRICS_SERVER_TIMING=True):
+            response = self.client.get(reverse('task-list'))
+            metrics = self.scrape()
+        self.assertNotIn('Server-Timing', response)
+        self.assertIn('todo_requests_total{view="task-list",method="GET",status="200"} 1', metrics)
+        self.assertNotIn('todo_request_duration_seconds_count{view="task-list"', metrics)
+
+    def test_async_request_counts_queries(self):
+        with self.settings(TASK_METRICS_SAMPLE_RATE=1, TASK_METRICS_SERVER_TIMING=True, TASK_LIST_CACHE=None):
+            response = self.client.get(reverse('async-task-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
+
+    def test_server_timing_is_opt_in(self):
+        with self.settings(TASK_METRICS_SAMPLE_RATE=1, TASK_METRICS_SERVER_TIMING=False):
+            response = self.client.get(reverse('task-list'))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_metrics_token(self):
+        self.client.credentials()
+        with self.settings(TASK_METRICS_TOKEN='scrape'):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_403_FORBIDDEN)
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('# TYPE todo_request_queries histogram', response.content.decode())
+
+    def test_metrics_closed_without_token(self):
+        self.client.credentials()
+        with self.settings(TASK_METRICS_TOKEN=None):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_403_FORBIDDEN)
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ')
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+            self.client.force_login(self.user)
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_403_FORBIDDEN)
+            self.user.is_admin = True
+            self.user.save()
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_200_OK)
+
+    def test_histogram_buckets(self):
+        histogram = Histogram((1, 5))
+        for value in (0, 1, 3, 9):
+            histogram.observe(value)
+        self.assertEqual(histogram.snapshot(), ([2, 1, 1], 13, 4))
+
+
+class QueryCountAssertions:
+    """Pin the number of queries an endpoint runs, whatever the page size."""
+    page_sizes = (1, 10, 50)
+
+    def assertQueriesPerPage(self, expected, url, params=None, page_sizes=None, **extra):
+        """GET ``url`` once per page size and assert each request runs exactly ``expected`` queries.
+
+        The list cache is disabled and the user cache warmed first, so only
+        the endpoint's own queries count.
+        """
+        with self.settings(TASK_LIST_CACHE=None):
+            self.assertEqual(self.client.get(url, params, **extra).status_code, status.HTTP_200_OK)
+            counts = {}
+            for page_size in page_sizes or self.page_sizes:
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, {**(params or {}), 'page_size': page_size}, **extra)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                counts[page_size] = len(queries)
+        self.assertEqual(
+            counts, dict.fromkeys(counts, expected),
+            f'{url} query count depends on page size or changed: {counts}'
+        )
+
+
+class QueryCountTests(QueryCountAssertions, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            fullname='Query User',
+            phone='0541810018',
+            email='queries@example.com',
+            password='Sp33d1'
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        due = timezone.make_aware(datetime(2030, 1, 1))
+        Task.objects.bulk_create(
+            Task(title=f'Query task {i}', due_date=due + timedelta(days=i), user=self.user,
+                 status=['pending', 'completed'][i % 2])
+            for i in range(60)
+        )
+
+    @override_settings(TASK_REPEATED_QUERY_THRESHOLD=2, TASK_REPEATED_QUERY_ACTION='raise')
+    def test_task_list(self):
+        url = reverse('task-list')
+        self.assertQueriesPerPage(2, url)
+        self.assertQueriesPerPage(2, url, {'status': 'pending', 'ordering': '-due_date'})
+        self.assertQueriesPerPage(2, url, {'search': 'query'})
+        self.assertQueriesPerPage(1, url, {'pagination': 'cursor'})
+        self.assertQueriesPerPage(2, reverse('async-task-list'))
+
+    @override_settings(TASK_FAST_READ=False)
+    def test_task_list_serializer_path(self):
+        self.assertQueriesPerPage(2, reverse('task-list'))
+
+
+class ExecuteWrapperTests(TestCase):
+    def test_installed_once_on_every_connection(self):
+        def wrapper(execute, sql, params, many, context):
+            return execute(sql, params, many, context)
+
+        def uninstall():
+            connection_created.disconnect(dispatch_uid='todo.tests.wrapper')
+            for conn in connections.all(initialized_only=True):
+                if wrapper in conn.execute_wrappers:
+                    conn.execute_wrappers.remove(wrapper)
+        self.addCleanup(uninstall)
+        install_execute_wrapper(wrapper, 'todo.tests.wrapper')
+        install_execute_wrapper(wrapper, 'todo.tests.wrapper')
+        self.assertEqual(connection.execute_wrappers.count(wrapper), 1)
+
+        def new_connection():
+            conn = connections['default']
+            try:
+                conn.ensure_connection()
+                return conn.execute_wrappers.count(wrapper)
+            finally:
+                conn.close()
+        with ThreadPoolExecutor(1) as executor:
+            self.assertEqual(executor.submit(new_connection).result(), 1)
+
+        def opened_inside_a_block():
+            conn = connections['default']
+            block = lambda execute, sql, params, many, context: execute(sql, params, many, context)
+            try:
+                with conn.execute_wrapper(block):
+                    conn.ensure_connection()
+                return conn.execute_wrappers.copy(), block
+            finally:
+                conn.close()
+        with ThreadPoolExecutor(1) as executor:
+            wrappers, block = executor.submit(opened_inside_a_block).result()
+        self.assertIn(wrapper, wrappers)
+        self.assertNotIn(block, wrappers)
+
+
+class RepeatedQueryMiddlewareTests(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/api/tasks/')
+
+    def view(self, times):
+        def get_response(request):
+            for pk in range(times):
+                list(Task.objects.filter(pk=pk))
+            return HttpResponse()
+        return RepeatedQueryMiddleware(get_response)
+
+    def test_sql_template(self):
+        self.assertEqual(
+            sql_template('SELECT 1 FROM t WHERE id IN (%s, %s,%s) AND a = %s'),
+            'SELECT 1 FROM t WHERE id IN (%s...) AND a = %s'
+        )
+
+    @override_settings(TASK_REPEATED_QUERY_THRESHOLD=3, TASK_REPEATED_QUERY_ACTION='raise')
+    def test_raise(self):
+        self.view(3)(self.request)
+        with self.assertRaisesMessage(RepeatedQueryError, '4x SELECT'):
+            self.view(4)(self.request)
+
+    @override_settings(TASK_REPEATED_QUERY_THRESHOLD=3, TASK_REPEATED_QUERY_ACTION='log')
+    def test_log(self):
+        with self.assertLogs('todo.querycheck', 'WARNING') as logs:
+            self.assertEqual(self.view(5)(self.request).status_code, 200)
+        self.assertIn('GET /api/tasks/ repeated queries more than 3 times', logs.output[0])
+
+    @override_settings(TASK_REPEATED_QUERY_THRESHOLD=None)
+    def test_disabled(self):
+        self.view(20)(self.request)
+
+
+class TaskStatsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            fullname='Stats User',
+            phone='0541810019',
+            email='stats@example.com',
+            password='Sp33d1'
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.url = reverse('task-stats')
+        # A Wednesday noon, so today and the rest of the week are unambiguous.
+        self.now = timezone.make_aware(datetime(2030, 1, 2, 12))
+        rows = [
+            ('pending', self.now - timedelta(days=2)),
+            ('in_progress', self.now - timedelta(minutes=1)),
+            ('pending', self.now + timedelta(hours=1)),
+            ('pending', self.now + timedelta(days=4)),
+            ('pending', self.now + timedelta(days=5)),
+            ('completed', self.now - timedelta(days=3)),
+        ]
+        self.tasks = Task.objects.bulk_create(
+            Task(title=f'Stats {i}', due_date=due, status=task_status, user=self.user)
+            for i, (task_status, due) in enumerate(rows)
+        )
+        other = User.objects.create_user(fullname='Other', phone='0541810020', email='stats2@example.com', password='x')
+        Task.objects.create(title='Other', due_date=self.now - timedelta(days=1), user=other)
+
+    def complete_after(self, task, seconds):
+        Task.objects.filter(pk=task.pk).update(status_changed_at=task.created_at + timedelta(seconds=seconds))
+
+    def test_stats(self):
+        self.assertEqual(Task.objects.for_user(self.user).stats(now=self.now), {
+            'total': 6,
+            'by_status': {'pending': 4, 'in_progress': 1, 'completed': 1},
+            'overdue': 2,
+            'due_today': 2,
+            'due_this_week': 3,
+            'median_completion_seconds': None,
+        })
+
+    def test_endpoint(self):
+        self.complete_after(self.tasks[5], 120)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['message'], 'Task statistics retrieved successfully.')
+        data = response.json()['data']
+        self.assertEqual(data['total'], 6)
+        self.assertEqual(data['median_completion_seconds'], 120)
+        overdue = self.client.get(reverse('task-list'), {'is_overdue': 'true'}).json()['count']
+        self.assertEqual(data['overdue'], overdue)
+
+    def test_median(self):
+        self.assertIsNone(Task.objects.for_user(self.user).median_completion())
+        for task, seconds in zip(self.tasks, [50, 10, 30, 20, 40]):
+            Task.objects.filter(pk=task.pk).update(status='completed')
+            self.complete_after(task, seconds)
+        self.assertEqual(Task.objects.for_user(self.user).median_completion(), 30)
+        self.complete_after(self.tasks[5], 35)
+        self.assertEqual(Task.objects.for_user(self.user).median_completion(), 32.5)
+
+    def test_queries_and_cache(self):
+        self.complete_after(self.tasks[5], 60)
+        self.client.get(self.url)
+        cache_key = task_list_cache.user_key(self.user.pk, 'stats')
+        task_list_cache.cache.delete(cache_key)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        # counters row, open tasks due before next week, median
+        self.assertEqual(len(queries), 3)
+        with self.settings(TASK_STATS_COUNTERS=False):
+            task_list_cache.cache.delete(cache_key)
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(self.url)
+            self.assertEqual(len(queries), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).json()['data']['total'], 6)
+        self.client.post(reverse('task-list'), {
+            'title': 'New', 'due_date': (self.now + timedelta(days=1)).isoformat()
+        }, format='json')
+        self.assertEqual(self.client.get(self.url).json()['data']['total'], 7)
+
+    def test_authentication_required(self):
+        self.client.credentials()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class UserTaskStatsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            fullname='Counter User',
+            phone='0541810021',
+            email='counters@example.com',
+            password='Sp33d1'
+        )
+        self.other = User.objects.create_user(
+            fullname='Counter Other',
+            phone='0541810022',
+            email='counters2@example.com',
+            password='Sp33d1'
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.due = timezone.make_aware(datetime(2030, 1, 1))
+        self.counters = get_task_counters()
+
+    def counts(self, user=None):
+        row = UserTaskStats.objects.filter(user=user or self.user).first()
+        return row.counts() if row is not None else None
+
+    def assertCounts(self, total, pending=0, in_progress=0, completed=0, user=None):
+        self.assertEqual(self.counts(user), {
+            'total': total,
+            'by_status': {'pending': pending, 'in_progress': in_progress, 'completed': completed},
+        })
+        self.assertEqual(self.counters.check(), [])
+
+    def test_every_write_path(self):
+        task = Task.objects.create(title='One', due_date=self.due, user=self.user)
+        self.assertCounts(1, pending=1)
+        task.status = 'in_progress'
+        task.save()
+        self.assertCounts(1, in_progress=1)
+        tasks = Task.objects.bulk_create(
+            Task(title=f'Bulk {i}', due_date=self.due, user=self.user, status='completed') for i in range(3)
+        )
+        self.assertCounts(4, in_progress=1, completed=3)
+        Task.objects.transition_status(tasks[0].pk, self.user, 'pending')
+        self.assertCounts(4, pending=1, in_progress=1, completed=2)
+        Task.objects.filter(pk__in=[tasks[1].pk, tasks[2].pk]).update(status='in_progress')
+        self.assertCounts(4, pending=1, in_progress=3)
+        Task.objects.insert_rows([{'title': 'Raw', 'due_date': self.due}], user=self.user)
+        self.assertCounts(5, pending=2, in_progress=3)
+        Task.objects.filter(pk=task.pk).update(user=self.other)
+        self.assertCounts(4, pending=2, in_progress=2)
+        self.assertCounts(1, in_progress=1, user=self.other)
+        Task.objects.filter(user=self.user).delete()
+        self.assertCounts(0)
+
+    def test_bulk_endpoints(self):
+        url = reverse('task-bulk')
+        response = self.client.post(url, [
+            {'title': f'Bulk {i}', 'due_date': self.due.isoformat()} for i in range(3)
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertCounts(3, pending=3)
+        ids = list(Task.objects.filter(user=self.user).values_list('id', flat=True))
+        self.client.patch(url, [{'id': ids[0], 'status': 'completed'}], format='json')
+        self.assertCounts(3, pending=2, completed=1)
+        self.client.delete(url, {'ids': ids[:2]}, format='json')
+        self.assertCounts(1, pending=1)
+
+    def test_rebuild_command(self):
+        Task.objects.bulk_create(Task(title=f'T {i}', due_date=self.due, user=self.user) for i in range(3))
+        UserTaskStats.objects.filter(user=self.user).update(total=7, pending=0)
+        out = io.StringIO()
+        with self.assertRaisesMessage(CommandError, '1 user(s) with wrong task counters'):
+            call_command('rebuild_task_stats', check=True, stdout=out)
+        self.assertIn(f'user {self.user.pk}: stored', out.getvalue())
+        call_command('rebuild_task_stats', stdout=io.StringIO())
+        self.assertCounts(3, pending=3)
+        call_command('rebuild_task_stats', check=True, stdout=io.StringIO())
+
+    def test_list_count_from_counters(self):
+        Task.objects.bulk_create(
+            Task(title=f'T {i}', due_date=self.due, user=self.user, status=['pending', 'completed'][i % 2])
+            for i in range(5)
+        )
+        url = reverse('task-list')
+        with self.settings(TASK_LIST_CACHE=None):
+            self.client.get(url)
+            with self.assertNumQueries(2):
+                self.assertEqual(self.client.get(url).json()['count'], 5)
+            # A deliberately wrong counter shows where the count comes from.
+            UserTaskStats.objects.filter(user=self.user).update(total=50, completed=20)
+            self.assertEqual(self.client.get(url, {'page': 1, 'ordering': 'due_date'}).json()['count'], 50)
+            self.assertEqual(self.client.get(url, {'status': 'completed'}).json()['count'], 20)
+            self.assertEqual(self.client.get(reverse('async-task-list')).json()['count'], 50)
+            self.assertEqual(self.client.get(url, {'search': 'T'}).json()['count'], 5)
+            self.assertEqual(self.client.get(url, {'status': 'pending', 'title': 'T'}).json()['count'], 3)
+            with self.settings(TASK_STATS_COUNTERS=False):
+                self.assertEqual(self.client.get(url).json()['count'], 5)
+
+    def test_user_without_tasks(self):
+        with self.settings(TASK_LIST_CACHE=None):
+            self.assertEqual(self.client.get(reverse('task-list')).json()['count'], 0)
+            self.assertEqual(self.client.get(reverse('task-stats')).json()['data']['total'], 0)
+
+
+class TaskSyncTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            fullname='Sync User',
+            phone='0541810023',
+            email='sync@example.com',
+            password='Sp33d1'
+        )
+        self.other = User.objects.create_user(
+            fullname='Sync Other',
+            phone='0541810024',
+            email='sync2@example.com',
+            password='Sp33d1'
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.url = reverse('task-sync')
+        self.due = timezone.make_aware(datetime(2030, 1, 1))
+
+    def sync(self, cursor=None):
+        params = {'since': cursor} if cursor is not None else {}
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        return response.json()['data']
+
+    def test_changes_since_cursor(self):
+        kept = Task.objects.create(title='Kept', due_date=self.due, user=self.user)
+        cursor = self.sync()['cursor']
+        self.assertEqual(self.sync(cursor)['changed'], [])
+        created = Task.objects.create(title='Created', due_date=self.due, user=self.user)
+        Task.objects.transition_status(kept.pk, self.user, 'completed')
+        gone = Task.objects.create(title='Gone', due_date=self.due, user=self.user).pk
+        Task.objects.filter(pk=gone).delete()
+        Task.objects.create(title='Not mine', due_date=self.due, user=self.other)
+        data = self.sync(cursor)
+        expected = Task.objects.filter(pk__in=[kept.pk, created.pk]).order_by('pk')
+        self.assertEqual(
+            sorted(data['changed'], key=lambda task: task['id']),
+            json.loads(JSONRenderer().render(TaskSerializer(expected, many=True).data))
+        )
+        self.assertEqual(data['deleted'], [gone])
+        self.assertFalse(data['has_more'])
+        self.assertEqual(self.sync(data['cursor'])['changed'], [])
+
+    def test_every_write_path_is_logged(self):
+        cursor = self.sync()['cursor']
+        tasks = Task.objects.bulk_create(Task(title=f'Bulk {i}', due_date=self.due, user=self.user) for i in range(2))
+        Task.objects.insert_rows([{'title': 'Raw', 'due_date': self.due}], user=self.user)
+        data = self.sync(cursor)
+        self.assertEqual(len(data['changed']), 3)
+        cursor = data['cursor']
+        Task.objects.filter(pk=tasks[0].pk).update(title='Renamed')
+        Task.objects.filter(pk=tasks[1].pk).update(user=self.other)
+        data = self.sync(cursor)
+        self.assertEqual([task['title'] for task in data['changed']], ['Renamed'])
+        self.assertEqual(data['deleted'], [tasks[1].pk])
+
+    def test_pages_through_backlog(self):
+        cursor = self.sync()['cursor']
+        Task.objects.bulk_create(Task(title=f'T {i}', due_date=self.due, user=self.user) for i in range(5))
+        seen = []
+        with self.settings(TASK_SYNC_PAGE_SIZE=2):
+            while True:
+                data = self.sync(cursor)
+                seen.extend(task['title'] for task in data['changed'])
+                cursor = data['cursor']
+                if not data['has_more']:
+                    break
+        self.assertEqual(seen, [f'T {i}' for i in range(5)])
+
+    def test_query_count(self):
+        cursor = self.sync()['cursor']
+        Task.objects.bulk_create(Task(title=f'T {i}', due_date=self.due, user=self.user) for i in range(20))
+        self.sync(cursor)
+        with self.settings(TASK_REPEATED_QUERY_THRESHOLD=None):
+            with CaptureQueriesContext(connection) as queries:
+                self.sync(cursor)
+        # Log page and task rows; the user comes from the auth cache.
+        self.assertEqual(len(queries), 2)
+
+    def test_invalid_and_expired_cursors(self):
+        response = self.client.get(self.url, {'since': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('since', response.json()['errors'])
+        for payload in ('{"c":1,"t":1e999}', '{"c":1e999,"t":1}', '{"c":1,"t":1%s}' % ('0' * 400),
+                        '{"c":1%s,"t":1}' % ('0' * 30)):
+            cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+            response = self.client.get(self.url, {'since': cursor})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, payload)
+        expired = encode_cursor(0, timezone.now() - timedelta(days=31))
+        with self.settings(TASK_SYNC_RETENTION_DAYS=30):
+            response = self.client.get(self.url, {'since': expired})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+    def test_compaction_keeps_sync_result(self):
+        cursor = self.sync()['cursor']
+        task = Task.objects.create(title='Edited', due_date=self.due, user=self.user)
+        for i in range(3):
+            Task.objects.filter(pk=task.pk).update(title=f'Edit {i}')
+        gone = Task.objects.create(title='Gone', due_date=self.due, user=self.user)
+        gone.delete()
+        before = self.sync(cursor)
+        TaskChange.objects.filter(user=self.user).update(changed_at=timezone.now() - timedelta(days=5))
+        call_command('compact_task_changes', stdout=io.StringIO())
+        self.assertEqual(TaskChange.objects.filter(user=self.user).count(), 2)
+        after = self.sync(cursor)
+        self.assertEqual((after['changed'], after['deleted']), (before['changed'], before['deleted']))
+        TaskChange.objects.filter(user=self.user).update(changed_at=timezone.now() - timedelta(days=40))
+        call_command('compact_task_changes', stdout=io.StringIO())
+        self.assertFalse(TaskChange.objects.filter(user=self.user).exists())
+        with self.assertRaises(CommandError):
+            call_command('compact_task_changes', days=1, stdout=io.StringIO())
+
+
+class TaskEventTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            fullname='Event User',
+            phone='0541810025',
+            email='events@example.com',
+            password='Sp33d1'
+        )
+        self.other = User.objects.create_user(
+            fullname='Event Other',
+            phone='0541810026',
+            email='events2@example.com',
+            password='Sp33d1'
+        )
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.due = timezone.make_aware(datetime(2030, 1, 1)).isoformat()
+
+    async def open_stream(self):
+        response = await self.async_client.get(reverse('task-events'), {'access_token': self.token})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+        return stream
+
+    async def read_event(self, stream):
+        chunk = (await asyncio.wait_for(anext(stream), 5)).decode()
+        event, data = chunk.split('\n')[:2]
+        return event.removeprefix('event: '), json.loads(data.removeprefix('data: '))
+
+    def write(self, method, url, data=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(url, data, format='json')
+
+    async def test_pushes_task_writes(self):
+        stream = await self.open_stream()
+        write = sync_to_async(self.write)
+        response = await write('post', reverse('task-list'), {'title': 'Pushed', 'due_date': self.due})
+        self.assertEqual(await self.read_event(stream), ('created', response.json()))
+        pk = response.json()['id']
+        response = await write('patch', reverse('task-detail', args=[pk]), {'title': 'Renamed'})
+        self.assertEqual(await self.read_event(stream), ('updated', response.json()['data']))
+        response = await write('patch', reverse('task-status', args=[pk]), {'status': 'completed'})
+        self.assertEqual(await self.read_event(stream), ('status', response.json()['data']))
+        response = await write('patch', reverse('async-task-status', args=[pk]), {'status': 'pending'})
+        self.assertEqual(await self.read_event(stream), ('status', response.json()['data']))
+        await sync_to_async(Task.objects.create)(title='Not mine', due_date=self.due, user=self.other)
+        await write('post', reverse('task-bulk'), [{'title': 'Bulk', 'due_date': self.due}])
+        self.assertEqual(await self.read_event(stream), ('sync', None))
+        await write('delete', reverse('task-detail', args=[pk]))
+        self.assertEqual(await self.read_event(stream), ('deleted', {'id': pk}))
+        # A dropped connection leaves no subscription behind.
+        await stream.aclose()
+        del stream
+        gc.collect()
+        await asyncio.sleep(0)
+        self.assertEqual(get_task_event_broker().subscriber_count(self.user.pk), 0)
+
+    async def test_slow_client_is_told_to_resync(self):
+        broker = get_task_event_broker()
+        with self.settings(TASK_EVENTS_QUEUE_SIZE=2):
+            stream = await self.open_stream()
+        for i in range(3):
+            broker.publish(self.user.pk, {'event': 'updated', 'data': {'id': i}})
+        await asyncio.sleep(0)
+        self.assertEqual(broker.subscriber_count(self.user.pk), 0)
+        self.assertEqual(await self.read_event(stream), ('resync', None))
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+
+    async def test_heartbeat_and_reconnect(self):
+        with self.settings(TASK_EVENTS_HEARTBEAT=0.01, TASK_EVENTS_MAX_DURATION=0.05):
+            stream = await self.open_stream()
+        chunks = [chunk async for chunk in stream]
+        self.assertIn(b': ping\n\n', chunks)
+        self.assertEqual(set(chunks), {b': ping\n\n'})
+
+    def test_rolled_back_writes_are_not_pushed(self):
+        broker = get_task_event_broker()
+        with patch.object(broker, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse('task-bulk'), [{'title': 'Bulk', 'due_date': 'not a date'}], format='json')
+                self.client.post(reverse('task-list'), {'title': 'Kept', 'due_date': self.due}, format='json')
+        self.assertEqual([call.args[1]['event'] for call in publish.call_args_list], ['created'])
+
+    def test_unchanged_save_is_not_pushed(self):
+        task = Task.objects.create(title='Same', due_date=self.due, user=self.user)
+        with patch.object(get_task_event_broker(), 'publish') as publish:
+            self.write('patch', reverse('task-detail', args=[task.pk]), {'title': 'Same'})
+            self.assertFalse(publish.called)
+            self.write('patch', reverse('task-detail', args=[task.pk]), {'title': 'Changed'})
+        self.assertEqual([call.args[1]['event'] for call in publish.call_args_list], ['updated'])
+
+    def test_not_served_under_wsgi(self):
+        response = self.client.get(reverse('task-events'), {'access_token': self.token})
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+        self.assertEqual(get_task_event_broker().subscriber_count(self.user.pk), 0)
+
+    def test_authentication_required(self):
+        url = reverse('task-events')
+        self.client.credentials()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+        response = self.client.get(url, {'access_token': 'not-a-token'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.json()['code'], 'token_not_valid')
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+@override_settings(TASK_WRITE_COALESCING=True, TASK_WRITE_COALESCE_WINDOW=0.05)
+class WriteCoalescerTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            fullname='Coalesced User',
+            phone='0541810027',
+            email='coalesced@example.com',
+            password='Sp33d1'
+        )
+        self.due = timezone.make_aware(datetime(2030, 1, 1))
+        self.coalescer = WriteCoalescer(window=0.05)
+        self.addCleanup(self.coalescer.stop)
+
+    def create(self, title):
+        if title == 'bad':
+            raise ValueError('bad title')
+        return Task.objects.create(title=title, due_date=self.due, user=self.user).title
+
+    def test_concurrent_writes_share_a_commit(self):
+        titles = [f'Task {i}' for i in range(8)] + ['bad']
+        with ThreadPoolExecutor(max_workers=len(titles)) as pool:
+            futures = {title: pool.submit(self.coalescer.submit, self.create, title) for title in titles}
+        with self.assertRaisesMessage(ValueError, 'bad title'):
+            futures['bad'].result()
+        self.assertEqual([futures[title].result() for title in titles[:-1]], titles[:-1])
+        self.assertEqual(
+            sorted(Task.objects.filter(user=self.user).values_list('title', flat=True)), sorted(titles[:-1])
+        )
+        self.assertEqual(self.coalescer.writes, len(titles))
+        self.assertLess(self.coalescer.batches, len(titles))
+
+    def test_failed_commit_fails_every_write(self):
+        def create_then_break(title):
+            self.create(title)
+            # Invalid from the first write on; SQLite only checks deferred FKs at COMMIT.
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA defer_foreign_keys = ON')
+                cursor.execute('INSERT INTO todo_user_groups (user_id, group_id) VALUES (0, 0)')
+            return title
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [
+                pool.submit(self.coalescer.submit, create_then_break, 'Broken'),
+                pool.submit(self.coalescer.submit, self.create, 'Innocent'),
+            ]
+        for future in futures:
+            with self.assertRaises(IntegrityError):
+                future.result()
+        self.assertFalse(Task.objects.exists())
+
+    def test_dead_writer_fails_its_writes_and_is_replaced(self):
+        started, release = threading.Event(), threading.Event()
+
+        def block(title):
+            started.set()
+            release.wait(5)
+            raise KeyboardInterrupt
+
+        with ThreadPoolExecutor(max_workers=2) as pool, self.assertLogs('todo.coalescer', 'ERROR'):
+            blocked = pool.submit(self.coalescer.submit, block, 'Blocked')
+            started.wait(5)
+            queued = pool.submit(self.coalescer.submit, self.create, 'Queued')
+            while not self.coalescer.queue.qsize():
+                time.sleep(0.01)
+            release.set()
+            for future in (blocked, queued):
+                with self.assertRaisesMessage(RuntimeError, 'coalescer stopped'):
+                    future.result()
+        self.assertEqual(self.coalescer.submit(self.create, 'After'), 'After')
+        self.assertEqual(list(Task.objects.values_list('title', flat=True)), ['After'])
+
+    def test_submit_times_out(self):
+        coalescer = WriteCoalescer(window=0, timeout=0.05)
+        self.addCleanup(coalescer.stop)
+        release = threading.Event()
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            blocked = pool.submit(coalescer.submit, release.wait, 5)
+            with self.assertRaises(TimeoutError):
+                coalescer.submit(self.create, 'Late')
+            release.set()
+            with self.assertRaises(TimeoutError):
+                blocked.result()
+        self.assertFalse(Task.objects.exists())
+
+    def test_api_writes(self):
+        token = RefreshToken.for_user(self.user).access_token
+        headers = {'Authorization': f'Bearer {token}'}
+        response = self.client.post(
+            reverse('task-list'), {'title': 'Coalesced', 'due_date': self.due.isoformat()},
+            content_type='application/json', headers=headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        pk = response.json()['id']
+        response = self.client.patch(
+            reverse('task-status', args=[pk]), {'status': 'completed'}, content_type='application/json',
+            headers=headers
+        )
+        self.assertEqual(response.json()['data']['status'], 'completed')
+        response = self.client.patch(
+            reverse('task-detail', args=[pk]), {'title': 'Renamed'}, content_type='application/json',
+            headers=headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Task.objects.get(pk=pk).title, 'Renamed')
+        self.assertEqual(get_write_coalescer().writes, 3)
+
+    def test_atomic_block_runs_inline(self):
+        with transaction.atomic():
+            self.assertEqual(coalesced_write(threading.get_ident), threading.get_ident())
+        self.assertNotEqual(coalesced_write(threading.get_ident), threading.get_ident())
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """Two SQLite snapshots of the test database stand in for replicas that stopped replicating."""
+    def setUp(self):
+        self.user = User.objects.create_user(
+            fullname='Replica User',
+            phone='0541810028',
+            email='replica@example.com',
+            password='Sp33d1'
+        )
+        self.due = timezone.make_aware(datetime(2030, 1, 1))
+        Task.objects.create(title='Replicated', due_date=self.due, user=self.user)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for alias in ('replica1', 'replica2'):
+            path = os.path.join(directory.name, f'{alias}.sqlite3')
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM INTO %s', [path])
+            connections.settings[alias] = connections.configure_settings(
+                {'default': {}, alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path}}
+            )[alias]
+            self.addCleanup(self.remove_alias, alias)
+            # Connect directly: the test case only lets already-open connections reach other aliases.
+            connections[alias].connect()
+        Task.objects.create(title='Primary only', due_date=self.due, user=self.user)
+        self.client = self.client_class()
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {RefreshToken.for_user(self.user).access_token}'
+
+    def remove_alias(self, alias):
+        connections[alias].close()
+        del connections[alias]
+        del connections.settings[alias]
+
+    def titles(self):
+        response = self.client.get(reverse('task-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(task['title'] for task in response.json()['data'])
+
+    @override_settings(TASK_READ_REPLICAS={'replica1': 1, 'replica2': 1}, TASK_LIST_CACHE=None)
+    def test_reads_follow_writes(self):
+        self.assertEqual(self.titles(), ['Replicated'])
+        response = self.client.post(
+            reverse('task-list'), {'title': 'Mine', 'due_date': self.due.isoformat()}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 5)
+        self.assertEqual(self.titles(), ['Mine', 'Primary only', 'Replicated'])
+        self.client.cookies.pop(PIN_COOKIE)
+        self.assertEqual(self.titles(), ['Replicated'])
+        self.assertFalse(Task.objects.using('replica1').filter(title='Mine').exists())
+
+    @override_settings(TASK_READ_REPLICAS={'replica1': 1})
+    def test_streamed_exports_read_the_replica(self):
+        response = self.client.get(reverse('task-export'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual([json.loads(line)['title'] for line in lines], ['Replicated'])
+        self.assertIsNone(ReplicaRouter().db_for_read(Task))
+
+    @override_settings(TASK_READ_REPLICAS={'replica1': 1})
+    def test_async_streams_read_the_replica(self):
+        async def content():
+            yield ReplicaRouter().db_for_read(Task)
+
+        async def view(request):
+            return StreamingHttpResponse(content())
+
+        async def stream():
+            response = await ReplicaRoutingMiddleware(view)(RequestFactory().get('/'))
+            return [chunk async for chunk in response.streaming_content]
+        self.assertEqual(asyncio.run(stream()), [b'replica1'])
+        self.assertIsNone(ReplicaRouter().db_for_read(Task))
+
+    @override_settings(TASK_LIST_CACHE=None)
+    def test_without_replicas(self):
+        self.assertEqual(self.titles(), ['Primary only', 'Replicated'])
+        response = self.client.post(
+            reverse('task-list'), {'title': 'Mine', 'due_date': self.due.isoformat()}, content_type='application/json'
+        )
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    @override_settings(TASK_READ_REPLICAS={'replica1': 1})
+    def test_replica_reads_are_cached_briefly(self):
+        timeouts = []
+
+        def view(request):
+            timeouts.append(cache_timeout(300))
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(view)
+        factory = RequestFactory()
+        pinned = factory.get('/')
+        pinned.COOKIES[PIN_COOKIE] = '1'
+        for request in [factory.get('/'), factory.post('/'), pinned]:
+            middleware(request)
+        self.assertEqual(timeouts, [5, 300, 300])
+        self.assertEqual(cache_timeout(300), 300)
+
+    def test_weighted_choice(self):
+        rng = random.Random(0)
+        picks = collections.Counter(
+            choose_replica({'replica1': 3, 'replica2': 1, 'drained': 0}, rng) for _ in range(4000)
+        )
+        self.assertNotIn('drained', picks)
+        self.assertAlmostEqual(picks['replica1'] / picks['replica2'], 3, delta=0.3)
+
+
+@override_settings(TASK_SHARDS=['default', 'shard1'], TASK_LIST_CACHE=None, TASK_AUTH_USER_CACHE_TTL=0)
+class ShardTests(TransactionTestCase):
+    """A second SQLite file, migrated as a shard, holds the tasks of users placed on it."""
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'shard1.sqlite3')
+        connections.settings['shard1'] = connections.configure_settings(
+            {'default': {}, 'shard1': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path}}
+        )['shard1']
+        self.addCleanup(self.remove_shard)
+        # Connect directly: the test case only lets already-open connections reach other aliases.
+        connections['shard1'].connect()
+        call_command('migrate', database='shard1', verbosity=0)
+        self.due = timezone.make_aware(datetime(2030, 1, 1))
+        self.user = self.create_user('shard1', '0541810029')
+
+    def remove_shard(self):
+        connections['shard1'].close()
+        del connections['shard1']
+        del connections.settings['shard1']
+
+    def create_user(self, shard, phone):
+        email = next(
+            email for email in (f'sharded{index}@example.com' for index in range(100))
+            if hash_shard(placement_key(email)) == shard and not User.objects.filter(email=email).exists()
+        )
+        return User.objects.create_user(fullname='Sharded User', phone=phone, email=email, password='Sp33d1')
+
+    def authenticate(self, user):
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {RefreshToken.for_user(user).access_token}'
+
+    def test_shard_holds_only_task_tables(self):
+        tables = connections['shard1'].introspection.table_names()
+        self.assertIn('todo_task', tables)
+        self.assertIn('todo_usertaskstats', tables)
+        self.assertNotIn('todo_user', tables)
+        self.assertEqual(self.user.task_shard, 'shard1')
+        self.assertEqual(self.create_user('default', '0541810030').task_shard, 'default')
+
+    def test_api_uses_the_users_shard(self):
+        self.authenticate(self.user)
+        response = self.client.post(
+            reverse('task-list'), {'title': 'Sharded', 'due_date': self.due.isoformat()}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        pk = response.json()['id']
+        self.assertGreater(pk, SHARD_ID_SPAN)
+        self.assertFalse(Task.objects.exists())
+        self.assertTrue(Task.objects.using('shard1').filter(pk=pk, user=self.user).exists())
+
+        response = self.client.post(
+            reverse('task-bulk'), [{'title': 'Bulk', 'due_date': self.due.isoformat()}], content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.patch(
+            reverse('task-detail', args=[pk]), {'title': 'Renamed'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.patch(
+            reverse('task-status', args=[pk]), {'status': 'completed'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(reverse('task-list'), {'search': 'renamed'})
+        self.assertEqual([task['title'] for task in response.json()['data']], ['Renamed'])
+        stats = self.client.get(reverse('task-stats')).json()['data']
+        self.assertEqual((stats['total'], stats['by_status']['completed']), (2, 1))
+        self.assertEqual(count_across_shards(Task.objects.all()), 2)
+
+        response = self.client.delete(reverse('task-detail', args=[pk]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Task.objects.using('shard1').count(), 1)
+
+    def test_rebalance_moves_tasks_with_their_ids(self):
+        user = self.create_user('shard1', '0541810030')
+        # Tasks from before sharding: an empty directory entry means 'default'.
+        User.objects.filter(pk=user.pk).update(task_shard=None)
+        user.refresh_from_db()
+        task = Task.objects.create(title='Legacy', due_date=self.due, user=user, status='in_progress')
+        self.authenticate(user)
+        cursor = self.client.get(reverse('task-sync')).json()['data']['cursor']
+
+        out = io.StringIO()
+        call_command('rebalance_task_shards', '--dry-run', stdout=out)
+        self.assertIn(f'user {user.pk}: default -> shard1', out.getvalue())
+        self.assertTrue(Task.objects.filter(pk=task.pk).exists())
+        call_command('rebalance_task_shards', stdout=out)
+        self.assertIn('shard1: 2 user(s), 1 task(s)', out.getvalue())
+
+        user.refresh_from_db()
+        self.assertEqual(user.task_shard, 'shard1')
+        self.assertFalse(Task.objects.exists())
+        self.assertFalse(UserTaskStats.objects.exists())
+        moved = Task.objects.using('shard1').get(pk=task.pk)
+        self.assertEqual((moved.title, moved.updated_at), (task.title, task.updated_at))
+        self.assertEqual(UserTaskStats.objects.using('shard1').get(user_id=user.pk).in_progress, 1)
+
+        response = self.client.get(reverse('task-detail', args=[task.pk]))
+        self.assertEqual(response.json()['data']['title'], 'Legacy')
+        # Change ids differ between shards, so the old cursor is no longer valid.
+        response = self.client.get(reverse('task-sync'), {'since': cursor})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+        call_command('rebalance_task_shards', '--user', str(user.pk), '--to', 'default', stdout=out)
+        self.assertEqual(Task.objects.get(pk=task.pk).title, 'Legacy')
+        self.assertFalse(Task.objects.using('shard1').filter(user_id=user.pk).exists())
+        with self.assertRaises(CommandError):
+            call_command('rebalance_task_shards', '--user', str(user.pk), '--to', 'shard9', stdout=out)
+
+    def test_writes_are_refused_while_moving(self):
+        task = Task.objects.on_shard_of(self.user).create(title='Moving', due_date=self.due, user=self.user)
+        User.objects.filter(pk=self.user.pk).update(task_shard_moving=True)
+        self.authenticate(self.user)
+        writes = [
+            ('post', reverse('task-list'), {'title': 'New', 'due_date': self.due.isoformat()}),
+            ('patch', reverse('task-detail', args=[task.pk]), {'title': 'Renamed'}),
+            ('patch', reverse('task-status', args=[task.pk]), {'status': 'completed'}),
+            ('patch', reverse('async-task-status', args=[task.pk]), {'status': 'completed'}),
+            ('delete', reverse('task-bulk'), {'ids': [task.pk]}),
+        ]
+        for method, url, data in writes:
+            response = getattr(self.client, method)(url, data, content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE, url)
+            self.assertEqual(response['Retry-After'], '1')
+            self.assertEqual(response.json()['detail'], TasksMoving.default_detail)
+        self.assertEqual(self.client.get(reverse('task-list')).json()['count'], 1)
+        self.assertEqual(Task.objects.using('shard1').get().title, 'Moving')
+
+    def test_move_waits_out_the_auth_cache(self):
+        Task.objects.on_shard_of(self.user).create(title='Moved', due_date=self.due, user=self.user)
+        directory = []
+
+        def sleep(seconds):
+            user = User.objects.get(pk=self.user.pk)
+            directory.append((seconds, user.task_shard, user.task_shard_moving))
+
+        with self.settings(TASK_AUTH_USER_CACHE_TTL=5), patch('todo.shards.time.sleep', side_effect=sleep):
+            self.assertEqual(move_user(self.user, 'default'), 1)
+        # Writes are refused before the copy; the source is only cleared once no process reads it.
+        self.assertEqual(directory, [(5, 'shard1', True), (5, 'default', False)])
+        self.assertEqual(Task.objects.get().title, 'Moved')
+        for model in (Task, UserTaskStats, TaskChange):
+            self.assertFalse(model.objects.using('shard1').exists(), model)
+
+    def test_move_recopies_writes_that_land_during_the_copy(self):
+        Task.objects.on_shard_of(self.user).create(title='Copied', due_date=self.due, user=self.user)
+        copies = []
+
+        def copy_then_write(*args, **kwargs):
+            copies.append(copy_tasks(*args, **kwargs))
+            if len(copies) == 1:
+                # A write that passed the moving check before the mark reached its process.
+                Task.objects.using('shard1').create(title='Late', due_date=self.due, user=self.user)
+            return copies[-1]
+
+        with patch('todo.shards.copy_tasks', side_effect=copy_then_write):
+            self.assertEqual(move_user(self.user, 'default'), 2)
+        self.assertEqual(copies, [1, 2])
+        self.assertEqual(sorted(Task.objects.values_list('title', flat=True)), ['Copied', 'Late'])
+        self.assertFalse(Task.objects.using('shard1').exists())
+
+    def test_move_keeps_the_source_when_it_changes_after_the_switch(self):
+        task = Task.objects.on_shard_of(self.user).create(title='Copied', due_date=self.due, user=self.user)
+
+        def late_write(seconds):
+            if User.objects.get(pk=self.user.pk).task_shard == 'default':
+                Task.objects.using('shard1').filter(pk=task.pk).update(title='Late')
+
+        with patch('todo.shards.time.sleep', side_effect=late_write), self.assertRaises(MoveConflict):
+            move_user(self.user, 'default')
+        self.assertEqual(Task.objects.using('shard1').get().title, 'Late')
+        self.assertEqual(Task.objects.get().title, 'Copied')
+        self.assertEqual(User.objects.get(pk=self.user.pk).task_shard, 'default')
+
+    def test_deleting_a_user_deletes_sharded_tasks(self):
+        Task.objects.on_shard_of(self.user).create(title='Sharded', due_date=self.due, user=self.user)
+        self.assertEqual(UserTaskStats.objects.for_user(self.user).get().total, 1)
+        self.user.delete()
+        self.assertFalse(Task.objects.using('shard1').exists())
+        self.assertFalse(UserTaskStats.objects.using('shard1').exists())
@@ -1,10 +1,23 @@
 from django.urls import path
-from .views import RegisterView, LoginView, TaskList, TaskDetail, update_task_status
+from . import async_views
+from .views import (
+    RegisterView, LoginView, TaskList, TaskDetail, TaskBulk, TaskExport, TaskImport, TaskStats,
+    TaskSync, update_task_status
+)
 
 urlpatterns = [
         path('register/', RegisterView.as_view(), name = 'register'),
         path('login/', LoginView.as_view(), name = 'login'),
         path('tasks/', TaskList.as_view(), name = 'task-list'),
+        path('tasks/bulk/', TaskBulk.as_view(), name='task-bulk'),
+        path('tasks/export/', TaskExport.as_view(), name='task-export'),
+        path('tasks/stats/', TaskStats.as_view(), name='task-stats'),
+        path('tasks/events/', async_views.task_events, name='task-events'),
+        path('tasks/sync/', TaskSync.as_view(), name='task-sync'),
+        path('tasks/import/', TaskImport.as_view(), name='task-import'),
         path('tasks/<int:pk>/', TaskDetail.as_view(), name='task-detail'),
         path('tasks/<int:pk>/status/', update_task_status, name='task-status'),
+        path('async/tasks/', async_views.task_list, name='async-task-list'),
+        path('async/tasks/<int:pk>/', async_views.task_detail, name='async-task-detail'),
+        path('async/tasks/<int:pk>/status/', async_views.update_task_status, name='async-task-status'),
 ]
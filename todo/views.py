@@ -1,19 +1,38 @@
 from django.shortcuts import render
 from rest_framework import status,  generics
 from rest_framework.response import Response
+from rest_framework.exceptions import APIException, ValidationError
 from rest_framework.views import APIView
-from .serializers import RegisterSerializer, LoginSerializer, TaskSerializer, TaskStatusSerializer
+from .serializers import (
+    RegisterSerializer, LoginSerializer, TaskSerializer, TaskStatusSerializer, TaskBulkSerializer,
+    TaskBulkDeleteSerializer, get_read_plan
+)
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework.permissions import IsAuthenticated
-from django.http import Http404
-from django.shortcuts import get_object_or_404
+from django.http import Http404, StreamingHttpResponse
 from rest_framework.decorators import api_view, permission_classes
-from .models import Task
+from .models import Task, StaleTaskError, UserTaskStats
+from .pagination import TaskPageNumberPagination, TaskCursorPagination
+from .search import TaskSearchFilter, get_search_backend
+from .cache import task_list_cache, invalidate_user_tasks
+from .counters import counters_enabled
+from .events import publish_task_event
+from .coalescer import coalesced_write
+from .replicas import cache_timeout, pinned_to_primary
+from .shards import TaskWritesAllowed, shard_for
+from .changelog import ExpiredCursor, InvalidCursor, changes_since, current_cursor, decode_cursor, get_change_log
+from .export import EXPORT_FORMATS, chunked, csv_lines, ndjson_lines
+from .importer import IMPORT_FORMATS, ImportFormatError, TaskImporter, read_records
+from .conditional import (
+    etag_in, make_etag, matching_task_versions, not_modified, precondition_failed, task_etag
+)
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
 import django_filters
 from .models import Task
-from django.utils import timezone
+from django.conf import settings
+from django.db import transaction
+from datetime import timedelta
 
 
 class RegisterView(APIView):
@@ -21,7 +40,18 @@ class RegisterView(APIView):
         try:
             serializer = RegisterSerializer(data = request.data)
             if serializer.is_valid():
-                serializer.save()
+                try:
+                    serializer.save()
+                except ValidationError as e:
+                    # A unique field was taken; the INSERT found out.
+                    return Response(
+                        {
+                            "success": False,
+                            "message": "Validation error",
+                            "errors": e.detail
+                            },
+                            status = status.HTTP_400_BAD_REQUEST
+                            )
                 return Response(
                     {
                         "success": True,
@@ -59,8 +89,8 @@ class MyView(APIView):
         pass 
 
 class TaskFilter(django_filters.FilterSet):
-    title = django_filters.CharFilter(lookup_expr='icontains')
-    description = django_filters.CharFilter(lookup_expr='icontains')
+    title = django_filters.CharFilter(method='filter_text')
+    description = django_filters.CharFilter(method='filter_text')
     due_date_before = django_filters.DateFilter(field_name='due_date', lookup_expr='lte')
     due_date_after = django_filters.DateFilter(field_name='due_date', lookup_expr='gte')
     status_changed_after = django_filters.DateTimeFilter(field_name='status_changed_at', lookup_expr='gte')
@@ -68,21 +98,65 @@ class TaskFilter(django_filters.FilterSet):
     class Meta:
         model = Task
         fields = ['status', 'title', 'description', 'due_date', 'due_date_before', 
-                  'due_date_after', 'status_changed_after']
+                  'due_date_after', 'status_changed_at', 'status_changed_after']
+
+    def filter_text(self, queryset, name, value):
+        """Match words (or word prefixes) in a single field through the search index."""
+        return get_search_backend(queryset.db).search(queryset, value, fields=[name], rank=False)
 
 class TaskList(generics.ListCreateAPIView):
     #queryset = Task.objects.all()
     serializer_class = TaskSerializer
-    permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['status', 'due_date', 'title', 'description', 'status_changed_at']
+    permission_classes = [IsAuthenticated, TaskWritesAllowed]
+    filter_backends = [DjangoFilterBackend, TaskSearchFilter, filters.OrderingFilter]
+    filterset_class = TaskFilter
     search_fields = ['title', 'description']
     ordering_fields = ['created_at', 'due_date', 'status_changed_at']
- 
+    pagination_class = TaskPageNumberPagination
+
+    @property
+    def paginator(self):
+        """Use keyset pagination when the client asks for it."""
+        if not hasattr(self, '_paginator'):
+            if TaskCursorPagination.is_requested(self.request):
+                self._paginator = TaskCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    # Query parameters that do not narrow the list, so its count is a task counter.
+    count_neutral_params = {'page', 'page_size', 'ordering', 'format'}
+
+    def get_counter_field(self):
+        """The UserTaskStats column equal to the list's row count, or None when it takes a COUNT."""
+        if not counters_enabled():
+            return None
+        params = self.request.query_params
+        narrowing = set(params) - self.count_neutral_params
+        if not narrowing:
+            return 'total'
+        if narrowing == {'status'}:
+            statuses = params.getlist('status')
+            if len(statuses) == 1 and statuses[0] in dict(Task.STATUS_CHOICES):
+                return statuses[0]
+        return None
+
+    def get_known_count(self):
+        """The list's row count read from the user's task counters, or None."""
+        field = self.get_counter_field()
+        if field is None:
+            return None
+        return UserTaskStats.objects.for_user(self.request.user).values_list(field, flat=True).first() or 0
+
+    async def aget_known_count(self):
+        field = self.get_counter_field()
+        if field is None:
+            return None
+        return await UserTaskStats.objects.for_user(self.request.user).values_list(field, flat=True).afirst() or 0
 
     def get_queryset(self):
         """Return tasks filtered by the current user."""
-        queryset = Task.objects.filter(user=self.request.user)
+        queryset = Task.objects.for_user(self.request.user)
         due_date_after = self.request.query_params.get('due_date_after')
         due_date_before = self.request.query_params.get('due_date_before')
         is_overdue = self.request.query_params.get('is_overdue')
@@ -92,13 +166,15 @@ class TaskList(generics.ListCreateAPIView):
         if due_date_before:
             queryset = queryset.filter(due_date__lte=due_date_before)
         if is_overdue and is_overdue.lower() == 'true':
-            queryset = queryset.filter(due_date__lt=timezone.now(), status__in=['pending', 'in_progress'])
+            queryset = queryset.overdue()
             
         return queryset
     
     def perform_create(self, serializer):
         """Assign current user when creating a task."""
-        return serializer.save(user=self.request.user)
+        task = coalesced_write(serializer.save, user=self.request.user, using=shard_for(self.request.user))
+        publish_task_event(self.request.user.pk, 'created', serializer.data)
+        return task
     
     def create(self, request, *args, **kwargs):
         """creating the task."""
@@ -114,26 +190,46 @@ class TaskList(generics.ListCreateAPIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    def get_page_etag(self, page):
+        """ETag for a page from the rows already fetched, so a 304 costs no extra query.
+
+        The page's ids and updated_at values plus the count and links
+        determine the whole response body.
+        """
+        return make_etag(
+            self.request.user.pk,
+            self.request.build_absolute_uri(),
+            self.paginator.get_etag_parts(),
+            [
+                (row['id'], row['updated_at']) if isinstance(row, dict) else (row.pk, row.updated_at)
+                for row in page
+            ]
+        )
+
+    def get_read_plan(self):
+        """Fast read plan for the serializer, or None when TASK_FAST_READ is off."""
+        if not settings.TASK_FAST_READ:
+            return None
+        return get_read_plan(self.get_serializer_class())
+
+    def serialize_rows(self, plan, rows):
+        if plan is not None:
+            return plan.serialize(rows)
+        return self.get_serializer(rows, many=True).data
+
     def list(self, request, *args, **kwargs):
         """List tasks related to a user."""
         try:
-            queryset = self.filter_queryset(self.get_queryset())
+            cache_key, response = self.get_cached_response(request)
+            if response is not None:
+                return response
+            queryset = self.get_list_queryset()
             page = self.paginate_queryset(queryset)
-            
-            if page is not None:
-                serializer = self.get_serializer(page, many=True)
-                return self.get_paginated_response({
-                    "success": True,
-                    "message": "Tasks retrieved successfully.",
-                    "data": serializer.data
-                })
-                
-            serializer = self.get_serializer(queryset, many=True)
-            return Response({
-                "success": True,
-                "message": "Tasks retrieved successfully.",
-                "data": serializer.data
-            })
+            response = self.get_list_response(page, queryset if page is None else None)
+            self.cache_response(cache_key, response)
+            return response
+        except APIException:
+            raise
         except Exception as e:
             return Response({
                 "success": False,
@@ -141,37 +237,267 @@ class TaskList(generics.ListCreateAPIView):
                 "error": str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def get_cached_response(self, request):
+        """Return (cache key, response); the response is None on a miss or when caching is off."""
+        # Overdue results change with the clock, not with writes.
+        if not task_list_cache.enabled or 'is_overdue' in request.query_params:
+            return None, None
+        cache_key, cached = task_list_cache.get(request)
+        if cached is None:
+            return cache_key, None
+        etag, data = cached
+        if etag_in(request.headers.get('If-None-Match'), etag):
+            return cache_key, not_modified(etag)
+        return cache_key, Response(data, headers={'ETag': etag})
+
+    def get_list_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        plan = self.get_read_plan()
+        if plan is not None:
+            queryset = queryset.values(*plan.columns)
+        return queryset
+
+    def get_list_response(self, page, rows=None):
+        """The list response for a fetched page, or for all ``rows`` when unpaginated."""
+        plan = self.get_read_plan()
+        if page is not None:
+            etag = self.get_page_etag(page)
+            if etag_in(self.request.headers.get('If-None-Match'), etag):
+                return not_modified(etag)
+            response = self.get_paginated_response({
+                "success": True,
+                "message": "Tasks retrieved successfully.",
+                "data": self.serialize_rows(plan, page)
+            })
+        else:
+            response = Response({
+                "success": True,
+                "message": "Tasks retrieved successfully.",
+                "data": self.serialize_rows(plan, rows)
+            })
+            etag = make_etag(response.data)
+        response['ETag'] = etag
+        return response
+
+    def cache_response(self, cache_key, response):
+        if cache_key is not None and response.status_code == status.HTTP_200_OK:
+            task_list_cache.set(cache_key, (response['ETag'], response.data))
+
+class TaskStats(APIView):
+    """Dashboard counts for the user's tasks, cached per user.
+
+    Writes to the user's tasks invalidate the entry at once; the time
+    based counts (overdue, due today, this week) can lag the clock by up
+    to TASK_STATS_CACHE_TIMEOUT seconds.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            cache_key = None
+            if task_list_cache.enabled:
+                cache_key = task_list_cache.user_key(request.user.pk, 'stats')
+                data = None if pinned_to_primary(request) else task_list_cache.cache.get(cache_key)
+                if data is not None:
+                    return Response(data)
+            counts = None
+            if counters_enabled():
+                row = UserTaskStats.objects.for_user(request.user).first()
+                counts = row.counts() if row is not None else UserTaskStats().counts()
+            data = {
+                "success": True,
+                "message": "Task statistics retrieved successfully.",
+                "data": Task.objects.for_user(request.user).stats(counts=counts)
+            }
+            if cache_key is not None:
+                task_list_cache.cache.set(cache_key, data, cache_timeout(settings.TASK_STATS_CACHE_TIMEOUT))
+            return Response(data)
+        except Exception as e:
+            return Response(
+                {
+                    "success": False,
+                    "message": "Failed to retrieve task statistics.",
+                    "error": str(e)
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class TaskSync(APIView):
+    """Tasks changed since a sync cursor, for clients that keep a local copy.
+
+    Without ``since`` the response carries only a cursor: the client takes
+    it before downloading everything (``/api/tasks/export/``), then polls
+    with it. Each response returns the current version of every task
+    changed after the cursor, the ids of tasks deleted or moved away, the
+    next cursor and whether more changes are waiting.
+    """
+    permission_classes = [IsAuthenticated]
+    cursor_query_param = 'since'
+
+    def get(self, request):
+        if not get_change_log().enabled:
+            return Response(
+                {
+                    "success": False,
+                    "message": "Delta sync is not available on this database; download all tasks instead."
+                },
+                status=status.HTTP_501_NOT_IMPLEMENTED
+            )
+        cursor = request.query_params.get(self.cursor_query_param)
+        try:
+            if cursor is None:
+                data = {"cursor": current_cursor(request.user), "changed": [], "deleted": [], "has_more": False}
+            else:
+                since = decode_cursor(
+                    cursor, timedelta(days=settings.TASK_SYNC_RETENTION_DAYS), shard_for(request.user)
+                )
+                plan = get_read_plan(TaskSerializer)
+                rows, deleted, next_cursor, has_more = changes_since(
+                    request.user, since, settings.TASK_SYNC_PAGE_SIZE, plan.columns
+                )
+                data = {
+                    "cursor": next_cursor,
+                    "changed": plan.serialize(rows),
+                    "deleted": deleted,
+                    "has_more": has_more
+                }
+            return Response(
+                {
+                    "success": True,
+                    "message": "Task changes retrieved successfully.",
+                    "data": data
+                }
+            )
+        except InvalidCursor:
+            return Response(
+                {
+                    "success": False,
+                    "message": "Validation error",
+                    "errors": {self.cursor_query_param: ["Invalid sync cursor."]}
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except ExpiredCursor:
+            return Response(
+                {
+                    "success": False,
+                    "message": "Sync cursor has expired; download all tasks and sync from a new cursor."
+                },
+                status=status.HTTP_410_GONE
+            )
+        except Exception as e:
+            return Response(
+                {
+                    "success": False,
+                    "message": "Failed to retrieve task changes.",
+                    "error": str(e)
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class TaskExport(TaskList):
+    """Stream every matching task as NDJSON (default) or CSV with ``?output=csv``.
+
+    Accepts the task list's filters, search and ordering. Rows are read with
+    a server-side cursor and written out a chunk at a time, so memory stays
+    bounded however many tasks the user has.
+    """
+    http_method_names = ['get', 'head', 'options']
+    output_query_param = 'output'
+
+    def list(self, request, *args, **kwargs):
+        output = request.query_params.get(self.output_query_param, 'ndjson')
+        if output not in EXPORT_FORMATS:
+            return Response(
+                {
+                    "success": False,
+                    "message": "Validation error",
+                    "errors": {self.output_query_param: [f"Choose one of: {', '.join(EXPORT_FORMATS)}."]}
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = self.filter_queryset(self.get_queryset())
+        if not queryset.query.order_by:
+            queryset = queryset.order_by('id')
+        plan = self.get_read_plan()
+        if plan is not None:
+            queryset = queryset.values(*plan.columns)
+            fieldnames = [name for name, _, _ in plan.plan]
+        else:
+            fieldnames = list(self.get_serializer().fields)
+
+        chunk_size = settings.TASK_EXPORT_CHUNK_SIZE
+        chunks = (
+            self.serialize_rows(plan, chunk)
+            for chunk in chunked(queryset.iterator(chunk_size=chunk_size), chunk_size)
+        )
+        content_type, filename = EXPORT_FORMATS[output]
+        if output == 'csv':
+            lines = csv_lines(chunks, fieldnames)
+        else:
+            lines = ndjson_lines(chunks)
+        response = StreamingHttpResponse(lines, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
 class TaskDetail(generics.RetrieveUpdateDestroyAPIView):
     #queryset = Task.objects.all()
     serializer_class = TaskSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, TaskWritesAllowed]
 
     def get_queryset(self):
         """Only show tasks belonging to this user."""
-        return Task.objects.filter(user=self.request.user)
-    
-    def get_paginated_response(self, data):
-        return Response({
-            'count': self.page.paginator.count,
-            'next': self.get_next_link(),
-            'previous': self.get_previous_link(),
-            'success': True,
-            'message': "Tasks retrieved successfully.",
-            'data': data['data'] if 'data' in data else data
-        })
+        return Task.objects.for_user(self.request.user)
+
+    def get_object(self):
+        """Fetch the task once per request; preconditions and the update share it."""
+        if not hasattr(self, '_object'):
+            self._object = super().get_object()
+        return self._object
+
+    def if_match_fails(self, instance):
+        """Whether an If-Match header was sent and does not match the task's ETag."""
+        if_match = self.request.headers.get('If-Match')
+        return bool(if_match) and not etag_in(if_match, task_etag(instance.pk, instance.updated_at), weak=False)
+
+    def perform_update(self, serializer):
+        if self.request.headers.get('If-Match'):
+            # Re-check updated_at in the UPDATE itself to close the race with other writers.
+            serializer.instance._expected_updated_at = serializer.instance.updated_at
+        coalesced_write(serializer.save, using=shard_for(self.request.user))
+        changed = serializer.changed_fields
+        # A save that changed nothing wrote nothing, so there is nothing to push.
+        if changed is None or changed:
+            publish_task_event(self.request.user.pk, 'updated', serializer.data)
     
     def retrieve(self, request, *args, **kwargs):
         """Retrieve tasks belonging to this user"""
         try:
-            instance = self.get_object()
-            serializer = self.get_serializer(instance)
+            if settings.TASK_FAST_READ:
+                plan = get_read_plan(self.get_serializer_class())
+                row = self.get_queryset().filter(pk=self.kwargs['pk']).values(*plan.columns).first()
+                if row is None:
+                    raise Http404
+                etag = task_etag(row['id'], row['updated_at'])
+                if etag_in(request.headers.get('If-None-Match'), etag):
+                    return not_modified(etag)
+                data = plan.serialize_row(row)
+            else:
+                instance = self.get_object()
+                etag = task_etag(instance.pk, instance.updated_at)
+                if etag_in(request.headers.get('If-None-Match'), etag):
+                    return not_modified(etag)
+                data = self.get_serializer(instance).data
             return Response(
                 {
                     "success": True,
                     "message": "Tasks retrieved successfully.",
-                    "data": serializer.data
+                    "data": data
                 },
-                status = status.HTTP_200_OK
+                status = status.HTTP_200_OK,
+                headers = {'ETag': etag}
             )
         except Http404:
             return Response(
@@ -195,6 +521,9 @@ class TaskDetail(generics.RetrieveUpdateDestroyAPIView):
     def update(self, request, *args, **kwargs):
         """Updates tasks for a user."""
         try:
+            instance = self.get_object()
+            if self.if_match_fails(instance):
+                return precondition_failed()
             response = super().update(request, *args, **kwargs)
             return Response(
                 {
@@ -202,8 +531,11 @@ class TaskDetail(generics.RetrieveUpdateDestroyAPIView):
                     "message": "Task updated successfully",
                     "data": response.data
                 },
-                status = status.HTTP_200_OK
+                status = status.HTTP_200_OK,
+                headers = {'ETag': task_etag(instance.pk, instance.updated_at)}
             )
+        except StaleTaskError:
+            return precondition_failed()
         except Http404:
             return Response(
                 {
@@ -227,7 +559,15 @@ class TaskDetail(generics.RetrieveUpdateDestroyAPIView):
         """Delete a task"""
         try:
             instance = self.get_object()
-            self.perform_destroy(instance)
+            if self.request.headers.get('If-Match'):
+                if self.if_match_fails(instance):
+                    return precondition_failed()
+                deleted, _ = self.get_queryset().filter(pk=instance.pk, updated_at=instance.updated_at).delete()
+                if not deleted:
+                    return precondition_failed()
+            else:
+                self.perform_destroy(instance)
+            publish_task_event(request.user.pk, 'deleted', {'id': int(self.kwargs['pk'])})
             return Response(
                 {
                     "success": True,
@@ -254,27 +594,224 @@ class TaskDetail(generics.RetrieveUpdateDestroyAPIView):
                 status = status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
-@api_view(['PATCH'])
-@permission_classes([IsAuthenticated])
-def update_task_status(request, pk):
-    """update only the status field of a task"""
-    try:
-        task = get_object_or_404(Task, pk=pk, user=request.user)
-        serializer = TaskStatusSerializer(task, data=request.data, partial=True)
-        if serializer.is_valid():
-            serializer.save()
+class TaskBulk(APIView):
+    """Create, update or delete many tasks in one request.
+
+    Items are validated independently; the valid ones are written in a single
+    transaction and every item gets its own entry in the response.
+    """
+    permission_classes = [IsAuthenticated, TaskWritesAllowed]
+
+    def bulk_response(self, serializer, data, success_status, message):
+        results = [
+            {"index": index, "success": False, "errors": errors}
+            for index, errors in serializer.item_errors.items()
+        ]
+        if serializer.valid_indexes:
+            results.extend(
+                {"index": index, "success": True, "data": item}
+                for index, item in zip(serializer.valid_indexes, data)
+            )
+        results.sort(key=lambda result: result["index"])
+
+        if not serializer.item_errors:
+            response_status = success_status
+        elif serializer.valid_indexes:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(
+            {
+                "success": not serializer.item_errors,
+                "message": message,
+                "data": results
+            },
+            status=response_status
+        )
+
+    def validation_error(self, errors):
+        return Response(
+            {
+                "success": False,
+                "message": "Validation error",
+                "errors": errors
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    def post(self, request):
+        """Create a list of tasks."""
+        try:
+            serializer = TaskSerializer(data=request.data, many=True, max_length=settings.TASK_BULK_MAX_ITEMS)
+            if not serializer.is_valid():
+                return self.validation_error(serializer.errors)
+            data = []
+            if serializer.validated_data:
+                shard = shard_for(request.user)
+                with transaction.atomic(using=shard):
+                    serializer.save(user=request.user)
+                    invalidate_user_tasks(request.user.pk, using=shard)
+                    publish_task_event(request.user.pk, 'sync', using=shard)
+                data = serializer.data
+            return self.bulk_response(serializer, data, status.HTTP_201_CREATED, "Tasks created.")
+        except Exception as e:
             return Response(
                 {
-                    "success": True,
-                    "message": "Task status updated successfully.",
-                    "data": {
-                        "id": task.id,
-                        "status": serializer.data['status']
-                    }
+                    "success": False,
+                    "message": "Failed to create tasks.",
+                    "error": str(e)
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    def patch(self, request):
+        """Partially update a list of tasks, each identified by its id."""
+        try:
+            tasks = Task.objects.for_user(request.user).in_bulk(TaskBulkSerializer.item_ids(request.data))
+            serializer = TaskSerializer(
+                tasks, data=request.data, many=True, partial=True, max_length=settings.TASK_BULK_MAX_ITEMS
+            )
+            if not serializer.is_valid():
+                return self.validation_error(serializer.errors)
+            data = []
+            if serializer.validated_data:
+                shard = shard_for(request.user)
+                with transaction.atomic(using=shard):
+                    serializer.save()
+                    invalidate_user_tasks(request.user.pk, using=shard)
+                    publish_task_event(request.user.pk, 'sync', using=shard)
+                data = serializer.data
+            return self.bulk_response(serializer, data, status.HTTP_200_OK, "Tasks updated.")
+        except Exception as e:
+            return Response(
+                {
+                    "success": False,
+                    "message": "Failed to update tasks.",
+                    "error": str(e)
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    def delete(self, request):
+        """Delete the tasks listed in ``ids``."""
+        try:
+            serializer = TaskBulkDeleteSerializer(data=request.data)
+            if not serializer.is_valid():
+                return self.validation_error(serializer.errors)
+            task_ids = serializer.validated_data['ids']
+            queryset = Task.objects.for_user(request.user).filter(pk__in=task_ids)
+            shard = shard_for(request.user)
+            with transaction.atomic(using=shard):
+                found = set(queryset.values_list('pk', flat=True))
+                if found:
+                    queryset.delete()
+                    invalidate_user_tasks(request.user.pk, using=shard)
+                    publish_task_event(request.user.pk, 'sync', using=shard)
+            results = [
+                {"id": task_id, "success": True} if task_id in found
+                else {"id": task_id, "success": False, "errors": {"id": ["Task not found."]}}
+                for task_id in task_ids
+            ]
+            return Response(
+                {
+                    "success": len(found) == len(set(task_ids)),
+                    "message": "Tasks deleted.",
+                    "data": results
                 },
                 status=status.HTTP_200_OK
             )
-        else:
+        except Exception as e:
+            return Response(
+                {
+                    "success": False,
+                    "message": "Failed to delete tasks.",
+                    "error": str(e)
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class TaskImport(APIView):
+    """Import tasks from an NDJSON or CSV upload.
+
+    The upload is the raw request body or a multipart ``file`` field and is
+    read line by line. ``?input=csv|ndjson`` picks the format (by default
+    from the content type or file name) and ``?resume_from=<line>`` skips
+    the lines an earlier, interrupted import already committed.
+    """
+    permission_classes = [IsAuthenticated, TaskWritesAllowed]
+
+    def get_upload(self, request):
+        if request.content_type.startswith('multipart/form-data'):
+            upload = request.FILES.get('file')
+            return upload, upload.name if upload is not None else ''
+        return request.stream, ''
+
+    def post(self, request):
+        try:
+            stream, filename = self.get_upload(request)
+            input_format = request.query_params.get('input') or (
+                'csv' if request.content_type.startswith('text/csv') or filename.lower().endswith('.csv')
+                else 'ndjson'
+            )
+            errors = {}
+            if stream is None:
+                errors['file'] = ['No file was submitted.']
+            if input_format not in IMPORT_FORMATS:
+                errors['input'] = [f"Choose one of: {', '.join(IMPORT_FORMATS)}."]
+            try:
+                start_line = int(request.query_params.get('resume_from', 0))
+            except ValueError:
+                errors['resume_from'] = ['A valid integer is required.']
+            if errors:
+                return Response(
+                    {
+                        "success": False,
+                        "message": "Validation error",
+                        "errors": errors
+                    },
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            importer = TaskImporter(request.user, start_line=start_line)
+            try:
+                result = importer.run(read_records(stream, input_format))
+            except ImportFormatError as e:
+                return Response(
+                    {
+                        "success": False,
+                        "message": "Import stopped",
+                        "error": str(e),
+                        "data": importer.result()
+                    },
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            return Response(
+                {
+                    "success": not result['failed'],
+                    "message": "Tasks imported.",
+                    "data": result
+                },
+                status=status.HTTP_200_OK
+            )
+        except Exception as e:
+            return Response(
+                {
+                    "success": False,
+                    "message": "Failed to import tasks.",
+                    "error": str(e)
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+@api_view(['PATCH'])
+@permission_classes([IsAuthenticated, TaskWritesAllowed])
+def update_task_status(request, pk):
+    """update only the status field of a task"""
+    try:
+        serializer = TaskStatusSerializer(data=request.data)
+        if not serializer.is_valid():
             return Response(
                 {
                     "success": False,
@@ -283,6 +820,42 @@ def update_task_status(request, pk):
                 },
                 status=status.HTTP_400_BAD_REQUEST
             )
+
+        expected_status = serializer.validated_data.get('expected_status')
+        expected_updated_at = None
+        if_match = request.headers.get('If-Match')
+        if if_match:
+            matching = matching_task_versions(if_match, pk)
+            if not matching:
+                if Task.objects.for_user(request.user).filter(pk=pk).exists():
+                    return precondition_failed()
+                raise Http404
+            expected_updated_at = matching[0]
+
+        task = coalesced_write(
+            Task.objects.transition_status, pk, request.user, serializer.validated_data['status'],
+            expected_status=expected_status, expected_updated_at=expected_updated_at, using=shard_for(request.user)
+        )
+        if task is None:
+            # Only a failed precondition needs a second look to tell 412 from 404.
+            preconditions = expected_status is not None or expected_updated_at is not None
+            if preconditions and Task.objects.for_user(request.user).filter(pk=pk).exists():
+                if expected_updated_at is not None:
+                    return precondition_failed()
+                return precondition_failed(f"The task status is no longer '{expected_status}'")
+            raise Http404
+        invalidate_user_tasks(request.user.pk)
+        data = TaskStatusSerializer(task).data
+        publish_task_event(request.user.pk, 'status', data)
+        return Response(
+            {
+                "success": True,
+                "message": "Task status updated successfully.",
+                "data": data
+            },
+            status=status.HTTP_200_OK,
+            headers={'ETag': task_etag(task['id'], task['updated_at'])}
+        )
     except Http404:
         return Response(
             {
@@ -300,4 +873,4 @@ def update_task_status(request, pk):
                 "error": str(e)
             },
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+        )